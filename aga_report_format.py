@@ -1,10 +1,14 @@
 # Model of the AGA's tournament and rated game reporting format.
 
+import collections
 import datetime
+import os
 import re
 from rank import Rank
-from file_line_reader import FileLineReader
 from aga_roster import AGAMember
+from file_line_reader import FileLineReader
+from mcmahon import Game, Pairing
+from player_registry import PlayerRegistry
 from tournament import Tournament
 
 
@@ -17,6 +21,24 @@ class FileFormatError (Exception):
   def __str__(self):
     return '%s %d: %s' % (self.file_name, self.line_number, self.message)
 
+  def context(self, before=2, after=2):
+    '''Returns (line number, line) for the lines of the file around the
+       malformed one, or an empty list if the file can't be read.'''
+    try:
+      with FileLineReader(self.file_name) as reader:
+        return reader.context(self.line_number, before, after)
+    except (OSError, UnicodeDecodeError):
+      return []
+
+  def describe(self):
+    '''Returns the error followed by the lines around the malformed
+       one, with the malformed one marked.'''
+    lines = [str(self)]
+    for line_number, line in self.context():
+      lines.append(('%s %5d  %s' % ('>' if line_number == self.line_number else ' ',
+                                    line_number, line)).rstrip())
+    return '\n'.join(lines)
+
 
 def aga_id_pattern(name):
   return '(?P<%s>[0-9]+)' % name
@@ -47,6 +69,12 @@ def komi_pattern(name='KOMI'):
 
 PLAYER_RECORD_FMT = '%(AGA_ID)6d %(LAST_NAME)s, %(FIRST_NAME)s %(RANK)s'
 
+RESULT_RECORD_FMT = '%(WHITE_ID)d %(BLACK_ID)d %(WINNER)s%(HANDICAP)d %(KOMI)d'
+
+PAIRING_RECORD_FMT = '%(WHITE_ID)d %(BLACK_ID)d'
+
+PASS_RECORD_FMT = 'PASSED: %(AGA_ID)d'
+
 PLAYER_RECORD_RE = re.compile(
     aga_id_pattern('AGA_ID') +
     whitespace_pattern() +
@@ -72,6 +100,19 @@ RESULT_RECORD = re.compile(
     whitespace_pattern() +
     komi_pattern())
 
+# A result or, lacking the winner, handicap and komi, a pairing.
+GAME_LINE_RE = re.compile(
+    aga_id_pattern('WHITE_ID') +
+    whitespace_pattern() +
+    aga_id_pattern('BLACK_ID') +
+    '(?:' +
+    whitespace_pattern() +
+    winner_pattern() +
+    handicap_pattern() +
+    whitespace_pattern() +
+    komi_pattern() +
+    ')?')
+
 # For players taking a by
 PASS_RECORD = re.compile(
     'PASSED:' +
@@ -103,33 +144,6 @@ def write_tournament_header(output, tournament):
   output.write('\n')
 
 
-def read_tournament_header_string(input):
-  '''For reading and writiing the player roster, pairings and resukts, we
-     donlt need to parse the tournament section.'''
-  assert isinstance(input, FileLineReader), 'Got %r' % input
-  lines = []
-  line = input.readline()
-  if not SH_TOURNAMENT_RE.search(line):
-    raise FileFormatError(input, input.line_number, line, 'Expected line to start with %s' % SH_TOURNAMENT)
-  while True:
-    line = input.readline()
-    if line == '\n':
-      break
-    lines.append(line)
-  return ''.join(lines).strip()
-
-
-def skip_empty_lines(input):
-  assert isinstance(input, FileLineReader), 'Got %r' % input
-  while True:
-    line = input.readline()
-    if line == '':
-      break
-    if not line.strip() == '':
-      input.unreadline(line)
-      break
-
-
 def write_players_section(output, players):
   output.write('%s\n' % SH_PLAYERS)
   for p in players:
@@ -143,59 +157,197 @@ def write_players_section(output, players):
   output.write('\n')
 
 
-def read_players(input):
-  '''Reads the PLAYERS section of input and returns a list of player dicts.'''
-  assert isinstance(input, FileLineReader) ,'Got %r' % input
-  players = []
-  skip_empty_lines(input)
-  line = input.readline()
-  if not SH_PLAYERS_RE.search(line):
-    raise FileFormatError(input, input.line_number, line, 'Expected %s line.' % SH_PLAYERS)
-  while True:
-    line = input.readline()
-    if line == '\n':
-      break
-    m = PLAYER_RECORD_RE.search(line)
-    if not m:
-      raise FileFormatError(input, input.line_number, line, 'malformed player line.')
-    aga_id = int(m.group('AGA_ID'))
-    rank = Rank[m.group('RANK')]
-    player = AGAMember.lookupID(aga_id)
-    if ',' in m.group('COMMA'):
-      first_name = m.group('NAME2')
-      last_name = m.group('NAME1')
+def write_games_section(output, games, pairings, byes):
+  output.write('%s\n' % SH_GAMES)
+  for g in games:
+    output.write(RESULT_RECORD_FMT % {
+        'WHITE_ID': g.white_id,
+        'BLACK_ID': g.black_id,
+        'WINNER': g.winner,
+        'HANDICAP': g.handicap,
+        'KOMI': g.komi
+        } + '\n')
+  for p in pairings:
+    output.write(PAIRING_RECORD_FMT % {
+        'WHITE_ID': p.white_id,
+        'BLACK_ID': p.black_id
+        } + '\n')
+  for aga_id in byes:
+    output.write(PASS_RECORD_FMT % {'AGA_ID': aga_id} + '\n')
+  output.write('\n')
+
+
+# The records generated by parse_report, besides Games and Pairings.
+TournamentDescription = collections.namedtuple('TournamentDescription', 'text')
+PlayerEntry = collections.namedtuple(
+    'PlayerEntry', 'aga_id last_name first_name rank line_number')
+Pass = collections.namedtuple('Pass', 'aga_id')
+
+SECTIONS = (SH_TOURNAMENT, SH_PLAYERS, SH_GAMES)
+
+# What's wrong with a line that isn't a record of the section it's in,
+# by section.  Records before any section need a PLAYERS line first.
+MALFORMED_LINE = {
+    None: 'Expected %s line.' % SH_PLAYERS,
+    SH_PLAYERS: 'malformed player line.',
+    SH_GAMES: 'malformed game line.'
+    }
+
+
+def player_entry(m, line_number):
+  if ',' in m.group('COMMA'):
+    first_name = m.group('NAME2')
+    last_name = m.group('NAME1')
+  else:
+    last_name = m.group('NAME1')
+    first_name = m.group('NAME2')
+  return PlayerEntry(int(m.group('AGA_ID')), last_name, first_name,
+                     Rank[m.group('RANK')], line_number)
+
+
+def parse_report(input, errors=None):
+  '''Generates the records of the AGA report read from input, a file
+     open for reading: a TournamentDescription for each TOURNEY section,
+     a PlayerEntry for each player, a Game for each result, a Pairing
+     for each game without a result and a Pass for each player taking a
+     bye.  Merged reports may repeat sections.
+
+     A malformed line raises a FileFormatError, unless errors is a
+     list, in which case the error is appended to it and the line is
+     skipped.
+
+     Each line is looked at once: its first character says whether it
+     is a record of the current section or starts with a keyword, and
+     only the one pattern that can apply is matched against it.'''
+  section = None
+  description = []
+  match_player = PLAYER_RECORD_RE.match
+  match_game = GAME_LINE_RE.match
+  for line_number, line in enumerate(input, 1):
+    if section == SH_TOURNAMENT:
+      if line.strip():
+        description.append(line)
+        continue
+      yield TournamentDescription(''.join(description).strip())
+      section = None
+      continue
+    line = line.strip()
+    if not line or line[0] == '#':
+      continue
+    if line[0].isdigit():
+      if section == SH_GAMES:
+        m = match_game(line)
+        if m:
+          white_id, black_id, winner, handicap, komi = m.groups()
+          if winner:
+            yield Game(int(white_id), int(black_id), winner, int(handicap), int(komi))
+          else:
+            yield Pairing(int(white_id), int(black_id))
+          continue
+      elif section == SH_PLAYERS:
+        m = match_player(line)
+        if m and m.group('RANK') in Rank.__members__:
+          yield player_entry(m, line_number)
+          continue
     else:
-      last_name = m.group('NAME1')
-      first_name = m.group('NAME2')
+      keyword = line.split(None, 1)[0].upper()
+      if keyword in SECTIONS:
+        section = keyword
+        if section == SH_TOURNAMENT:
+          description = [line[len(keyword):] + '\n']
+        continue
+      if keyword == 'PASSED:' and section == SH_GAMES:
+        m = PASS_RECORD.match(line)
+        if m:
+          yield Pass(int(m.group('AGA_ID')))
+          continue
+    error = FileFormatError(input, line_number, line, MALFORMED_LINE[section])
+    if errors is None:
+      raise error
+    errors.append(error)
+  if section == SH_TOURNAMENT:
+    yield TournamentDescription(''.join(description).strip())
+
+
+def resolve_players(entries):
+  '''Returns the AGAMembers for a list of PlayerEntries, in order, each
+     playing at the rank given in the report.  A player listed more than
+     once is only returned once.'''
+  unique = []
+  seen = set()
+  for entry in entries:
+    if entry.aga_id not in seen:
+      seen.add(entry.aga_id)
+      unique.append(entry)
+  # Resolve all of the AGA ids against the roster in one go.
+  found = AGAMember.lookup_many([entry.aga_id for entry in unique])
+  players = []
+  for entry, player in zip(unique, found):
     if not player:
-      player = AGAMember(last_name, first_name, aga_id, None, None, None)
-    else:
-      if player.last_name != last_name:
-        raise Exception("For AGA member %d, last names don't match: %s versus %s." %
-                        (aga_id, last_name, player.last_name))
-    player.play_at(rank)
+      player = AGAMember.placeholder(entry.last_name, entry.first_name, entry.aga_id)
+    if player.last_name != entry.last_name:
+      raise Exception("For AGA member %d, last names don't match: %s versus %s." %
+                      (entry.aga_id, entry.last_name, player.last_name))
+    player.play_at(entry.rank)
     players.append(player)
   return players
 
 
 class AGAReport (object):
-  def __init__(self, file_name):
+  '''AGAReport is a tournament's report file: its players, who are saved
+     in player_order, one of player_registry.ORDERS, and its games.'''
+
+  def __init__(self, file_name, player_order='entered'):
     self.file_name = file_name
+    self.player_order = player_order
     self.tournament_header = None
-    self.players = []
+    self.players = PlayerRegistry()
     self.pairings = []
     self.games = []
+    self.byes = []
 
   def load(self):
     try:
-      with FileLineReader(self.file_name) as input:
-        self.tournament_header = read_tournament_header_string(input)
-        self.players = read_players(input)
+      with open(self.file_name, 'r') as input:
+        self.read(input)
     except FileNotFoundError:
       pass
 
+  def read(self, input):
+    '''Reads the whole report from input, a file open for reading.'''
+    description = None
+    entries = []
+    games = []
+    pairings = []
+    byes = []
+    for record in parse_report(input):
+      kind = type(record)
+      if kind is PlayerEntry:
+        entries.append(record)
+      elif kind is Game:
+        games.append(record)
+      elif kind is Pairing:
+        pairings.append(record)
+      elif kind is Pass:
+        byes.append(record.aga_id)
+      elif description is None:
+        description = record.text
+    self.tournament_header = description
+    self.players = PlayerRegistry(resolve_players(entries))
+    self.games = games
+    self.pairings = pairings
+    self.byes = byes
+
   def save(self):
-    with open(self.file_name, 'w') as output:
+    '''Writes the report to a temporary file which then replaces the
+       report file, so that the report file is never left half written.'''
+    temp = self.file_name + '.tmp'
+    with open(temp, 'w') as output:
       output.write('%s\n%s\n\n' % (SH_TOURNAMENT, self.tournament_header))
-      write_players_section(output, self.players)
+      write_players_section(output, self.players.view(self.player_order))
+      if self.games or self.pairings or self.byes:
+        write_games_section(output, self.games, self.pairings, self.byes)
       output.write('\n')
+      output.flush()
+      os.fsync(output.fileno())
+    os.replace(temp, self.file_name)
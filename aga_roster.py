@@ -3,9 +3,17 @@
 import abc
 import csv
 import datetime
+import heapq
 import math
+import membership_fetch
+import os
 import rank
-import urllib.request
+import roster_snapshot
+import sys
+import threading
+import time
+from name_index import FuzzyNameIndex, TrigramIndex
+from player_registry import UNDATED, SortedView, expiration_key
 from rank import Rank
 
 
@@ -15,7 +23,166 @@ AGA_MEMBER_FILE_NAME = 'TDListA.txt'
 
 def fetch_aga_membership_file():
   print("Fetching %s." % AGA_MEMBER_FILE_URI)
-  urllib.request.urlretrieve(AGA_MEMBER_FILE_URI, AGA_MEMBER_FILE_NAME)
+  membership_fetch.fetch(AGA_MEMBER_FILE_URI, AGA_MEMBER_FILE_NAME)
+
+
+def prefetch_aga_membership_file():
+  '''Checks for a newer membership file in a background thread.  The
+     new file, if any, is used the next time the roster is loaded.'''
+  return membership_fetch.start_background_fetch(AGA_MEMBER_FILE_URI,
+                                                 AGA_MEMBER_FILE_NAME)
+
+
+def read_member_records(file_name):
+  '''Yields the parsed records of the membership file file_name one at
+     a time, as tuples of the arguments to AGAMember's constructor.'''
+  with open(file_name, 'r') as f:
+    for row in csv.reader(f, delimiter='\t'):
+      if len(row) >= 5:
+        yield parse_member_record(row)
+
+
+def parse_name(field):
+  '''Decodes the "last name, first name" field of a membership record
+     into the last name and the first name, or None.'''
+  name = field.split(',')
+  last_name = name[0].strip()
+  first_name = None
+  if len(name) > 1:
+    first_name = name[1].strip()
+  return last_name, first_name
+
+
+def parse_rating(field):
+  if len(field) > 0:
+    return float(field)
+  return None
+
+
+def parse_date(field):
+  '''Decodes a month/day/year or year-month-day date, or returns None.'''
+  date = field.split('/')
+  if len(date) == 3:
+    return datetime.date(int(date[2]), int(date[0]), int(date[1]))
+  date = field.split('-')
+  if len(date) == 3:
+    return datetime.date(int(date[0]), int(date[1]), int(date[2]))
+  return None
+
+
+def parse_interned(field):
+  '''Decodes a club or state, which many members share, as an interned
+     string, or None if it is empty.'''
+  field = field.strip()
+  if field:
+    return sys.intern(field)
+  return None
+
+
+def parse_member_record(parsed_csv_record):
+  '''Decodes a single record of the membership file into a tuple of
+     the arguments to AGAMember's constructor.  The club, state and
+     last rated game columns are optional.'''
+  last_name, first_name = parse_name(parsed_csv_record[0])
+  aga_id = int(parsed_csv_record[1])
+  membership_type = parsed_csv_record[2]
+  rating = parse_rating(parsed_csv_record[3])
+  expiration_date = parse_date(parsed_csv_record[4])
+  count = len(parsed_csv_record)
+  club = parse_interned(parsed_csv_record[5]) if count > 5 else None
+  state = parse_interned(parsed_csv_record[6]) if count > 6 else None
+  last_rated = parse_date(parsed_csv_record[7].strip()) if count > 7 else None
+  return (last_name, first_name, aga_id, membership_type, rating, expiration_date,
+          club, state, last_rated)
+
+
+def expired_members(index, date):
+  '''Returns the members in index, a SortedView by expiration_key, whose
+     memberships had expired by date, those that expired first first.
+     A membership is current on its expiration date.'''
+  return index.between((0,), (date.toordinal(),))
+
+
+def expiring_members(index, date, days):
+  '''Returns the members in index, a SortedView by expiration_key, whose
+     memberships are current on date but will have expired days later.'''
+  start = date.toordinal()
+  return index.between((start,), (start + days,))
+
+
+def undated_members(index):
+  '''Returns the members in index, a SortedView by expiration_key,
+     without an expiration date, such as placeholders.'''
+  return index.between((UNDATED,), (UNDATED + 1,))
+
+
+def club_key(member):
+  return member.club
+
+
+def state_key(member):
+  return member.state
+
+
+def rank_band_key(member):
+  '''The value of the Rank of member's rating, or None for members
+     without a valid rating.'''
+  rating = member.rating
+  if member.is_placeholder or rating is None or -1 < rating < 1:
+    return None
+  return member.rank.value
+
+
+def last_rated_key(member):
+  date = member.last_rated
+  return (date.toordinal() if date else 0, member.aga_id)
+
+
+class MemberIndex (object):
+  '''MemberIndex maps each value of key(member) to the set of the AGA
+     IDs of the members with that value.  Members whose value is None
+     aren't indexed.  Like a SortedView, each member is filed under the
+     value it had when it was added.'''
+
+  def __init__(self, key, members=()):
+    self.key = key
+    self.filed = {}
+    self.ids = {}
+    for member in members:
+      self.add(member)
+
+  def add(self, member):
+    value = self.key(member)
+    if value is None:
+      return
+    self.filed[member.aga_id] = value
+    ids = self.ids.get(value)
+    if ids is None:
+      ids = self.ids[value] = set()
+    ids.add(member.aga_id)
+
+  def remove(self, member):
+    value = self.filed.pop(member.aga_id)
+    ids = self.ids[value]
+    ids.discard(member.aga_id)
+    if not ids:
+      del self.ids[value]
+
+  def get(self, value):
+    '''Returns the set of the AGA IDs of the members with value, which
+       mustn't be changed.'''
+    return self.ids.get(value, frozenset())
+
+
+# The secondary indexes a registry can build, by name: how to make each
+# from the members and the key it is made with.
+MEMBER_INDEXES = {
+    'expiration': (SortedView, expiration_key),
+    'last_rated': (SortedView, last_rated_key),
+    'club': (MemberIndex, club_key),
+    'state': (MemberIndex, state_key),
+    'rank': (MemberIndex, rank_band_key),
+    }
 
 
 class AGAMembersAlreadyLoaded (Exception):
@@ -23,100 +190,646 @@ class AGAMembersAlreadyLoaded (Exception):
     return 'The AGA membership list has already been loaded.'
 
 
+def rating_rank(rating):
+  '''Returns a member's rating interpreted as a dan/kyu rank.'''
+  # See https://senseis.xmp.net/?AGARatingSystem
+  if not rating:
+    return rank.rank_from_rating(-30)
+  return rank.rank_from_rating(rating)
+
+
+def _supersedes(new, old):
+  '''Returns True if new should replace old as the member registered
+     under their shared AGA ID.'''
+  if new.is_placeholder:
+    return False
+  if old.is_placeholder:
+    return True
+  return ((new.expiration_date or datetime.date.min) >=
+          (old.expiration_date or datetime.date.min))
+
+
+def _match_quality(member, needle):
+  '''Says how well member's names match the lower cased needle.  Lower
+     is better.  Returns None if neither name contains needle.'''
+  last_name = member.last_name.lower()
+  if needle in last_name:
+    if last_name == needle:
+      return 0
+    if last_name.startswith(needle):
+      return 1
+    return 2
+  first_name = (member.first_name or '').lower()
+  if needle in first_name:
+    if first_name == needle:
+      return 3
+    if first_name.startswith(needle):
+      return 4
+    return 5
+  return None
+
+
+class AGAMemberRegistry (object):
+  '''AGAMemberRegistry keeps the loaded AGAMembers in load order and
+     indexes them by AGA ID.
+
+     TDListA.txt sometimes lists the same AGA ID more than once.  When
+     that happens the record with the later expiration date is kept,
+     ties going to the record read last, and the ID is noted in
+     duplicate_ids.  A placeholder member, one made up for a player
+     who isn't in the membership file, never displaces a real member
+     but is itself displaced by one.
+
+     The registry also maintains a TrigramIndex of member names to
+     support substring searches and a FuzzyNameIndex for searches that
+     tolerate misspellings.  Each is built on first use.
+
+     Secondary indexes, named in MEMBER_INDEXES, are built on first use
+     too and kept up to date from then on.  expiration_index is a
+     SortedView of the members by expiration_key, for expired_members
+     and expiring_members, and select finds members by club, state,
+     rank and when they last played a rated game.'''
+
+  # Whether the members may be loaded from, and saved to, a snapshot of
+  # the membership file.  See roster_snapshot.
+  uses_snapshot = True
+
+  def __init__(self):
+    self.members = []
+    self.by_id = {}
+    self.duplicate_ids = set()
+    self._name_index = None
+    self._fuzzy_index = None
+    self._indexes = {}
+    self._position = {}
+
+  def __len__(self):
+    return len(self.members)
+
+  def __iter__(self):
+    return iter(self.members)
+
+  def member_ids(self):
+    return self.by_id.keys()
+
+  def clear(self):
+    del self.members[:]
+    self.by_id.clear()
+    self.duplicate_ids.clear()
+    self._name_index = None
+    self._fuzzy_index = None
+    self._indexes = {}
+    self._position.clear()
+
+  def name_entries(self):
+    '''Yields the AGA ID, last name and first name of every member.'''
+    for member in self.members:
+      yield member.aga_id, member.last_name, member.first_name
+
+  @property
+  def name_index(self):
+    if self._name_index is None:
+      index = TrigramIndex()
+      for aga_id, last_name, first_name in self.name_entries():
+        index.add(aga_id, last_name, first_name)
+      self._name_index = index
+    return self._name_index
+
+  @name_index.setter
+  def name_index(self, index):
+    '''Installs a TrigramIndex that was built elsewhere, for instance
+       read from a snapshot, for the current members.'''
+    self._name_index = index
+
+  @property
+  def fuzzy_index(self):
+    if self._fuzzy_index is None:
+      index = FuzzyNameIndex()
+      for aga_id, last_name, first_name in self.name_entries():
+        index.add(aga_id, last_name, first_name)
+      self._fuzzy_index = index
+    return self._fuzzy_index
+
+  def index(self, name):
+    '''Returns the secondary index called name in MEMBER_INDEXES,
+       building it if need be.'''
+    index = self._indexes.get(name)
+    if index is None:
+      make_index, key = MEMBER_INDEXES[name]
+      index = self._indexes[name] = make_index(key, self.members)
+    return index
+
+  @property
+  def expiration_index(self):
+    return self.index('expiration')
+
+  def _file_member(self, member):
+    '''Adds member to whichever secondary indexes have been built.'''
+    for index in self._indexes.values():
+      index.add(member)
+
+  def _unfile_member(self, member):
+    for index in self._indexes.values():
+      if member.aga_id in index.filed:
+        index.remove(member)
+
+  def _index_names(self, aga_id, last_name, first_name):
+    '''Adds a member's names to whichever name indexes have been built.'''
+    if self._name_index is not None:
+      self._name_index.add(aga_id, last_name, first_name)
+    if self._fuzzy_index is not None:
+      self._fuzzy_index.add(aga_id, last_name, first_name)
+
+  def _unindex_names(self, aga_id, last_name, first_name):
+    if self._name_index is not None:
+      self._name_index.remove(aga_id, last_name, first_name)
+    if self._fuzzy_index is not None:
+      self._fuzzy_index.remove(aga_id, last_name, first_name)
+
+  def add(self, member):
+    '''Adds member to the registry.  Returns whichever member is
+       registered under member's AGA ID afterwards.'''
+    aga_id = member.aga_id
+    existing = self.by_id.get(aga_id)
+    if existing is None:
+      self._position[aga_id] = len(self.members)
+      self.members.append(member)
+      self.by_id[aga_id] = member
+      self._index_names(aga_id, member.last_name, member.first_name)
+      self._file_member(member)
+      return member
+    if existing is member:
+      return member
+    if not (member.is_placeholder or existing.is_placeholder):
+      self.duplicate_ids.add(aga_id)
+    if not _supersedes(member, existing):
+      return existing
+    self.members[self._position[aga_id]] = member
+    self.by_id[aga_id] = member
+    self._unindex_names(aga_id, existing.last_name, existing.first_name)
+    self._index_names(aga_id, member.last_name, member.first_name)
+    self._unfile_member(existing)
+    self._file_member(member)
+    return member
+
+  def add_record(self, last_name, first_name, aga_id, membership_type, rating,
+                 expiration_date, club=None, state=None, last_rated=None):
+    '''Makes an AGAMember from the specified data and adds it.  Returns
+       whichever member is registered under aga_id afterwards.'''
+    return self.add(AGAMember(last_name, first_name, aga_id, membership_type,
+                              rating, expiration_date, club, state, last_rated))
+
+  def read_records(self, file_name):
+    '''Yields the records of the membership file file_name in the form
+       add_records takes them.'''
+    return read_member_records(file_name)
+
+  def add_records(self, records):
+    '''Adds records read by read_records, or from a snapshot.'''
+    add_record = self.add_record
+    for record in records:
+      add_record(*record)
+
+  def update_record(self, last_name, first_name, aga_id, membership_type, rating,
+                    expiration_date, club=None, state=None, last_rated=None):
+    '''Overwrites the data of the member registered under aga_id with
+       the specified data, in place, so that everything holding on to
+       the member sees the change.  Returns the member.'''
+    member = self.by_id[aga_id]
+    self._unindex_names(aga_id, member.last_name, member.first_name)
+    self._index_names(aga_id, last_name, first_name)
+    self._unfile_member(member)
+    member.last_name = last_name
+    member.first_name = first_name
+    member.membership_type = membership_type
+    member.rating = rating
+    member.expiration_date = expiration_date
+    member.club = club
+    member.state = state
+    member.last_rated = last_rated
+    self._file_member(member)
+    return member
+
+  def remove_many(self, aga_ids):
+    '''Removes the members with the specified AGA IDs.'''
+    doomed = set()
+    for aga_id in aga_ids:
+      member = self.by_id.pop(aga_id, None)
+      if member is None:
+        continue
+      doomed.add(aga_id)
+      self._unindex_names(aga_id, member.last_name, member.first_name)
+      self._unfile_member(member)
+    if not doomed:
+      return
+    self.members[:] = [m for m in self.members if m.aga_id not in doomed]
+    self._position = dict((m.aga_id, i) for i, m in enumerate(self.members))
+
+  def derive_ranks(self):
+    '''Caches the rank of every member whose rank isn't cached yet,
+       converting all of their ratings in one pass.'''
+    members = [m for m in self.members if m._rank is None]
+    ranks = rank.ranks_from_ratings([m.rating or -30 for m in members])
+    for member, member_rank in zip(members, ranks):
+      if member_rank is not None:
+        member._rank = member_rank
+
+  def lookup(self, aga_id):
+    return self.by_id.get(aga_id)
+
+  def lookup_many(self, aga_ids):
+    '''Returns a list parallel to aga_ids of the corresponding members,
+       with None for any ID that isn't registered.'''
+    get = self.by_id.get
+    return [get(aga_id) for aga_id in aga_ids]
+
+  def search(self, substring):
+    '''Returns the members whose first or last name contains substring,
+       ignoring case.  Last name matches come before first name
+       matches, whole name matches before prefix matches before other
+       substring matches.  Within each group members are ordered by
+       name and then AGA ID.'''
+    needle = substring.lower()
+    candidates = self.name_index.candidates(needle)
+    if candidates is None:
+      candidates = self.members
+    else:
+      candidates = self.lookup_many(candidates)
+    matches = []
+    for member in candidates:
+      quality = _match_quality(member, needle)
+      if quality is not None:
+        matches.append(((quality, member.last_name.lower(),
+                         (member.first_name or '').lower(), member.aga_id),
+                        member))
+    matches.sort(key=lambda match: match[0])
+    return [member for key, member in matches]
+
+  def select(self, ranks=None, state=None, club=None, rated_since=None):
+    '''Returns the members meeting every one of the criteria given,
+       ordered by AGA ID:
+
+         ranks        a pair of Ranks, including both, that members'
+                      ratings must lie between, weakest or strongest
+                      first
+         state        the state members live in
+         club         the club members belong to
+         rated_since  a date on or after which members last played a
+                      rated game
+
+       Each criterion gives the set of the AGA IDs meeting it from an
+       index and the sets are intersected, smallest first.'''
+    matches = []
+    if ranks is not None:
+      index = self.index('rank')
+      weakest, strongest = sorted(ranks, key=lambda rank: rank.value)
+      ids = set()
+      for value in range(weakest.value, strongest.value + 1):
+        ids.update(index.get(value))
+      matches.append(ids)
+    if state is not None:
+      matches.append(self.index('state').get(state))
+    if club is not None:
+      matches.append(self.index('club').get(club))
+    if rated_since is not None:
+      matches.append(set(m.aga_id for m in self.index('last_rated').between(
+          (rated_since.toordinal(),), (UNDATED,))))
+    if not matches:
+      return sorted(self.members, key=lambda member: member.aga_id)
+    matches.sort(key=len)
+    ids = set(matches[0])
+    for match in matches[1:]:
+      if not ids:
+        break
+      ids.intersection_update(match)
+    return self.lookup_many(sorted(ids))
+
+  def fuzzy_search(self, name, limit=10, max_distance=2):
+    '''Returns up to limit (distance, member) pairs for the members with
+       a first or last name within max_distance edits of name or, failing
+       that, a name that sounds like it, closest first.  Names that sound
+       alike come before those that don't, last names before first names,
+       and then members are ordered by name and AGA ID.'''
+    found = {}
+    best = []
+    # Names that only sound alike are only considered if nothing is
+    # spelled similarly.
+    for distance, sounds_different, matched, aga_ids in \
+        self.fuzzy_index.matches(name, max_distance, wanted=1):
+      if len(best) >= limit and (distance, sounds_different) > best[limit - 1][:2]:
+        # Every remaining match ranks below the ones we have.
+        break
+      for member in self.lookup_many(aga_ids):
+        key = (distance, sounds_different, member.last_name.lower() != matched,
+               member.last_name.lower(), (member.first_name or '').lower(),
+               member.aga_id)
+        if member.aga_id not in found or key < found[member.aga_id][0]:
+          found[member.aga_id] = (key, member)
+      best = heapq.nsmallest(limit, [key for key, member in found.values()])
+    ranked = sorted(found.values(), key=lambda match: match[0])[:limit]
+    return [(key[0], member) for key, member in ranked]
+
+
+class RosterLoader (object):
+  '''RosterLoader adds a stream of member records to a registry,
+     possibly in a background thread.  While it is running, lookups
+     should go through the loader rather than straight to the registry:
+     an ID lookup waits only until that ID has been loaded, or loading
+     is done, and a search covers the members loaded so far.
+
+     finish, if given, is called once every record has been added,
+     while the loader's lock is held.'''
+
+  # Records are added, and waiting lookups woken, this many at a time.
+  CHUNK_SIZE = 500
+
+  def __init__(self, registry, records, finish=None):
+    self.registry = registry
+    self.records = records
+    self.finish = finish
+    self.condition = threading.Condition()
+    self.done = False
+    self.error = None
+    self.thread = None
+
+  def start(self):
+    self.thread = threading.Thread(target=self.run, name='load AGA members',
+                                   daemon=True)
+    self.thread.start()
+
+  def run(self):
+    try:
+      chunk = []
+      for record in self.records:
+        chunk.append(record)
+        if len(chunk) >= self.CHUNK_SIZE:
+          self._add(chunk)
+          chunk = []
+      self._add(chunk)
+      with self.condition:
+        if self.finish:
+          self.finish()
+    except Exception as e:
+      self.error = e
+      if self.thread is None:
+        raise
+      sys.stderr.write('\nLoading the AGA membership list failed: %s\n' % e)
+    finally:
+      with self.condition:
+        self.done = True
+        self.condition.notify_all()
+
+  def _add(self, chunk):
+    with self.condition:
+      self.registry.add_records(chunk)
+      self.condition.notify_all()
+
+  def wait(self):
+    if self.thread:
+      self.thread.join()
+
+  def lookup(self, aga_id):
+    with self.condition:
+      self.condition.wait_for(
+          lambda: self.done or self.registry.lookup(aga_id) is not None)
+      return self.registry.lookup(aga_id)
+
+  def lookup_many(self, aga_ids):
+    with self.condition:
+      self.condition.wait_for(
+          lambda: self.done or None not in self.registry.lookup_many(aga_ids))
+      return self.registry.lookup_many(aga_ids)
+
+  def search(self, substring):
+    with self.condition:
+      return self.registry.search(substring)
+
+  def fuzzy_search(self, name, limit):
+    with self.condition:
+      return self.registry.fuzzy_search(name, limit)
+
+  def select(self, **criteria):
+    with self.condition:
+      return self.registry.select(**criteria)
+
+
 class AGAMember (object):
   '''AGAMember represents a single item in the AGA membership list.'''
-  AllMembers = []
+
+  # Tens of thousands of members are loaded, so don't give each one a
+  # __dict__.
+  __slots__ = ('last_name', 'first_name', 'aga_id', 'membership_type', '_rating',
+               '_rank', 'expiration_date', 'club', 'state', 'last_rated',
+               '_playing_at')
+
+  Registry = AGAMemberRegistry()
+  AllMembers = Registry.members
+  # The roster_snapshot.file_key of the membership file as it was when
+  # it was loaded.
+  LoadedFileKey = None
+  # The RosterLoader of a load that is in progress in the background.
+  Loader = None
+
+  @classmethod
+  def loading(cls):
+    '''Returns True if the membership list is still being loaded in
+       the background.'''
+    return cls.Loader is not None and not cls.Loader.done
+
+  @classmethod
+  def _loader(cls):
+    '''Returns the Loader if lookups must go through it.'''
+    loader = cls.Loader
+    if loader is None or loader.done:
+      return None
+    return loader
+
+  @classmethod
+  def wait_loaded(cls):
+    '''Waits for a load in the background to finish.  Call this before
+       changing the Registry directly.'''
+    loader = cls.Loader
+    if loader is not None:
+      loader.wait()
+
+  @classmethod
+  def use_registry(cls, registry):
+    '''Makes registry, which should be empty, hold the AGA members from
+       now on.  See columnar_roster.ColumnarRegistry.'''
+    cls.Registry = registry
+    cls.AllMembers = registry.members
 
   @classmethod
   def check_loaded(cls):
     '''Raises AGAMembersAlreadyLoaded if the list of loaded AGA members isn't empty.'''
-    if len(cls.AllMembers) > 0:
+    if len(cls.Registry) > 0 or cls.loading():
       raise AGAMembersAlreadyLoaded()
 
   @classmethod
-  def ensure_loaded(cls):
-    if len(cls.AllMembers) > 0:
+  def ensure_loaded(cls, timing=False, background=False):
+    if len(cls.Registry) > 0 or cls.loading():
       return
     try:
-      cls.read_member_file()
+      cls.read_member_file(timing, background)
     except FileNotFoundError:
       fetch_aga_membership_file()
-      cls.read_member_file()
+      cls.read_member_file(timing, background)
 
   @classmethod
-  def read_member_file(cls):
-    '''Loads TDListA.txt from the current directory.'''
+  def read_member_file(cls, timing=False, background=False):
+    '''Loads TDListA.txt from the current directory.  The parsed records
+       are cached in a snapshot file next to it which is used instead
+       of parsing TDListA.txt again for as long as TDListA.txt doesn't
+       change.  If timing is true, reports whether the snapshot was
+       used and how long loading took.  If background is true, returns
+       right away and loads the members in a background thread.'''
     cls.check_loaded()
-    with open(AGA_MEMBER_FILE_NAME, 'r') as f:
-      reader = csv.reader(f, delimiter='\t')
-      for row in reader:
-        if len(row) >= 5:
-          cls.fromCSVRecord(row)
+    start = time.perf_counter()
+    # Raise FileNotFoundError now rather than in the background.
+    os.stat(AGA_MEMBER_FILE_NAME)
+    registry = cls.Registry
+    loaded = {}
+    def records():
+      key = roster_snapshot.file_key(AGA_MEMBER_FILE_NAME)
+      cls.LoadedFileKey = loaded['key'] = key
+      if not registry.uses_snapshot:
+        for record in registry.read_records(AGA_MEMBER_FILE_NAME):
+          yield record
+        return
+      snapshot = roster_snapshot.read_snapshot(AGA_MEMBER_FILE_NAME, key)
+      if snapshot is not None:
+        records, loaded['name_index'] = snapshot
+        for record in records:
+          yield record
+        return
+      records = loaded['records'] = []
+      for record in registry.read_records(AGA_MEMBER_FILE_NAME):
+        records.append(record)
+        yield record
+    def finish():
+      registry.derive_ranks()
+      snapshot_hit = 'name_index' in loaded
+      if snapshot_hit:
+        registry.name_index = loaded['name_index']
+      elif registry.uses_snapshot:
+        try:
+          roster_snapshot.write_snapshot(AGA_MEMBER_FILE_NAME, loaded['records'],
+                                         registry.name_index, loaded['key'])
+        except OSError as e:
+          sys.stderr.write("Couldn't write %s: %s\n" % (
+              roster_snapshot.snapshot_file_name(AGA_MEMBER_FILE_NAME), e))
+      if timing:
+        sys.stdout.write('Loaded %d members from %s in %.3f seconds (snapshot %s).\n' % (
+            len(registry), AGA_MEMBER_FILE_NAME, time.perf_counter() - start,
+            'hit' if snapshot_hit else 'miss' if registry.uses_snapshot else 'not used'))
+    loader = RosterLoader(registry, records(), finish)
+    if background:
+      cls.Loader = loader
+      loader.start()
+    else:
+      loader.run()
 
   @classmethod
   def fromCSVRecord(cls, parsed_csv_record):
     '''Creates an AGAMEmber from a single record of the membership file.'''
-    name = parsed_csv_record[0].split(',')
-    last_name = name[0].strip()
-    first_name = None
-    if len(name) > 1:
-      first_name = name[1].strip()
-    aga_id = int(parsed_csv_record[1])
-    membership_type = parsed_csv_record[2]
-    rating = parsed_csv_record[3]
-    if len(rating) > 0:
-      rating = float(rating)
-    else:
-      rating = None
-    expiration = parsed_csv_record[4].split('/')
-    expiration_date = None
-    if len(expiration) == 3:
-      expiration_date = datetime.date(int(expiration[2]), int(expiration[0]), int(expiration[1]))
-    member = AGAMember(last_name, first_name, aga_id, membership_type, rating, expiration_date)
+    return cls.Registry.add_record(*parse_member_record(parsed_csv_record))
+
+  @classmethod
+  def placeholder(cls, last_name, first_name, aga_id):
+    '''Returns the member to use for an AGA ID that might not be in the
+       membership file, making up a placeholder member if it isn't.'''
+    member = cls.lookupID(aga_id)
+    if member:
+      return member
+    return cls.Registry.add_record(last_name, first_name, aga_id, None, None, None)
 
   @classmethod
   def search(cls, substring):
     '''Returns a list of AGAMember objects whose first or last names contain substring.'''
-    matches = []
-    for member in cls.AllMembers:
-      if substring.lower() in member.last_name.lower():
-        matches.append(member)
-        continue
-      if member.first_name and substring in member.first_name:
-        matches.append(member)
-    return matches
+    loader = cls._loader()
+    if loader:
+      return loader.search(substring)
+    return cls.Registry.search(substring)
+
+  @classmethod
+  def fuzzy_search(cls, name, limit=10):
+    '''Returns up to limit (distance, AGAMember) pairs for the members
+       whose first or last names are spelled like or sound like name.'''
+    loader = cls._loader()
+    if loader:
+      return loader.fuzzy_search(name, limit)
+    return cls.Registry.fuzzy_search(name, limit)
+
+  @classmethod
+  def select(cls, ranks=None, state=None, club=None, rated_since=None):
+    '''Returns the AGAMembers meeting all of the criteria given.  See
+       AGAMemberRegistry.select.'''
+    loader = cls._loader()
+    if loader:
+      return loader.select(ranks=ranks, state=state, club=club,
+                           rated_since=rated_since)
+    return cls.Registry.select(ranks, state, club, rated_since)
 
   @classmethod
   def lookupID(cls, id):
     '''Looks up an AGAMember by AGA ID number.'''
-    for member in cls.AllMembers:
-      if id == member.aga_id:
-        return member
-    return None
+    loader = cls._loader()
+    if loader:
+      return loader.lookup(id)
+    return cls.Registry.lookup(id)
+
+  @classmethod
+  def lookup_many(cls, ids):
+    '''Looks up a whole sequence of AGA ID numbers at once.  Returns a
+       list parallel to ids with None for unknown IDs.'''
+    loader = cls._loader()
+    if loader:
+      return loader.lookup_many(ids)
+    return cls.Registry.lookup_many(ids)
 
-  def __init__(self, last_name, first_name, aga_id, membership_type, rating, expiration_date):
-    '''Makes an AGAMember from the specified data.'''
+  def __init__(self, last_name, first_name, aga_id, membership_type, rating, expiration_date,
+               club=None, state=None, last_rated=None):
+    '''Makes an AGAMember from the specified data.  Use the Registry's
+       add_record method to make a member that can be looked up.
+       last_rated is the date of the member's last rated game.'''
     self.last_name = last_name
     self.first_name = first_name
     self.aga_id = aga_id
     self.membership_type = membership_type
     self.rating = rating
     self.expiration_date = expiration_date
-    self.__class__.AllMembers.append(self)
+    self.club = club
+    self.state = state
+    self.last_rated = last_rated
     self._playing_at = None
 
   def __repr__(self):
-    return 'AGAMember(%r, %r, %r, %r, %r, %r)' % (
+    return 'AGAMember(%r, %r, %r, %r, %r, %r, %r, %r, %r)' % (
         self.last_name, self.first_name, self.aga_id,
-        self.membership_type, self.rating, self.expiration_date)
+        self.membership_type, self.rating, self.expiration_date,
+        self.club, self.state, self.last_rated)
+
+  @property
+  def is_placeholder(self):
+    '''True if this member wasn't read from the membership file.'''
+    return self.membership_type is None
+
+  @property
+  def rating(self):
+    return self._rating
+
+  @rating.setter
+  def rating(self, rating):
+    self._rating = rating
+    # The cached rank, derived from the rating.
+    self._rank = None
 
   @property
   def rank(self):
     '''Returns the player's rating interpreted as a dan/kyu rank.'''
-    # See https://senseis.xmp.net/?AGARatingSystem
-    if not self.rating:
-      return rank.rank_from_rating(-30)
-    return rank.rank_from_rating(self.rating)
+    if self._rank is None:
+      self._rank = rating_rank(self._rating)
+    return self._rank
 
   @property
   def playing_at(self):
@@ -0,0 +1,896 @@
+# Benchmarks for the tournament utilities.  They run against synthetic
+# data so neither a TDListA.txt nor a network connection is needed.
+#
+# To run:
+#
+#   python benchmarks.py search --sizes 20000 1000000
+#
+# With --json the results are saved too, and --compare shows how they
+# have changed since a saved run:
+#
+#   python benchmarks.py suite --json before.json
+#   python benchmarks.py suite --compare before.json
+
+import argparse
+import asyncio
+import csv
+import datetime
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import aga_roster
+import bulk_import
+import command_loop
+import mcmahon
+import roster_snapshot
+import standings
+from aga_roster import AGAMember, AGAMemberRegistry, parse_member_record
+from columnar_roster import ColumnarRegistry
+from lazy_roster import LazyRegistry
+from rank import Rank, rank_from_rating, ranks_from_ratings
+from file_line_reader import FileLineReader
+from synthetic_data import (realistic_member_rows, synthetic_member_rows,
+                            synthetic_report_lines)
+
+
+BENCHMARKS = {}
+
+def benchmark(name):
+  '''Decorator for registering a benchmark function under name.'''
+  def register(function):
+    BENCHMARKS[name] = function
+    return function
+  return register
+
+
+def timed(function, *args):
+  '''Returns the result of calling function and the elapsed seconds.'''
+  start = time.perf_counter()
+  result = function(*args)
+  return result, time.perf_counter() - start
+
+
+# Every figure reported, as dicts, for --json.
+RESULTS = []
+
+# The benchmark that is running and the case, such as the roster size,
+# it is running against.
+CURRENT = {'benchmark': None, 'case': None}
+
+
+def case(description):
+  '''Starts reporting the results of running against description.'''
+  CURRENT['case'] = description
+  sys.stdout.write('%s\n' % description)
+
+
+def report(label, value, unit):
+  sys.stdout.write('  %-44s %12.3f %s\n' % (label, value, unit))
+  RESULTS.append(dict(CURRENT, label=label, value=value, unit=unit))
+
+
+def measure(label, function, setup=None, repeat=3):
+  '''Reports the best of repeat timings of function and its peak
+     memory use, from one more run under tracemalloc.  setup, if given,
+     is called before each run, untimed.  Returns function's result.'''
+  times = []
+  for i in range(repeat):
+    if setup:
+      setup()
+    result, seconds = timed(function)
+    times.append(seconds)
+  if setup:
+    setup()
+  tracemalloc.start()
+  try:
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+  finally:
+    tracemalloc.stop()
+  report('%s, best time' % label, min(times) * 1000, 'ms')
+  report('%s, peak memory' % label, peak / 1e6, 'MB')
+  return result
+
+
+def load_synthetic_roster(size, seed=0):
+  '''Replaces the loaded roster with size synthetic members.'''
+  AGAMember.Registry.clear()
+  for row in synthetic_member_rows(size, seed):
+    AGAMember.fromCSVRecord(row)
+
+
+def write_synthetic_member_file(file_name, size, seed=0):
+  with open(file_name, 'w', newline='') as f:
+    writer = csv.writer(f, delimiter='\t', lineterminator='\n')
+    for row in synthetic_member_rows(size, seed):
+      writer.writerow(row)
+
+
+def linear_search(substring):
+  '''The original AGAMember.search: a scan of the whole roster.'''
+  matches = []
+  for member in AGAMember.AllMembers:
+    if substring.lower() in member.last_name.lower():
+      matches.append(member)
+      continue
+    if member.first_name and substring in member.first_name:
+      matches.append(member)
+  return matches
+
+
+def search_queries(count, seed=0):
+  '''Picks substrings of loaded names to search for, plus a few misses.'''
+  rng = random.Random(seed)
+  queries = []
+  for i in range(count):
+    member = rng.choice(AGAMember.AllMembers)
+    name = member.last_name
+    length = min(len(name), rng.randint(4, 6))
+    start = rng.randint(0, len(name) - length)
+    queries.append(name[start:start + length])
+  queries.extend(['qqq', 'Zzyzx'])
+  return queries
+
+
+@benchmark('search')
+def bench_search(args):
+  for size in args.sizes:
+    case('%d members' % size)
+    ignore, seconds = timed(load_synthetic_roster, size)
+    report('load', seconds, 's')
+    ignore, seconds = timed(lambda: AGAMember.Registry.name_index)
+    report('build name index', seconds, 's')
+    queries = search_queries(args.queries)
+    ignore, indexed = timed(lambda: [AGAMember.search(q) for q in queries])
+    ignore, linear = timed(lambda: [linear_search(q) for q in queries])
+    report('indexed search', indexed * 1000 / len(queries), 'ms/query')
+    report('linear search', linear * 1000 / len(queries), 'ms/query')
+    report('speedup', linear / indexed, 'x')
+
+
+
+def misspell(name, rng):
+  '''Returns name with one random substitution, insertion, deletion or
+     transposition.'''
+  i = rng.randrange(len(name))
+  letter = rng.choice('abcdefghijklmnopqrstuvwxyz')
+  edit = rng.choice(['substitute', 'insert', 'delete', 'transpose'])
+  if edit == 'substitute':
+    return name[:i] + letter + name[i + 1:]
+  if edit == 'insert':
+    return name[:i] + letter + name[i:]
+  if edit == 'delete' and len(name) > 1:
+    return name[:i] + name[i + 1:]
+  if i + 1 < len(name):
+    return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+  return name + letter
+
+
+@benchmark('fuzzy')
+def bench_fuzzy(args):
+  rng = random.Random(0)
+  for size in args.sizes:
+    case('%d members' % size)
+    load_synthetic_roster(size)
+    ignore, seconds = timed(lambda: AGAMember.Registry.fuzzy_index)
+    report('build fuzzy index', seconds, 's')
+    targets = [rng.choice(AGAMember.AllMembers) for i in range(args.queries)]
+    queries = [misspell(member.last_name, rng) for member in targets]
+    times = []
+    found = 0
+    for member, query in zip(targets, queries):
+      matches, seconds = timed(AGAMember.fuzzy_search, query)
+      times.append(seconds)
+      if member in [m for distance, m in matches]:
+        found += 1
+    times.sort()
+    report('median query', times[len(times) // 2] * 1000, 'ms')
+    report('95th percentile query', times[len(times) * 95 // 100] * 1000, 'ms')
+    report('misspelled member in top 10', found / len(targets), 'fraction')
+
+@benchmark('load')
+def bench_load(args):
+  cwd = os.getcwd()
+  with tempfile.TemporaryDirectory() as directory:
+    os.chdir(directory)
+    try:
+      for size in args.sizes:
+        case('%d members' % size)
+        write_synthetic_member_file(aga_roster.AGA_MEMBER_FILE_NAME, size)
+        for label in ('snapshot miss', 'snapshot hit'):
+          AGAMember.Registry.clear()
+          ignore, seconds = timed(AGAMember.read_member_file)
+          report('read_member_file, %s' % label, seconds, 's')
+        os.remove(roster_snapshot.snapshot_file_name(aga_roster.AGA_MEMBER_FILE_NAME))
+    finally:
+      os.chdir(cwd)
+
+
+@benchmark('startup')
+def bench_startup(args):
+  cwd = os.getcwd()
+  with tempfile.TemporaryDirectory() as directory:
+    os.chdir(directory)
+    try:
+      for size in args.sizes:
+        case('%d members' % size)
+        write_synthetic_member_file(aga_roster.AGA_MEMBER_FILE_NAME, size)
+        snapshot_file = roster_snapshot.snapshot_file_name(aga_roster.AGA_MEMBER_FILE_NAME)
+        early, late = size // 10, size - size // 10
+        for snapshot in ('miss', 'hit'):
+          for background in (False, True):
+            if snapshot == 'miss' and os.path.exists(snapshot_file):
+              os.remove(snapshot_file)
+            AGAMember.Registry.clear()
+            AGAMember.Loader = None
+            label = '%s, %s' % ('background' if background else 'foreground', snapshot)
+            start = time.perf_counter()
+            AGAMember.ensure_loaded(background=background)
+            report('%s: prompt' % label, time.perf_counter() - start, 's')
+            AGAMember.lookupID(early)
+            report('%s: ID %d found' % (label, early), time.perf_counter() - start, 's')
+            AGAMember.lookupID(late)
+            report('%s: ID %d found' % (label, late), time.perf_counter() - start, 's')
+            if AGAMember.Loader:
+              AGAMember.Loader.wait()
+              AGAMember.Loader = None
+        os.remove(snapshot_file)
+    finally:
+      os.chdir(cwd)
+
+
+class UncachedMember (AGAMember):
+  '''An AGAMember that derives its rank from its rating every time it is
+     asked for it, as AGAMember did before ranks were cached.'''
+  __slots__ = ()
+
+  @property
+  def rank(self):
+    return aga_roster.rating_rank(self._rating)
+
+
+@benchmark('ranks')
+def bench_ranks(args):
+  # registration and aga_report_format need the tournament module.
+  import aga_report_format
+  import player_registry
+  import registration
+  def list_and_save(players):
+    # As registration.py lists the registered players, strongest first,
+    # and then saves them to the report.
+    output = io.StringIO()
+    for p in sorted(players, key=player_registry.rank_key):
+      output.write('%s\n' % registration.pretty_member(p, True))
+    aga_report_format.write_players_section(output, players)
+    return output.getvalue()
+  rng = random.Random(0)
+  for size in args.sizes:
+    case('%d members' % size)
+    for name, registry_class in (('objects', AGAMemberRegistry),
+                                 ('columnar', ColumnarRegistry)):
+      AGAMember.use_registry(registry_class())
+      load_synthetic_roster(size)
+      ignore, seconds = timed(AGAMember.Registry.derive_ranks)
+      report('%s: derive_ranks' % name, seconds * 1000, 'ms')
+    AGAMember.use_registry(AGAMemberRegistry())
+    load_synthetic_roster(size)
+    sample = rng.sample(list(AGAMember.AllMembers), min(500, size))
+    fields = [(m.last_name, m.first_name, m.aga_id, m.membership_type, m.rating,
+               m.expiration_date) for m in sample]
+    uncached = [UncachedMember(*f) for f in fields]
+    cached = [AGAMember(*f) for f in fields]
+    for m in cached:
+      m.rank
+    before = measure('list and save 500, uncached rank', lambda: list_and_save(uncached))
+    after = measure('list and save 500, cached rank', lambda: list_and_save(cached))
+    assert before == after
+  AGAMember.use_registry(AGAMemberRegistry())
+
+
+@benchmark('pairings')
+def bench_pairings(args):
+  rng = random.Random(0)
+  for count in args.players:
+    case('%d players' % count)
+    load_synthetic_roster(count)
+    players = list(AGAMember.AllMembers)
+    history = mcmahon.History()
+    for round_number in range(1, args.rounds + 1):
+      (pairings, byes), seconds = timed(mcmahon.pair_round, players, history)
+      report('round %d' % round_number, seconds, 's')
+      for pairing in pairings:
+        winner = rng.choice('wb')
+        history.add_game(mcmahon.Game(pairing.white_id, pairing.black_id, winner,
+                                      pairing.handicap, pairing.komi))
+      for aga_id in byes:
+        history.add_bye(aga_id)
+
+
+def simulated_tournament(players, rounds, seed=0):
+  '''Pairs rounds rounds of a tournament between players with random
+     results.  Returns the Games and the byes, in the order played.'''
+  rng = random.Random(seed)
+  history = mcmahon.History()
+  games = []
+  byes = []
+  for round_number in range(rounds):
+    pairings, round_byes = mcmahon.pair_round(players, history)
+    for pairing in pairings:
+      game = mcmahon.Game(pairing.white_id, pairing.black_id, rng.choice('wb'),
+                          pairing.handicap, pairing.komi)
+      history.add_game(game)
+      games.append(game)
+    for aga_id in round_byes:
+      history.add_bye(aga_id)
+    byes.extend(round_byes)
+  return games, byes
+
+
+@benchmark('standings')
+def bench_standings(args):
+  for count in args.players:
+    case('%d players, %d rounds' % (count, args.rounds))
+    load_synthetic_roster(count)
+    players = list(AGAMember.AllMembers)
+    games, byes = simulated_tournament(players, args.rounds)
+    live = standings.Standings(players)
+    for aga_id in byes:
+      live.add_bye(aga_id)
+    start = time.perf_counter()
+    for game in games:
+      live.add_game(game)
+    incremental = (time.perf_counter() - start) / len(games)
+    start = time.perf_counter()
+    for i in range(len(games)):
+      standings.recompute_standings(players, games[:i + 1], byes)
+    full = (time.perf_counter() - start) / len(games)
+    report('per result, incremental', incremental * 1000000, 'us')
+    report('per result, full recomputation', full * 1000000, 'us')
+    report('speedup', full / incremental, 'x')
+
+
+def read_report_by_trial(file_name):
+  '''Reads the records of a report line by line through FileLineReader,
+     trying each pattern in turn, as AGAReport used to.  Returns the
+     records.'''
+  import aga_report_format as arf
+  records = []
+  with FileLineReader(file_name) as input:
+    while True:
+      line = input.readline()
+      if line == '':
+        break
+      m = arf.PLAYER_RECORD_RE.search(line)
+      if m:
+        records.append(arf.player_entry(m, input.line_number))
+        continue
+      m = arf.RESULT_RECORD.search(line)
+      if m:
+        records.append(mcmahon.Game(int(m.group('WHITE_ID')), int(m.group('BLACK_ID')),
+                                    m.group('WINNER'), int(m.group('HANDICAP')),
+                                    int(m.group('KOMI'))))
+        continue
+      m = arf.PAIRING_RECORD.search(line)
+      if m:
+        records.append(mcmahon.Pairing(int(m.group('WHITE_ID')),
+                                       int(m.group('BLACK_ID'))))
+        continue
+      m = arf.PASS_RECORD.search(line)
+      if m:
+        records.append(arf.Pass(int(m.group('AGA_ID'))))
+  return records
+
+
+@benchmark('report')
+def bench_report(args):
+  # aga_report_format needs the tournament module, so only import it
+  # when this benchmark runs.
+  import aga_report_format
+  with tempfile.TemporaryDirectory() as directory:
+    for count in args.players:
+      games = count * 50
+      case('%d players, %d games' % (count, games))
+      load_synthetic_roster(count)
+      file_name = os.path.join(directory, 'report.txt')
+      with open(file_name, 'w') as output:
+        output.writelines(synthetic_report_lines(list(AGAMember.AllMembers), games))
+      with open(file_name, 'r') as input:
+        lines = sum(1 for line in input)
+      report('size', os.path.getsize(file_name) / 1e6, 'MB')
+      ignore, seconds = timed(read_report_by_trial, file_name)
+      report('trying each pattern in turn', lines / seconds, 'lines/s')
+      def parse():
+        with open(file_name, 'r') as input:
+          return sum(1 for record in aga_report_format.parse_report(input))
+      ignore, seconds = timed(parse)
+      report('parse_report', lines / seconds, 'lines/s')
+      def load():
+        r = aga_report_format.AGAReport(file_name)
+        r.load()
+        return r
+      ignore, seconds = timed(load)
+      report('AGAReport.load', lines / seconds, 'lines/s')
+
+
+def read_all_lines(reader):
+  '''Reads every line from reader with readline, as the report readers
+     did.  Returns the number of lines.'''
+  count = 0
+  with reader:
+    while reader.readline():
+      count += 1
+  return count
+
+
+@benchmark('linereader')
+def bench_linereader(args):
+  rng = random.Random(0)
+  with tempfile.TemporaryDirectory() as directory:
+    for count in args.players:
+      games = count * 50
+      case('%d players, %d games' % (count, games))
+      load_synthetic_roster(count)
+      file_name = os.path.join(directory, 'report.txt')
+      with open(file_name, 'w') as output:
+        output.writelines(synthetic_report_lines(list(AGAMember.AllMembers), games))
+      def iterate():
+        with open(file_name, 'r') as input:
+          return sum(1 for line in input)
+      lines, seconds = timed(iterate)
+      report('file iteration', lines / seconds, 'lines/s')
+      ignore, seconds = timed(read_all_lines, FileLineReader(file_name))
+      report('readline', lines / seconds, 'lines/s')
+      targets = [rng.randint(1, lines) for i in range(args.queries)]
+      def seek_by_reading():
+        for target in targets:
+          with FileLineReader(file_name) as reader:
+            while reader.line_number < target - 1:
+              reader.readline()
+            reader.readline()
+      def seek_by_index():
+        with FileLineReader(file_name) as reader:
+          for target in targets:
+            reader.seek_line(target)
+            reader.readline()
+      ignore, reading = timed(seek_by_reading)
+      ignore, indexed = timed(seek_by_index)
+      report('%d random lines, reading up to each' % len(targets),
+             reading * 1000, 'ms')
+      report('%d random lines, seek_line' % len(targets), indexed * 1000, 'ms')
+
+
+@benchmark('import')
+def bench_import(args):
+  rng = random.Random(0)
+  with tempfile.TemporaryDirectory() as directory:
+    file_name = os.path.join(directory, 'preregistrations.csv')
+    for size in args.sizes:
+      case('%d members' % size)
+      load_synthetic_roster(size)
+      members = rng.sample(list(AGAMember.AllMembers), min(1000, size))
+      with open(file_name, 'w', newline='') as output:
+        writer = csv.writer(output)
+        writer.writerow(['AGA ID', 'Name', 'Rank'])
+        for member in members:
+          # A few misspelled names and unknown IDs.
+          last_name = member.last_name
+          if rng.random() < 0.05:
+            last_name = misspell(last_name, rng)
+          aga_id = member.aga_id if rng.random() > 0.02 else size + member.aga_id
+          writer.writerow([aga_id, '%s, %s' % (last_name, member.first_name),
+                           member.rank.name])
+      result, seconds = timed(bulk_import.import_preregistrations, file_name, [])
+      report('import %d rows' % len(members), seconds * 1000, 'ms')
+      report('resolved', len(result.members), 'players')
+
+
+def traced_registry_size(registry_class, rows):
+  '''Returns the memory allocated while loading rows into a new
+     registry_class, and the registry.'''
+  tracemalloc.start()
+  try:
+    registry = registry_class()
+    for row in rows:
+      registry.add_record(*parse_member_record(row))
+    size = tracemalloc.get_traced_memory()[0]
+  finally:
+    tracemalloc.stop()
+  return size, registry
+
+
+@benchmark('memory')
+def bench_memory(args):
+  for size in args.sizes:
+    case('%d members' % size)
+    rows = list(synthetic_member_rows(size))
+    object_bytes, objects = traced_registry_size(AGAMemberRegistry, rows)
+    column_bytes, columns = traced_registry_size(ColumnarRegistry, rows)
+    report('AGAMember objects', object_bytes / size, 'bytes/member')
+    report('columnar', column_bytes / size, 'bytes/member')
+    report('saving', 1 - column_bytes / object_bytes, 'fraction')
+    ignore, seconds = timed(lambda: sum(1 for member in objects.members
+                                        if member.rating and member.rating >= 1))
+    report('scan for dan players, objects', seconds * 1000, 'ms')
+    ignore, seconds = timed(lambda: sum(1 for rating in columns.ratings
+                                        if rating >= 1))
+    report('scan for dan players, columnar', seconds * 1000, 'ms')
+
+
+def traced_load(registry, file_name):
+  '''Loads the membership file file_name into registry as
+     read_member_file would.  Returns the memory still allocated
+     afterwards.'''
+  tracemalloc.start()
+  try:
+    registry.add_records(registry.read_records(file_name))
+    registry.derive_ranks()
+    return tracemalloc.get_traced_memory()[0]
+  finally:
+    tracemalloc.stop()
+
+
+def registration_session(registry, aga_ids, queries):
+  '''Looks at what registration shows of a few members: their names,
+     ranks and expiration dates, and searches for some more.'''
+  for member in registry.lookup_many(aga_ids):
+    '%s, %s %s %s' % (member.last_name, member.first_name, member.rank.name,
+                      member.expiration_date)
+  for query in queries:
+    registry.search(query)
+
+
+@benchmark('lazy')
+def bench_lazy(args):
+  rng = random.Random(0)
+  with tempfile.TemporaryDirectory() as directory:
+    file_name = os.path.join(directory, aga_roster.AGA_MEMBER_FILE_NAME)
+    for size in args.sizes:
+      case('%d members' % size)
+      write_synthetic_member_file(file_name, size)
+      aga_ids = [rng.randint(1, size) for i in range(300)]
+      for name, registry_class in (('eager', AGAMemberRegistry),
+                                   ('lazy', LazyRegistry)):
+        registry = registry_class()
+        ignore, seconds = timed(registry.add_records, registry.read_records(file_name))
+        registry.derive_ranks()
+        report('%s: load' % name, seconds * 1000, 'ms')
+        report('%s: memory' % name, traced_load(registry_class(), file_name) / size,
+               'bytes/member')
+        AGAMember.use_registry(registry)
+        queries = search_queries(args.queries)
+        ignore, seconds = timed(registration_session, registry, aga_ids, queries)
+        report('%s: 300 members and %d searches' % (name, len(queries)),
+               seconds * 1000, 'ms')
+        # Free the roster before loading the next, so that the garbage
+        # collector doesn't have both to look through.
+        AGAMember.use_registry(AGAMemberRegistry())
+        registry = None
+
+
+@benchmark('eligibility')
+def bench_eligibility(args):
+  dates = [datetime.date(2010, 1, 1) + datetime.timedelta(days)
+           for days in range(0, 20 * 365, 365)]
+  for size in args.sizes:
+    case('%d members' % size)
+    load_synthetic_roster(size)
+    members = AGAMember.AllMembers
+    ignore, seconds = timed(lambda: AGAMember.Registry.expiration_index)
+    report('build expiration index', seconds * 1000, 'ms')
+    index = AGAMember.Registry.expiration_index
+    def scan():
+      for date in dates:
+        [m for m in members if m.expiration_date and m.expiration_date < date]
+        [m for m in members if m.expiration_date and
+         date <= m.expiration_date < date + datetime.timedelta(30)]
+    def indexed():
+      for date in dates:
+        aga_roster.expired_members(index, date)
+        aga_roster.expiring_members(index, date, 30)
+    ignore, scanned = timed(scan)
+    ignore, bisected = timed(indexed)
+    report('%d expired and expiring queries, scan' % len(dates), scanned * 1000, 'ms')
+    report('%d expired and expiring queries, index' % len(dates), bisected * 1000, 'ms')
+    report('speedup', scanned / bisected, 'x')
+
+
+def scan_select(members, ranks, state, club, rated_since):
+  '''AGAMemberRegistry.select by looking at every member.'''
+  weakest, strongest = sorted(ranks, key=lambda rank: rank.value)
+  matches = []
+  for m in members:
+    value = aga_roster.rank_band_key(m)
+    if (value is not None and weakest.value <= value <= strongest.value and
+        m.state == state and m.club == club and m.last_rated and
+        m.last_rated >= rated_since):
+      matches.append(m)
+  return matches
+
+
+@benchmark('select')
+def bench_select(args):
+  rng = random.Random(0)
+  for size in args.sizes:
+    case('%d members' % size)
+    AGAMember.Registry.clear()
+    for row in realistic_member_rows(size):
+      AGAMember.fromCSVRecord(row)
+    registry = AGAMember.Registry
+    for name in ('rank', 'state', 'club', 'last_rated'):
+      ignore, seconds = timed(registry.index, name)
+      report('build %s index' % name, seconds * 1000, 'ms')
+    # Ask about the rank, state, club and recent play of members who
+    # have them all, so that every query finds someone.
+    complete = [m for m in registry.members
+                if aga_roster.rank_band_key(m) is not None and
+                m.state and m.club and m.last_rated]
+    queries = []
+    for i in range(args.queries):
+      m = rng.choice(complete)
+      value = m.rank.value
+      queries.append(((Rank(max(value - 2, 1)), Rank(min(value + 2, len(Rank)))),
+                      m.state, m.club, m.last_rated - datetime.timedelta(365)))
+    ignore, scanned = timed(lambda: [scan_select(registry.members, *q) for q in queries])
+    selected, indexed = timed(lambda: [registry.select(*q) for q in queries])
+    report('%d composite queries, scan' % len(queries), scanned * 1000, 'ms')
+    report('%d composite queries, indexes' % len(queries), indexed * 1000, 'ms')
+    report('speedup', scanned / indexed, 'x')
+    report('members found', sum(len(members) for members in selected), 'members')
+
+
+@benchmark('dispatch')
+def bench_dispatch(args):
+  rng = random.Random(0)
+  for count in (10, 100, 1000):
+    case('%d commands' % count)
+    table = command_loop.CommandTable()
+    words = set()
+    while len(words) < count:
+      words.add(''.join(rng.choice('abcdefghijklmnopqrstuvwxyz')
+                        for i in range(rng.randint(3, 8))))
+    words = sorted(words)
+    for word in words:
+      table.add_command(command_loop.Command(word, '%s(?P<INDEX>[0-9]*)' % word,
+                                             None, None))
+    inputs = ['%s%d' % (rng.choice(words), rng.randint(1, 99))
+              for i in range(args.queries)]
+    def linear():
+      for input in inputs:
+        for c in table.commands:
+          if c.match(input):
+            break
+    ignore, seconds = timed(lambda: table.index)
+    report('build index', seconds * 1000, 'ms')
+    ignore, linear_seconds = timed(linear)
+    ignore, indexed = timed(lambda: [table.find(input) for input in inputs])
+    report('trying every command', linear_seconds * 1e6 / len(inputs), 'us/line')
+    report('indexed', indexed * 1e6 / len(inputs), 'us/line')
+
+
+async def desk_session(path, lines, latencies):
+  '''Plays a registration desk: sends lines to the registration server
+     listening at path, one at a time, appending each one's latency to
+     latencies.'''
+  reader, writer = await asyncio.open_unix_connection(path)
+  await reader.readuntil(b'> ')
+  for line in lines:
+    start = time.perf_counter()
+    writer.write(line.encode() + b'\n')
+    await reader.readuntil(b'> ')
+    latencies.append(time.perf_counter() - start)
+  writer.close()
+  await writer.wait_closed()
+
+
+async def load_test(server, path, desks, lines_per_desk):
+  listener = await server.start(unix=path)
+  latencies = []
+  start = time.perf_counter()
+  await asyncio.gather(*[desk_session(path, lines, latencies)
+                         for lines in lines_per_desk])
+  elapsed = time.perf_counter() - start
+  listener.close()
+  await listener.wait_closed()
+  return latencies, elapsed
+
+
+@benchmark('server')
+def bench_server(args):
+  # registration_server needs the tournament module, through
+  # aga_report_format.
+  import aga_report_format
+  import registration_server
+  rng = random.Random(0)
+  size = min(args.sizes)
+  load_synthetic_roster(size)
+  queries = search_queries(args.queries)
+  with tempfile.TemporaryDirectory() as directory:
+    path = os.path.join(directory, 'desks')
+    for desks in args.desks:
+      case('%d desks, %d members' % (desks, size))
+      aga_report = aga_report_format.AGAReport(os.path.join(directory, 'players.txt'))
+      aga_report.tournament_header = 'Load test'
+      server = registration_server.RegistrationServer(aga_report)
+      lines_per_desk = []
+      for i in range(desks):
+        # Each desk searches for a name, then looks up an ID and
+        # registers that member, as a desk checking in players would.
+        lines = []
+        for j in range(args.queries // desks or 1):
+          lines.append('?%s' % rng.choice(queries))
+          lines.append('?%d' % rng.randint(1, size))
+          lines.append('r')
+        lines_per_desk.append(lines)
+      latencies, elapsed = asyncio.run(load_test(server, path, desks, lines_per_desk))
+      server.save()
+      latencies.sort()
+      report('commands', len(latencies) / elapsed, 'commands/s')
+      report('median latency', latencies[len(latencies) // 2] * 1000, 'ms')
+      report('95th percentile latency', latencies[len(latencies) * 95 // 100] * 1000, 'ms')
+      report('registered', len(aga_report.players), 'players')
+      os.remove(aga_report.file_name)
+
+
+@benchmark('simulate')
+def bench_simulate(args):
+  # simulate needs the tournament module, through aga_report_format.
+  import simulate
+  rng = random.Random(0)
+  count = min(args.players)
+  players = [simulate.SimulatedPlayer(aga_id, Rank(value), value + rng.gauss(0, 1))
+             for aga_id, value in enumerate(
+                 (rng.randint(Rank['20K'].value, Rank['5D'].value) for i in range(count)), 1)]
+  tournaments = 4 * simulate.BATCH_SIZE
+  case('%d players, %d rounds, %d tournaments' % (count, args.rounds, tournaments))
+  serial = None
+  for processes in sorted(set([1, 2, os.cpu_count()])):
+    def run():
+      for summary in simulate.simulate(players, tournaments, args.rounds,
+                                       processes=processes):
+        pass
+    ignore, seconds = timed(run)
+    serial = serial or seconds
+    report('%d processes' % processes, tournaments / seconds, 'tournaments/s')
+    report('%d processes, speedup' % processes, serial / seconds, 'x')
+
+
+@benchmark('lint')
+def bench_lint(args):
+  # lint_reports needs the tournament module, through aga_report_format.
+  import lint_reports
+  rng = random.Random(0)
+  size = min(args.sizes)
+  load_synthetic_roster(size)
+  members = list(AGAMember.AllMembers)
+  with tempfile.TemporaryDirectory() as directory:
+    for count in (20, 200):
+      case('%d reports of 100 players, %d members' % (count, size))
+      file_names = []
+      for i in range(count):
+        file_name = os.path.join(directory, 'report%d.txt' % i)
+        with open(file_name, 'w') as output:
+          output.writelines(synthetic_report_lines(rng.sample(members, 100), 300, i))
+        file_names.append(file_name)
+      for processes in sorted(set([1, os.cpu_count()])):
+        problems, seconds = timed(lambda: list(lint_reports.lint_reports(file_names,
+                                                                         processes)))
+        report('%d processes' % processes, count / seconds, 'files/s')
+      report('problems', len(problems), 'problems')
+
+
+@benchmark('suite')
+def bench_suite(args):
+  '''The operations registration depends on, against a realistic
+     membership file: names with a Zipf distribution, bad ratings and
+     missing expiration dates.'''
+  import aga_report_format
+  rng = random.Random(0)
+  cwd = os.getcwd()
+  with tempfile.TemporaryDirectory() as directory:
+    os.chdir(directory)
+    try:
+      member_file = aga_roster.AGA_MEMBER_FILE_NAME
+      snapshot_file = roster_snapshot.snapshot_file_name(member_file)
+      for size in args.sizes:
+        case('%d members' % size)
+        with open(member_file, 'w', newline='') as f:
+          writer = csv.writer(f, delimiter='\t', lineterminator='\n')
+          writer.writerows(realistic_member_rows(size))
+        def miss():
+          AGAMember.Registry.clear()
+          if os.path.exists(snapshot_file):
+            os.remove(snapshot_file)
+        measure('read_member_file, snapshot miss', AGAMember.read_member_file,
+                miss, args.repeat)
+        measure('read_member_file, snapshot hit', AGAMember.read_member_file,
+                AGAMember.Registry.clear, args.repeat)
+        queries = search_queries(args.queries)
+        measure('search %d queries' % len(queries),
+                lambda: [AGAMember.search(q) for q in queries], repeat=args.repeat)
+        # Some IDs that aren't in the roster, as when a player mistypes theirs.
+        ids = [rng.randint(1, size + size // 10) for i in range(args.queries)]
+        measure('lookupID %d IDs' % len(ids),
+                lambda: [AGAMember.lookupID(aga_id) for aga_id in ids],
+                repeat=args.repeat)
+        # Missing and zero ratings have no rank; see aga_roster.rating_rank.
+        ratings = [member.rating for member in AGAMember.AllMembers if member.rating]
+        measure('rank_from_rating %d ratings' % len(ratings),
+                lambda: [rank_from_rating(rating) for rating in ratings],
+                repeat=args.repeat)
+        measure('ranks_from_ratings %d ratings' % len(ratings),
+                lambda: ranks_from_ratings(ratings), repeat=args.repeat)
+        players = rng.sample(list(AGAMember.AllMembers), min(size, 1000))
+        report_file = 'report.txt'
+        with open(report_file, 'w') as output:
+          output.writelines(synthetic_report_lines(players, len(players) * 20))
+        loaded = aga_report_format.AGAReport(report_file)
+        measure('AGAReport.load, %d players' % len(players), loaded.load,
+                repeat=args.repeat)
+        measure('AGAReport.save, %d players' % len(players), loaded.save,
+                repeat=args.repeat)
+        miss()
+    finally:
+      os.chdir(cwd)
+
+
+def compare(old_file_name, results):
+  '''Writes how results have changed since the run saved in
+     old_file_name with --json.'''
+  with open(old_file_name, 'r') as f:
+    old = dict(((r['benchmark'], r['case'], r['label']), r['value'])
+               for r in json.load(f)['results'])
+  sys.stdout.write('== changes since %s\n' % old_file_name)
+  for r in results:
+    before = old.get((r['benchmark'], r['case'], r['label']))
+    if before:
+      sys.stdout.write('  %-60s %+8.1f%%\n' % (
+          '%s, %s: %s' % (r['benchmark'], r['case'], r['label']),
+          (r['value'] - before) * 100 / before))
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('benchmarks', nargs='*',
+                    help='Which benchmarks to run.  Runs all of them by default.')
+parser.add_argument('--sizes', type=int, nargs='+', default=[20000, 1000000],
+                    help='Roster sizes to benchmark against.')
+parser.add_argument('--queries', type=int, default=200,
+                    help='Number of search queries per roster size.')
+parser.add_argument('--players', type=int, nargs='+', default=[100, 300, 600, 1200],
+                    help='Tournament sizes to benchmark pairing against.')
+parser.add_argument('--rounds', type=int, default=6,
+                    help='Number of rounds to pair per tournament size.')
+parser.add_argument('--desks', type=int, nargs='+', default=[1, 4, 16, 64],
+                    help='Numbers of registration desks to load test the server with.')
+parser.add_argument('--repeat', type=int, default=3,
+                    help='Number of timings to take the best of.')
+parser.add_argument('--json', metavar='FILE',
+                    help='Also save the results in FILE, as JSON.')
+parser.add_argument('--compare', metavar='FILE',
+                    help='Compare the results with a run saved with --json.')
+
+
+def main():
+  args = parser.parse_args()
+  for name in args.benchmarks:
+    if name not in BENCHMARKS:
+      parser.error('Unknown benchmark %s.  Choose from %s.' %
+                   (name, ', '.join(sorted(BENCHMARKS))))
+  for name in args.benchmarks or sorted(BENCHMARKS):
+    sys.stdout.write('== %s\n' % name)
+    CURRENT['benchmark'] = name
+    BENCHMARKS[name](args)
+  if args.json:
+    with open(args.json, 'w') as f:
+      json.dump({'python': sys.version, 'arguments': sys.argv[1:],
+                 'results': RESULTS}, f, indent=1)
+  if args.compare:
+    compare(args.compare, RESULTS)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,193 @@
+# Registering the players who pre-registered for a tournament all at
+# once, from a spreadsheet export.
+#
+# The export is a tab or comma separated file with a row per player
+# giving their AGA ID and, optionally, their name and the rank they
+# asked to play at.  If the first row is a header the columns may be in
+# any order:
+#
+#   AGA ID (or ID)   the player's AGA ID
+#   Name             "Last, First" or "First Last"
+#   Last Name        instead of Name
+#   First Name
+#   Rank             e.g. 5K or 2D
+#
+# Without a header the columns are AGA ID, name and rank.
+
+import collections
+import csv
+import datetime
+from aga_roster import AGAMember
+from rank import Rank
+
+
+Preregistration = collections.namedtuple(
+    'Preregistration', 'line_number aga_id last_name first_name rank')
+
+COLUMN_NAMES = {
+    'aga id': 'aga_id', 'aga_id': 'aga_id', 'agaid': 'aga_id', 'id': 'aga_id',
+    'name': 'name',
+    'last name': 'last_name', 'last_name': 'last_name', 'last': 'last_name',
+    'first name': 'first_name', 'first_name': 'first_name', 'first': 'first_name',
+    'rank': 'rank'
+    }
+
+DEFAULT_COLUMNS = ('aga_id', 'name', 'rank')
+
+
+def split_name(name):
+  '''Returns the last and first names in name.'''
+  if ',' in name:
+    last_name, first_name = name.split(',', 1)
+  elif ' ' in name.strip():
+    first_name, last_name = name.strip().rsplit(' ', 1)
+  else:
+    last_name, first_name = name, ''
+  return last_name.strip() or None, first_name.strip() or None
+
+
+def read_preregistrations(input):
+  '''Reads the pre-registration export input, a file open for reading.
+     Returns a list of Preregistrations and a list of (line number,
+     reason) for the rows that couldn't be read.'''
+  text = input.read()
+  dialect = csv.excel_tab if text.count('\t') >= text.count(',') else csv.excel
+  rows = csv.reader(text.splitlines(), dialect)
+  columns = None
+  preregistrations = []
+  problems = []
+  for line_number, row in enumerate(rows, 1):
+    row = [field.strip() for field in row]
+    if not any(row):
+      continue
+    if columns is None:
+      if not row[0].isdigit():
+        columns = [COLUMN_NAMES.get(field.lower()) for field in row]
+        if 'aga_id' not in columns:
+          problems.append((line_number, 'no AGA ID column'))
+          return preregistrations, problems
+        continue
+      columns = DEFAULT_COLUMNS
+    fields = dict((column, field) for column, field in zip(columns, row)
+                  if column and field)
+    if 'name' in fields:
+      fields['last_name'], fields['first_name'] = split_name(fields.pop('name'))
+    if not fields.get('aga_id', '').isdigit():
+      problems.append((line_number, 'no AGA ID'))
+      continue
+    aga_id = int(fields['aga_id'])
+    rank = None
+    if 'rank' in fields:
+      rank = Rank.__members__.get(fields['rank'].upper())
+      if rank is None:
+        problems.append((line_number, 'unknown rank %s' % fields['rank']))
+        continue
+    preregistrations.append(Preregistration(
+        line_number, aga_id, fields.get('last_name'), fields.get('first_name'), rank))
+  return preregistrations, problems
+
+
+class ImportReport (object):
+  '''ImportReport describes how a set of pre-registrations matched the
+     AGA membership list.
+
+       matched         (preregistration, member) pairs for the members
+                       whose names agree with the pre-registration
+       name_mismatches (preregistration, member) pairs for the members
+                       whose names don't; they may be typos of the AGA
+                       ID, so they are left to be registered by hand
+       expired         (preregistration, member) pairs for the members
+                       whose membership will have expired by the
+                       tournament; they are in matched or name_mismatches
+                       too
+       unknown         the preregistrations whose AGA IDs aren't known
+       duplicates      the preregistrations of players already registered
+                       or listed earlier in the same file
+       problems        (line number, reason) for the unreadable rows'''
+
+  def __init__(self):
+    self.matched = []
+    self.name_mismatches = []
+    self.expired = []
+    self.unknown = []
+    self.duplicates = []
+    self.problems = []
+
+  @property
+  def members(self):
+    '''The members to register: those whose names matched.'''
+    return [member for prereg, member in self.matched]
+
+  def write(self, output):
+    output.write('%d matched, %d with names that differ, %d expired, '
+                 '%d unknown, %d duplicates, %d unreadable.\n' % (
+                     len(self.matched), len(self.name_mismatches), len(self.expired),
+                     len(self.unknown), len(self.duplicates), len(self.problems)))
+    if self.name_mismatches:
+      output.write('Not registered, check and register by hand:\n')
+    for prereg, member in self.name_mismatches:
+      output.write('  line %d: %d is %s, %s in the AGA list, not %s\n' % (
+          prereg.line_number, member.aga_id, member.last_name, member.first_name,
+          ', '.join(name for name in (prereg.last_name, prereg.first_name) if name)))
+    for prereg, member in self.expired:
+      output.write('  line %d: %d %s, %s: membership expires %s\n' % (
+          prereg.line_number, member.aga_id, member.last_name, member.first_name,
+          member.expiration_date))
+    for prereg in self.unknown:
+      output.write('  line %d: no AGA member %d\n' % (prereg.line_number, prereg.aga_id))
+    for line_number, reason in self.problems:
+      output.write('  line %d: %s\n' % (line_number, reason))
+
+
+def names_agree(prereg, member):
+  if prereg.last_name and prereg.last_name.lower() != (member.last_name or '').lower():
+    return False
+  if prereg.first_name and prereg.first_name.lower() != (member.first_name or '').lower():
+    return False
+  return True
+
+
+def resolve_preregistrations(preregistrations, registered=(), date=None):
+  '''Matches preregistrations against the AGA membership list, looking
+     them all up at once, and returns an ImportReport.  registered is the
+     players already registered.  Memberships are checked against date,
+     by default today.'''
+  if date is None:
+    date = datetime.date.today()
+  report = ImportReport()
+  seen = set(player.aga_id for player in registered)
+  unique = []
+  for prereg in preregistrations:
+    if prereg.aga_id in seen:
+      report.duplicates.append(prereg)
+    else:
+      seen.add(prereg.aga_id)
+      unique.append(prereg)
+  found = AGAMember.lookup_many([prereg.aga_id for prereg in unique])
+  for prereg, member in zip(unique, found):
+    if member is None or member.is_placeholder:
+      report.unknown.append(prereg)
+      continue
+    if names_agree(prereg, member):
+      report.matched.append((prereg, member))
+    else:
+      report.name_mismatches.append((prereg, member))
+    if member.expiration_date is not None and member.expiration_date < date:
+      report.expired.append((prereg, member))
+  return report
+
+
+def import_preregistrations(file_name, registered, date=None):
+  '''Reads the pre-registration export file_name and resolves it against
+     the AGA membership list and registered, the players already
+     registered.  Gives each matched member the rank they asked for.
+     Returns the ImportReport; registering its members is up to the
+     caller.'''
+  with open(file_name, 'r', newline='') as input:
+    preregistrations, problems = read_preregistrations(input)
+  report = resolve_preregistrations(preregistrations, registered, date)
+  report.problems = problems
+  for prereg, member in report.matched:
+    if prereg.rank:
+      member.play_at(prereg.rank)
+  return report
@@ -0,0 +1,330 @@
+# A column oriented alternative to AGAMemberRegistry.  Rather than one
+# AGAMember object per member, the membership list is kept in parallel
+# arrays, with names and membership types interned in a string table.
+#
+# To use it:
+#
+#   AGAMember.use_registry(ColumnarRegistry())
+#   AGAMember.ensure_loaded()
+
+import array
+import datetime
+import itertools
+import math
+from aga_roster import AGAMember, AGAMemberRegistry, _supersedes, rating_rank
+from rank import Rank, ranks_from_ratings
+
+
+# RANKS_BY_VALUE[rank.value] is rank.
+RANKS_BY_VALUE = (None,) + tuple(Rank)
+
+
+class StringTable (object):
+  '''StringTable interns strings, giving each distinct string a small
+     integer code.  None is given the code -1.'''
+
+  def __init__(self):
+    self.strings = []
+    self.codes = {}
+
+  def __len__(self):
+    return len(self.strings)
+
+  def code(self, string):
+    if string is None:
+      return -1
+    code = self.codes.get(string)
+    if code is None:
+      code = len(self.strings)
+      self.strings.append(string)
+      self.codes[string] = code
+    return code
+
+  def string(self, code):
+    if code < 0:
+      return None
+    return self.strings[code]
+
+
+class MemberView (AGAMember):
+  '''MemberView is an AGAMember whose data lives in a row of a
+     ColumnarRegistry.  Views are cheap to make and two views of the
+     same row are equal, so they can be handed out freely.'''
+
+  __slots__ = ('roster', 'row')
+
+  def __init__(self, roster, row):
+    self.roster = roster
+    self.row = row
+
+  def __eq__(self, other):
+    if not isinstance(other, MemberView):
+      return NotImplemented
+    return self.roster is other.roster and self.row == other.row
+
+  def __hash__(self):
+    return hash((id(self.roster), self.row))
+
+  @property
+  def last_name(self):
+    roster = self.roster
+    return roster.strings.string(roster.last_names[self.row])
+
+  @property
+  def first_name(self):
+    roster = self.roster
+    return roster.strings.string(roster.first_names[self.row])
+
+  @property
+  def aga_id(self):
+    return self.roster.aga_ids[self.row]
+
+  @property
+  def membership_type(self):
+    roster = self.roster
+    return roster.strings.string(roster.membership_types[self.row])
+
+  @property
+  def rating(self):
+    rating = self.roster.ratings[self.row]
+    if math.isnan(rating):
+      return None
+    return rating
+
+  @property
+  def rank(self):
+    value = self.roster.ranks[self.row]
+    if value:
+      return RANKS_BY_VALUE[value]
+    rank = rating_rank(self.rating)
+    self.roster.ranks[self.row] = rank.value
+    return rank
+
+  @property
+  def expiration_date(self):
+    ordinal = self.roster.expirations[self.row]
+    if not ordinal:
+      return None
+    return datetime.date.fromordinal(ordinal)
+
+  @property
+  def club(self):
+    roster = self.roster
+    return roster.strings.string(roster.clubs[self.row])
+
+  @property
+  def state(self):
+    roster = self.roster
+    return roster.strings.string(roster.states[self.row])
+
+  @property
+  def last_rated(self):
+    ordinal = self.roster.last_rated[self.row]
+    if not ordinal:
+      return None
+    return datetime.date.fromordinal(ordinal)
+
+  @property
+  def _playing_at(self):
+    return RANKS_BY_VALUE[self.roster.playing_at[self.row]]
+
+  @_playing_at.setter
+  def _playing_at(self, rank):
+    self.roster.playing_at[self.row] = rank.value if rank else 0
+
+
+class MemberViews (object):
+  '''The sequence of MemberViews of every row of a ColumnarRegistry.'''
+
+  def __init__(self, roster):
+    self.roster = roster
+
+  def __len__(self):
+    return len(self.roster._rows)
+
+  def __getitem__(self, index):
+    count = len(self)
+    if index < 0:
+      index += count
+    if index < 0 or index >= count:
+      raise IndexError('MemberViews index out of range')
+    if not self.roster.removed_rows:
+      return MemberView(self.roster, index)
+    return next(itertools.islice(iter(self), index, None))
+
+  def __iter__(self):
+    roster = self.roster
+    for row in roster._rows.values():
+      yield MemberView(roster, row)
+
+
+class ColumnarRegistry (AGAMemberRegistry):
+  '''ColumnarRegistry holds the AGA membership list in parallel arrays,
+     one element per member:
+
+       aga_ids            the AGA ID
+       last_names         StringTable code of the last name
+       first_names        StringTable code of the first name, or -1
+       membership_types   StringTable code of the membership type, or -1
+       ratings            the rating, or NaN if there is none
+       expirations        the expiration date's ordinal, or 0
+       clubs              StringTable code of the club, or -1
+       states             StringTable code of the state, or -1
+       last_rated         the ordinal of the date of the last rated
+                          game, or 0
+       ranks              the value of the Rank derived from the rating,
+                          or 0 if it hasn't been derived yet
+       playing_at         the value of the Rank played at, or 0
+
+     The rows of removed and superseded members are left in place, so
+     that views of them stay valid, and noted in removed_rows.  _rows
+     maps each AGA ID to its current row, in the order the IDs were
+     added.
+
+     It implements the same duplicate ID policy as AGAMemberRegistry
+     and hands out MemberViews.'''
+
+  def __init__(self):
+    self.members = MemberViews(self)
+    self.duplicate_ids = set()
+    self._name_index = None
+    self._fuzzy_index = None
+    self.clear()
+
+  def clear(self):
+    self.strings = StringTable()
+    self.aga_ids = array.array('q')
+    self.last_names = array.array('l')
+    self.first_names = array.array('l')
+    self.membership_types = array.array('l')
+    self.ratings = array.array('d')
+    self.expirations = array.array('l')
+    self.clubs = array.array('l')
+    self.states = array.array('l')
+    self.last_rated = array.array('l')
+    self.ranks = array.array('b')
+    self.playing_at = array.array('b')
+    self.removed_rows = set()
+    self.duplicate_ids.clear()
+    self._name_index = None
+    self._fuzzy_index = None
+    self._indexes = {}
+    self._rows = {}
+
+  def add(self, member):
+    return self.add_record(member.last_name, member.first_name, member.aga_id,
+                           member.membership_type, member.rating,
+                           member.expiration_date, member.club, member.state,
+                           member.last_rated)
+
+  def add_record(self, last_name, first_name, aga_id, membership_type, rating,
+                 expiration_date, club=None, state=None, last_rated=None):
+    row = self._rows.get(aga_id)
+    if row is not None:
+      existing = MemberView(self, row)
+      new = AGAMember(last_name, first_name, aga_id, membership_type, rating,
+                      expiration_date)
+      if not (new.is_placeholder or existing.is_placeholder):
+        self.duplicate_ids.add(aga_id)
+      if not _supersedes(new, existing):
+        return existing
+      # As in AGAMemberRegistry the new member replaces the old one,
+      # which keeps its data for anyone holding on to it.
+      self.removed_rows.add(row)
+      string = self.strings.string
+      self._unindex_names(aga_id, string(self.last_names[row]),
+                          string(self.first_names[row]))
+      self._unfile_member(existing)
+    row = self._append_row(aga_id)
+    return self._write_row(row, last_name, first_name, aga_id, membership_type,
+                           rating, expiration_date, club, state, last_rated)
+
+  def _append_row(self, aga_id):
+    '''Adds an empty row for aga_id.  Returns the row.'''
+    row = len(self.aga_ids)
+    # Replacing a superseded row keeps aga_id's place in _rows.
+    self._rows[aga_id] = row
+    self.aga_ids.append(aga_id)
+    self.last_names.append(-1)
+    self.first_names.append(-1)
+    self.membership_types.append(-1)
+    self.ratings.append(0.0)
+    self.expirations.append(0)
+    self.clubs.append(-1)
+    self.states.append(-1)
+    self.last_rated.append(0)
+    self.ranks.append(0)
+    self.playing_at.append(0)
+    return row
+
+  def update_record(self, last_name, first_name, aga_id, membership_type, rating,
+                    expiration_date, club=None, state=None, last_rated=None):
+    return self._write_row(self._rows[aga_id], last_name, first_name, aga_id,
+                           membership_type, rating, expiration_date, club, state,
+                           last_rated)
+
+  def _write_row(self, row, last_name, first_name, aga_id, membership_type, rating,
+                 expiration_date, club, state, last_rated):
+    string = self.strings.string
+    self._unindex_names(aga_id, string(self.last_names[row]),
+                        string(self.first_names[row]))
+    view = MemberView(self, row)
+    self._unfile_member(view)
+    code = self.strings.code
+    self.last_names[row] = code(last_name)
+    self.first_names[row] = code(first_name)
+    self.membership_types[row] = code(membership_type)
+    self.ratings[row] = math.nan if rating is None else rating
+    self.ranks[row] = 0
+    self.expirations[row] = expiration_date.toordinal() if expiration_date else 0
+    self.clubs[row] = code(club)
+    self.states[row] = code(state)
+    self.last_rated[row] = last_rated.toordinal() if last_rated else 0
+    self._index_names(aga_id, last_name, first_name)
+    self._file_member(view)
+    return view
+
+  def remove_many(self, aga_ids):
+    string = self.strings.string
+    for aga_id in aga_ids:
+      row = self._rows.pop(aga_id, None)
+      if row is None:
+        continue
+      self.removed_rows.add(row)
+      self._unindex_names(aga_id, string(self.last_names[row]),
+                          string(self.first_names[row]))
+      self._unfile_member(MemberView(self, row))
+
+  def member_ids(self):
+    return self._rows.keys()
+
+  def derive_ranks(self):
+    '''Fills in the ranks column, converting every rating in one pass.'''
+    ratings = [-30 if not rating or math.isnan(rating) else rating
+               for rating in self.ratings]
+    for row, rank in enumerate(ranks_from_ratings(ratings)):
+      if rank is not None:
+        self.ranks[row] = rank.value
+
+  def lookup(self, aga_id):
+    row = self._rows.get(aga_id)
+    if row is None:
+      return None
+    return MemberView(self, row)
+
+  def lookup_many(self, aga_ids):
+    get = self._rows.get
+    result = []
+    for aga_id in aga_ids:
+      row = get(aga_id)
+      result.append(None if row is None else MemberView(self, row))
+    return result
+
+  def name_entries(self):
+    string = self.strings.string
+    if not self.removed_rows:
+      return zip(self.aga_ids,
+                 map(string, self.last_names),
+                 map(string, self.first_names))
+    return ((aga_id, string(self.last_names[row]), string(self.first_names[row]))
+            for aga_id, row in self._rows.items())
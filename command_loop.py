@@ -1,43 +1,239 @@
 # A library for applications that provide simple interactive text
 # based interfaces.
 
+import math
 import re
 import sys
+import time
+import weakref
+
+try:
+  import readline
+except ImportError:
+  readline = None
+
+
+def literal_prefix(regexp):
+  '''Returns the literal text that every string regexp matches starts
+     with, which may be ''.'''
+  pattern = regexp.pattern
+  if not isinstance(pattern, str) or regexp.flags & re.VERBOSE or \
+     has_top_level_alternative(pattern):
+    return ''
+  prefix = []
+  i = 0
+  while i < len(pattern):
+    c = pattern[i]
+    if c == '\\' and i + 1 < len(pattern) and not pattern[i + 1].isalnum():
+      literal, width = pattern[i + 1], 2
+    elif c == '[' and pattern[i + 2:i + 3] == ']' and pattern[i + 1] not in '^\\]':
+      literal, width = pattern[i + 1], 3
+    elif c.isalnum() or c in ' _-<>=:,;!@#%&\'"/~`':
+      literal, width = c, 1
+    else:
+      break
+    if pattern[i + width:i + width + 1] in ('*', '?', '+', '{'):
+      # The literal is optional or repeated.
+      break
+    prefix.append(literal)
+    i += width
+  return ''.join(prefix)
+
+
+def has_top_level_alternative(pattern):
+  '''Returns whether pattern has a | outside all groups and sets.'''
+  depth = 0
+  in_set = False
+  i = 0
+  while i < len(pattern):
+    c = pattern[i]
+    if c == '\\':
+      i += 1
+    elif in_set:
+      in_set = c != ']'
+    elif c == '[':
+      in_set = True
+      # A ] straight after the [ or [^ is part of the set.
+      if pattern[i + 1:i + 2] == '^':
+        i += 1
+      if pattern[i + 1:i + 2] == ']':
+        i += 1
+    elif c == '(':
+      depth += 1
+    elif c == ')':
+      depth -= 1
+    elif c == '|' and depth == 0:
+      return True
+    i += 1
+  return False
+
+
+class TrieNode (object):
+  __slots__ = ('children', 'commands')
+
+  def __init__(self):
+    self.children = {}
+    self.commands = []
+
+
+class CommandIndex (object):
+  '''CommandIndex files commands in a trie under the lower cased literal
+     prefixes of their regular expressions, so that finding the
+     commands that might match an input line takes time proportional
+     to the length of the line rather than to the number of commands.
+     Commands whose regular expressions don't start with a literal are
+     candidates for every line.'''
+
+  def __init__(self, commands):
+    self.root = TrieNode()
+    for position, command in enumerate(commands):
+      node = self.root
+      for c in command.prefix.lower():
+        child = node.children.get(c)
+        if child is None:
+          child = node.children[c] = TrieNode()
+        node = child
+      node.commands.append((position, command))
+
+  def candidates(self, input):
+    '''Returns the commands that might match input, in table order.'''
+    node = self.root
+    found = list(node.commands)
+    for c in input.lower():
+      node = node.children.get(c)
+      if node is None:
+        break
+      found.extend(node.commands)
+    found.sort(key=lambda entry: entry[0])
+    return [command for position, command in found]
+
+  def completions(self, text):
+    '''Returns the ways to complete text, the beginning of a line: the
+       prefixes of the commands that begin with text and, for commands
+       whose prefix text begins with, whatever their completers offer.'''
+    results = []
+    node = self.root
+    path = [node]
+    for c in text.lower():
+      node = node.children.get(c)
+      if node is None:
+        break
+      path.append(node)
+    else:
+      stack = [node]
+      while stack:
+        below = stack.pop()
+        stack.extend(below.children.values())
+        for position, command in below.commands:
+          if command.prefix:
+            results.append(command.prefix)
+    for node in path:
+      for position, command in node.commands:
+        if command.completer:
+          typed = text[:len(command.prefix)]
+          results.extend(typed + completion
+                         for completion in command.completer(text[len(command.prefix):]))
+    return sorted(set(results))
 
 
 class CommandTable (object):
   def __init__(self, prompt=None):
     self.commands = []
     self.prompt = prompt if prompt else '> '
+    # A CommandMetrics once command timings have been collected, which
+    # they are while timing is true.
+    self.metrics = None
+    self.timing = False
+    # The CommandIndex of commands, built when first needed.
+    self._index = None
+
+  def enable_metrics(self):
+    if self.metrics is None:
+      self.metrics = CommandMetrics()
+    self.timing = True
+    return self.metrics
+
+  def disable_metrics(self):
+    '''Stops timing commands, keeping the timings collected so far.'''
+    self.timing = False
+
+  def recording_metrics(self):
+    '''Returns the CommandMetrics to record timings in, or None if
+       commands aren't being timed.'''
+    return self.metrics if self.timing else None
 
-  def __call__(self, command_name, command_regular_expression):
+  def __call__(self, command_name, command_regular_expression, completer=None):
     '''CommandTable can serve as a decorator for definiing commands.'''
     def finish_command(action_function):
       cmd = Command(command_name, command_regular_expression,
-                    action_function.__doc__, action_function)
-      self.commands.append(cmd)
+                    action_function.__doc__, action_function, completer)
+      self.add_command(cmd)
       return cmd
     return finish_command
 
+  @property
+  def index(self):
+    if self._index is None:
+      self._index = CommandIndex(self.commands)
+    return self._index
+
+  def find(self, input):
+    '''Returns the first command that matches input, and the match, or
+       None, None if there is none.'''
+    for c in self.index.candidates(input):
+      m = c.match(input)
+      if m:
+        return c, m
+    return None, None
+
+  def read_line(self):
+    '''Prompts for and returns a line of input, or None at the end of
+       the input.'''
+    if readline is not None and sys.stdin.isatty():
+      try:
+        return input(self.prompt)
+      except EOFError:
+        return None
+    sys.stdout.write(self.prompt)
+    sys.stdout.flush()
+    line = sys.stdin.readline()
+    return line if line else None
+
+  def complete(self, text, state):
+    '''A readline completer.  With no completer delimiters text is the
+       whole line up to the cursor.'''
+    if state == 0:
+      self.completions = self.index.completions(text)
+    if state < len(self.completions):
+      return self.completions[state]
+    return None
+
   def command_loop(self, state=None):
     '''Loop, reading commands from the terminal and executing them.
        The CommandTable itself, the re match results and state are
        passed to each command.'''
+    if readline is not None and sys.stdin.isatty():
+      readline.set_completer(self.complete)
+      readline.set_completer_delims('')
+      readline.parse_and_bind('tab: complete')
     try:
       while True:
-        sys.stdout.write(self.prompt)
-        sys.stdout.flush()
-        input = sys.stdin.readline().strip()
+        line = self.read_line()
+        if line is None:
+          break
+        input = line.strip()
         if not input:
           continue
-        done = False
-        for c in self.commands:
-          m = c.match(input)
-          if m:
-            c.doit(self, m, state)
-            done = True
-            break
-        if not done:
+        metrics = self.recording_metrics()
+        if metrics is None:
+          c, m = self.find(input)
+        else:
+          start = time.perf_counter()
+          c, m = self.find(input)
+          metrics.record_match(c.name if c else NOT_FOUND, time.perf_counter() - start)
+        if c:
+          c.doit(self, m, state)
+        else:
           sys.stderr.write('Command not found.\n')
         sys.stdout.flush()
         sys.stderr.flush()
@@ -47,6 +243,7 @@ class CommandTable (object):
 
   def add_command(self, command):
     self.commands.append(command)
+    self._index = None
 
   def help(self, match):
     for c in self.commands:
@@ -58,22 +255,136 @@ class Command (object):
      be called if the regular expression matches the input line.
      Command can be used as a decorator for defining new commands.'''
 
-  AllCommands = []
+  # Every Command still in use.  Weak, so that making commands, in
+  # tests say, doesn't accumulate them forever.
+  AllCommands = weakref.WeakSet()
 
-  def __init__(self, name, regexp, description, action):
+  def __init__(self, name, regexp, description, action, completer=None):
     if isinstance(regexp, str):
       regexp = re.compile(regexp)
     self.name = name
     self.regexp = regexp
     self.description = description
     self.action = action
-    self.__class__.AllCommands.append(self)
+    # Called with the text typed after prefix, returns the ways that
+    # text can be completed.
+    self.completer = completer
+    self.prefix = literal_prefix(regexp)
+    self.__class__.AllCommands.add(self)
 
   def match(self, command_input):
     return self.regexp.fullmatch(command_input)
 
   def doit(self, command_table, match, state):
-    self.action(command_table=command_table, match=match, state=state)
+    metrics = command_table.recording_metrics()
+    if metrics is None:
+      self.action(command_table=command_table, match=match, state=state)
+      return
+    start = time.perf_counter()
+    try:
+      self.action(command_table=command_table, match=match, state=state)
+    finally:
+      metrics.record_action(self.name, time.perf_counter() - start)
+
+
+# The name metrics are recorded under for input no command matched.
+NOT_FOUND = '(not found)'
+
+
+class LatencyHistogram (object):
+  '''LatencyHistogram counts durations in buckets whose bounds grow
+     geometrically, so percentiles are accurate to within BUCKET_RATIO
+     however many durations are added.'''
+
+  SMALLEST = 1e-6
+  BUCKET_RATIO = 1.1
+
+  def __init__(self):
+    self.buckets = {}
+    self.count = 0
+    self.total = 0.0
+
+  def add(self, seconds):
+    if seconds <= self.SMALLEST:
+      bucket = 0
+    else:
+      bucket = math.ceil(math.log(seconds / self.SMALLEST, self.BUCKET_RATIO))
+    self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+    self.count += 1
+    self.total += seconds
+
+  def percentile(self, p):
+    '''Returns the upper bound of the bucket holding the pth percentile
+       duration, or None if there are none.'''
+    if not self.count:
+      return None
+    rank = math.ceil(self.count * p / 100)
+    seen = 0
+    for bucket in sorted(self.buckets):
+      seen += self.buckets[bucket]
+      if seen >= rank:
+        return self.SMALLEST * self.BUCKET_RATIO ** bucket
+
+
+class CommandMetrics (object):
+  '''CommandMetrics records, for each command name, how long finding the
+     command that matched the input took and how long its action took.'''
+
+  PERCENTILES = (50, 95, 99)
+
+  def __init__(self):
+    self.match_times = {}
+    self.action_times = {}
+
+  def record_match(self, name, seconds):
+    histogram = self.match_times.get(name)
+    if histogram is None:
+      histogram = self.match_times[name] = LatencyHistogram()
+    histogram.add(seconds)
+
+  def record_action(self, name, seconds):
+    histogram = self.action_times.get(name)
+    if histogram is None:
+      histogram = self.action_times[name] = LatencyHistogram()
+    histogram.add(seconds)
+
+  def rows(self):
+    '''Returns a row per command: its name, the number of calls and the
+       match and action percentiles, in milliseconds.'''
+    rows = []
+    empty = LatencyHistogram()
+    for name in sorted(self.match_times):
+      row = [name, self.match_times[name].count]
+      for histogram in (self.match_times[name], self.action_times.get(name, empty)):
+        for p in self.PERCENTILES:
+          seconds = histogram.percentile(p)
+          row.append(None if seconds is None else seconds * 1000)
+      rows.append(row)
+    return rows
+
+  def columns(self):
+    return (['command', 'calls'] +
+            ['match_p%d_ms' % p for p in self.PERCENTILES] +
+            ['action_p%d_ms' % p for p in self.PERCENTILES])
+
+  def write(self, output):
+    output.write('%-12s %6s  %-26s %s\n' % ('', '', 'match ms (p50 p95 p99)',
+                                           'action ms (p50 p95 p99)'))
+    for row in self.rows():
+      output.write('%-12s %6d  %s  %s\n' % (
+          row[0], row[1], format_times(row[2:5]), format_times(row[5:8])))
+
+  def write_tsv(self, output):
+    '''Writes the metrics as tab separated values, for comparing sessions.'''
+    output.write('\t'.join(self.columns()) + '\n')
+    for row in self.rows():
+      output.write('\t'.join('' if field is None else
+                             '%.4f' % field if isinstance(field, float) else str(field)
+                             for field in row) + '\n')
+
+
+def format_times(times):
+  return ' '.join('%8s' % ('-' if t is None else '%.3f' % t) for t in times)
 
 
 class Exit (Exception):
@@ -94,3 +405,18 @@ def HELP_COMMAND(command_table, match, **ignore):
   '''Show command help.'''
   command_table.help(match)
 
+
+@COMMON_COMMANDS('stats', re.compile('stats( +(?P<SWITCH>on|off))?', re.IGNORECASE))
+def STATS_COMMAND(command_table, match, **ignore):
+  '''Show how long each command takes.  "stats on" and "stats off" start and stop timing them.'''
+  switch = (match.group('SWITCH') or '').lower()
+  if switch == 'on':
+    command_table.enable_metrics()
+  elif switch == 'off':
+    command_table.disable_metrics()
+  elif command_table.metrics is None:
+    sys.stdout.write('Commands are not being timed.  Use "stats on" to time them.\n')
+  else:
+    command_table.metrics.write(sys.stdout)
+    if not command_table.timing:
+      sys.stdout.write('Timing is off.  Use "stats on" to resume it.\n')
@@ -1,12 +1,31 @@
+import array
+import os
 
 
 class FileLineReader (object):
-  '''We use FileLineReader to read a file line by line while tracling the current line number.'''
+  '''We use FileLineReader to read a file line by line while tracling the current line number.
+
+     Lines that have been read can be pushed back with unreadline, any
+     number of them, to be read again.
+
+     The byte offset of the start of each line is indexed the first time
+     it is needed, and only as far as it is needed, so that seek_line
+     can move straight to any line and getline can fetch any line to
+     show as the context of an error.'''
+
+  BLOCK_SIZE = 1 << 16
+
   def __init__(self, filename):
     self.filename = filename
     self.line_number = None
     self.file = None
-    self.unread = None
+    # Lines pushed back by unreadline, the last one pushed back last.
+    self.pushed = []
+    # offsets[n - 1] is the byte offset of line n.  index_file is read to
+    # extend offsets, from indexed, the offset it has been read to.
+    self.offsets = None
+    self.indexed = 0
+    self.index_file = None
 
   def __enter__(self):
     self.file = open(self.filename, 'r')
@@ -14,28 +33,109 @@ class FileLineReader (object):
     return self
 
   def __exit__(self, *exc):
-    self.file.close()
+    for f in (self.file, self.index_file):
+      if f is not None:
+        f.close()
     self.file = None
+    self.index_file = None
     self.line_number = None
 
+  def __iter__(self):
+    while True:
+      line = self.readline()
+      if not line:
+        return
+      yield line
+
   @property
   def name(self):
     return self.filename
 
   def readline(self):
-    if self.unread:
-      try:
-        return self.unread
-      finally:
-        self.unread = None
-    line = self.file.readline()
-    self.line_number += 1
+    if self.pushed:
+      line = self.pushed.pop()
+    else:
+      line = self.file.readline()
+    if line:
+      self.line_number += 1
     return line
 
   def unreadline(self, line):
-    self.unread = line
+    '''Pushes line back, to be returned by the next readline.'''
+    self.pushed.append(line)
+    self.line_number -= 1
 
   def where(self):
     '''Returns the file name and the line number of the last line read as a string suitable for error messages.'''
     return '%s %d' % (self.name, self.line_number)
 
+  def _index_through(self, line_number):
+    '''Extends the index of line offsets to include line_number, if the
+       file is that long.'''
+    if self.offsets is None:
+      self.offsets = array.array('q', [0])
+    offsets = self.offsets
+    while len(offsets) < line_number and self.indexed is not None:
+      index_file = self._open_index_file()
+      index_file.seek(self.indexed)
+      block = index_file.read(self.BLOCK_SIZE)
+      if not block:
+        self.indexed = None
+        break
+      find = block.find
+      i = find(b'\n')
+      while i >= 0:
+        offsets.append(self.indexed + i + 1)
+        i = find(b'\n', i + 1)
+      self.indexed += len(block)
+
+  def _open_index_file(self):
+    if self.index_file is None:
+      self.index_file = open(self.filename, 'rb')
+    return self.index_file
+
+  def line_offset(self, line_number):
+    '''Returns the byte offset at which line line_number, counting from
+       1, starts, or None if there is no such line.'''
+    if line_number < 1:
+      return None
+    self._index_through(line_number)
+    if line_number > len(self.offsets):
+      return None
+    offset = self.offsets[line_number - 1]
+    if offset >= os.path.getsize(self.filename):
+      return None
+    return offset
+
+  def getline(self, line_number):
+    '''Returns line line_number, counting from 1, or '' if there is no
+       such line, without moving the current line.'''
+    offset = self.line_offset(line_number)
+    if offset is None:
+      return ''
+    index_file = self._open_index_file()
+    index_file.seek(offset)
+    return index_file.readline().decode().replace('\r\n', '\n')
+
+  def context(self, line_number, before=2, after=2):
+    '''Returns (line number, line) for the lines around line_number, for
+       showing where an error is.'''
+    lines = []
+    for n in range(max(1, line_number - before), line_number + after + 1):
+      line = self.getline(n)
+      if not line:
+        break
+      lines.append((n, line))
+    return lines
+
+  def seek_line(self, line_number):
+    '''Moves to line line_number, counting from 1, so that it is the next
+       line read.  Raises IndexError if there is no such line.'''
+    offset = self.line_offset(line_number)
+    if offset is None:
+      raise IndexError('%s has no line %d' % (self.name, line_number))
+    self.pushed = []
+    # A byte offset at the start of a line is a valid position in a
+    # UTF-8 text file.
+    self.file.seek(offset)
+    self.line_number = line_number - 1
@@ -0,0 +1,157 @@
+# A lazily decoded alternative to AGAMemberRegistry.  A registration
+# session looks at a few hundred of the tens of thousands of members in
+# TDListA.txt, so rather than decoding every record when the file is
+# loaded, each member keeps its raw line with only the AGA ID decoded.
+# A member's name, membership type, rating and expiration date are each
+# decoded the first time they are used and then kept, as are the club,
+# state and date of the last rated game.
+#
+# To use it:
+#
+#   AGAMember.use_registry(LazyRegistry())
+#   AGAMember.ensure_loaded()
+#
+# The snapshot of the membership file holds fully decoded records, so
+# it is neither read nor written.
+
+import csv
+from aga_roster import AGAMember, AGAMemberRegistry, parse_date, \
+    parse_interned, parse_name, parse_rating
+
+
+class memoized (object):
+  '''A decorator making a method into an attribute computed on first
+     access.  The value is stored in the instance, where later accesses
+     find it without calling the method, and assigning to the attribute
+     replaces it.'''
+
+  def __init__(self, decode):
+    self.decode = decode
+    self.name = decode.__name__
+    self.__doc__ = decode.__doc__
+
+  def __get__(self, instance, owner):
+    if instance is None:
+      return self
+    value = instance.__dict__[self.name] = self.decode(instance)
+    return value
+
+
+class LazyMember (AGAMember):
+  '''LazyMember is an AGAMember read from row, a line of the membership
+     file, whose fields other than the AGA ID are decoded from row as
+     they are used.'''
+
+  # The cached rank, derived from the rating.
+  _rank = None
+
+  def __init__(self, aga_id, row):
+    self.aga_id = aga_id
+    self.row = row
+    self._playing_at = None
+
+  def fields(self):
+    '''Returns the fields of row as csv.reader would split them.'''
+    row = self.row
+    if '"' in row:
+      return next(csv.reader([row], delimiter='\t'))
+    return row.rstrip('\r\n').split('\t')
+
+  def raw_names(self):
+    '''Decodes the last and first names from row.'''
+    row = self.row
+    if '"' in row:
+      return parse_name(self.fields()[0])
+    return parse_name(row[:row.find('\t')])
+
+  def names(self):
+    '''Returns the last and first names, without decoding the rest of
+       the record or keeping them.'''
+    decoded = self.__dict__
+    if 'last_name' in decoded or 'first_name' in decoded:
+      return self.last_name, self.first_name
+    return self.raw_names()
+
+  @memoized
+  def last_name(self):
+    return self.raw_names()[0]
+
+  @memoized
+  def first_name(self):
+    return self.raw_names()[1]
+
+  @memoized
+  def membership_type(self):
+    return self.fields()[2]
+
+  @memoized
+  def _rating(self):
+    return parse_rating(self.fields()[3])
+
+  @memoized
+  def expiration_date(self):
+    return parse_date(self.fields()[4])
+
+  def optional_field(self, index):
+    fields = self.fields()
+    return fields[index] if len(fields) > index else ''
+
+  @memoized
+  def club(self):
+    return parse_interned(self.optional_field(5))
+
+  @memoized
+  def state(self):
+    return parse_interned(self.optional_field(6))
+
+  @memoized
+  def last_rated(self):
+    return parse_date(self.optional_field(7).strip())
+
+
+def read_lazy_members(file_name):
+  '''Yields a LazyMember for each record of the membership file
+     file_name.'''
+  with open(file_name, 'r') as f:
+    for row in f:
+      if row.count('\t') < 4:
+        continue
+      start = row.index('\t') + 1
+      yield LazyMember(int(row[start:row.index('\t', start)]), row)
+
+
+class LazyRegistry (AGAMemberRegistry):
+  '''LazyRegistry holds LazyMembers.  Its name indexes are built from
+     the members' raw names, so building them decodes nothing else.'''
+
+  uses_snapshot = False
+
+  def read_records(self, file_name):
+    return read_lazy_members(file_name)
+
+  def add_records(self, members):
+    by_id = self.by_id
+    indexed = self._name_index is not None or self._fuzzy_index is not None
+    for member in members:
+      aga_id = member.aga_id
+      if aga_id in by_id:
+        # The duplicate ID policy needs the expiration dates.
+        self.add(member)
+        continue
+      self._position[aga_id] = len(self.members)
+      self.members.append(member)
+      by_id[aga_id] = member
+      if indexed:
+        self._index_names(aga_id, *member.names())
+      self._file_member(member)
+
+  def name_entries(self):
+    for member in self.members:
+      if isinstance(member, LazyMember):
+        yield (member.aga_id,) + member.names()
+      else:
+        yield member.aga_id, member.last_name, member.first_name
+
+  def derive_ranks(self):
+    '''Does nothing: each member's rank is derived when its rating is
+       decoded.'''
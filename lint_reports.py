@@ -0,0 +1,191 @@
+# Check a directory of AGA report files before they are submitted.
+#
+# Every problem in every file is listed, rather than stopping at the
+# first, as one tab separated table with a row per problem giving the
+# file, line number, AGA ID, kind of problem and a description:
+#
+#   format      a line that isn't a valid record
+#   unknown     an AGA ID that isn't in the AGA membership list
+#   name        a last name that doesn't match the membership list
+#   expired     a membership that had expired by the tournament date
+#   rank        a rank further than --rank-tolerance from the rating
+#   unlisted    a game or bye of a player missing from PLAYERS
+#
+# The files are checked in a pool of processes.  The AGA membership
+# list is loaded, and indexed, once before the pool starts, and where
+# processes are forked the workers share it.
+
+import argparse
+import collections
+import concurrent.futures
+import datetime
+import glob
+import multiprocessing
+import os
+import re
+import sys
+import time
+from aga_report_format import PlayerEntry, Pass, REPORT_DATE_FORMAT, \
+    TournamentDescription, parse_report
+from aga_roster import AGAMember, AGA_MEMBER_FILE_NAME
+
+DEFAULT_RANK_TOLERANCE = 3
+
+START_DATE_RE = re.compile('start=(?P<DATE>[0-9]+/[0-9]+/[0-9]+)')
+
+COLUMNS = ('file', 'line', 'aga_id', 'problem', 'description')
+
+parser = argparse.ArgumentParser()
+parser.add_argument('directory', nargs='?', default='.',
+                    help='The directory of report files to check.')
+parser.add_argument('--pattern', default='*.txt',
+                    help='Which files in the directory are reports.')
+parser.add_argument('--output', metavar='FILE',
+                    help='Where to write the problems.  The default is the terminal.')
+parser.add_argument('--processes', type=int, default=os.cpu_count(),
+                    help='How many processes to check files in.')
+parser.add_argument('--date', type=lambda text: datetime.datetime.strptime(
+                        text, REPORT_DATE_FORMAT).date(),
+                    help='The date to check memberships on, for reports without a '
+                    'start date, e.g. 6/30/2024.  The default is today.')
+parser.add_argument('--rank-tolerance', type=int, default=DEFAULT_RANK_TOLERANCE,
+                    help='How many stones a rank may be from the rating.')
+
+
+Problem = collections.namedtuple('Problem', 'file_name line_number aga_id kind description')
+
+
+def tournament_date(description):
+  '''Returns the start date in a TOURNEY section's text, or None.'''
+  m = START_DATE_RE.search(description)
+  if m:
+    try:
+      return datetime.datetime.strptime(m.group('DATE'), REPORT_DATE_FORMAT).date()
+    except ValueError:
+      pass
+  return None
+
+
+def lint_report(file_name, date=None, rank_tolerance=DEFAULT_RANK_TOLERANCE):
+  '''Returns a list of the Problems in the report file file_name.
+     Memberships are checked on the tournament's start date, or failing
+     that on date, by default today.'''
+  problems = []
+  def problem(line_number, aga_id, kind, description):
+    problems.append(Problem(file_name, line_number, aga_id, kind, description))
+  errors = []
+  entries = []
+  played = []
+  try:
+    with open(file_name, 'r') as input:
+      for record in parse_report(input, errors):
+        kind = type(record)
+        if kind is PlayerEntry:
+          entries.append(record)
+        elif kind is Pass:
+          played.append(record.aga_id)
+        elif kind is TournamentDescription:
+          date = tournament_date(record.text) or date
+        else:
+          played.extend(record.players)
+  except (OSError, UnicodeDecodeError) as e:
+    problem(0, None, 'format', str(e))
+    return problems
+  for error in errors:
+    problem(error.line_number, None, 'format', error.message)
+  if date is None:
+    date = datetime.date.today()
+  members = AGAMember.lookup_many([entry.aga_id for entry in entries])
+  listed = set()
+  for entry, member in zip(entries, members):
+    if entry.aga_id in listed:
+      problem(entry.line_number, entry.aga_id, 'format', 'listed more than once.')
+      continue
+    listed.add(entry.aga_id)
+    if member is None or member.is_placeholder:
+      problem(entry.line_number, entry.aga_id, 'unknown', 'not an AGA member.')
+      continue
+    if member.last_name != entry.last_name:
+      problem(entry.line_number, entry.aga_id, 'name',
+              'listed as %s, %s but the AGA has %s, %s.' % (
+                  entry.last_name, entry.first_name, member.last_name, member.first_name))
+    if member.expiration_date is not None and member.expiration_date < date:
+      problem(entry.line_number, entry.aga_id, 'expired',
+              'membership expired %s.' % member.expiration_date)
+    if member.rating and abs(entry.rank.value - member.rank.value) > rank_tolerance:
+      problem(entry.line_number, entry.aga_id, 'rank',
+              'plays at %s but is rated %.1f (%s).' % (
+                  entry.rank.name, member.rating, member.rank.name))
+  for aga_id in sorted(set(played) - listed):
+    problem(0, aga_id, 'unlisted', 'plays but is not in the PLAYERS section.')
+  problems.sort(key=lambda p: p.line_number)
+  return problems
+
+
+def report_file_names(directory, pattern, output=None):
+  '''Returns the sorted names of the files in directory matching
+     pattern, leaving out the AGA membership file, which is usually kept
+     with the reports, and output, the file the problems are written to.'''
+  output = os.path.abspath(output) if output else None
+  return [file_name for file_name in sorted(glob.glob(os.path.join(directory, pattern)))
+          if os.path.basename(file_name) != AGA_MEMBER_FILE_NAME and
+          os.path.abspath(file_name) != output]
+
+
+def lint_reports(file_names, processes=None, date=None,
+                 rank_tolerance=DEFAULT_RANK_TOLERANCE):
+  '''Checks the report files file_names in processes processes.
+     Generates the Problems in each file, a file at a time, in the order
+     of file_names.  With processes 1 the files are checked in this
+     process.'''
+  if processes == 1:
+    for file_name in file_names:
+      for problem in lint_report(file_name, date, rank_tolerance):
+        yield problem
+    return
+  # Forked workers share the membership list already loaded here.
+  # Otherwise each loads it, from its snapshot.
+  context = None
+  if 'fork' in multiprocessing.get_all_start_methods():
+    context = multiprocessing.get_context('fork')
+  with concurrent.futures.ProcessPoolExecutor(
+      processes, mp_context=context, initializer=AGAMember.ensure_loaded) as pool:
+    chunk = max(1, len(file_names) // ((processes or os.cpu_count()) * 4))
+    for problems in pool.map(lint_report, file_names, [date] * len(file_names),
+                             [rank_tolerance] * len(file_names), chunksize=chunk):
+      for problem in problems:
+        yield problem
+
+
+def write_problems(output, problems):
+  '''Writes problems as tab separated values.  Returns how many there
+     were.'''
+  output.write('\t'.join(COLUMNS) + '\n')
+  count = 0
+  for p in problems:
+    output.write('%s\t%d\t%s\t%s\t%s\n' % (p.file_name, p.line_number,
+                                          '' if p.aga_id is None else p.aga_id,
+                                          p.kind, p.description))
+    count += 1
+  return count
+
+
+def main():
+  args = parser.parse_args()
+  file_names = report_file_names(args.directory, args.pattern, args.output)
+  AGAMember.ensure_loaded()
+  start = time.perf_counter()
+  problems = lint_reports(file_names, args.processes, args.date, args.rank_tolerance)
+  if args.output:
+    with open(args.output, 'w') as output:
+      count = write_problems(output, problems)
+  else:
+    count = write_problems(sys.stdout, problems)
+  elapsed = time.perf_counter() - start
+  sys.stderr.write('Checked %d files in %.2f seconds, %.1f files a second: '
+                   '%d problems.\n' % (len(file_names), elapsed,
+                                       len(file_names) / elapsed if elapsed else 0, count))
+
+
+if __name__ == '__main__':
+  main()
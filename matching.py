@@ -0,0 +1,440 @@
+# Maximum weight matching in general graphs.
+#
+# This is Edmonds' blossom algorithm with Galil's primal-dual
+# bookkeeping, as described in Zvi Galil, "Efficient Algorithms for
+# Finding Maximum Matching in Graphs", ACM Computing Surveys, 1986.
+# It runs in O(n**3) time, but on the sparse graphs the pairing
+# program builds it is much quicker than that.
+#
+# Vertices are numbered from 0.  An edge is a tuple (i, j, weight) with
+# integer weights.  Edge k has two endpoints, numbered 2*k and 2*k+1,
+# and endpoint[p] is the vertex at endpoint p; p ^ 1 is the other end.
+#
+# Blossoms are numbered from nvertex to 2*nvertex-1.  A vertex that
+# isn't in any blossom is its own top level blossom.  Labels are
+#   0  free
+#   1  S, an outer vertex of the alternating tree
+#   2  T, an inner vertex of the alternating tree
+#   5  S, temporarily marked while scanning for a blossom base
+
+
+def max_weight_matching(edges, max_cardinality=False):
+  '''Returns a maximum weight matching of the graph whose edges are
+     the (i, j, weight) tuples in edges, as a list mate in which mate[i]
+     is the vertex matched with i, or -1 if i is unmatched.  If
+     max_cardinality is true, returns the maximum weight matching among
+     the matchings with the most edges.'''
+  if not edges:
+    return []
+  nedge = len(edges)
+  nvertex = 0
+  for i, j, weight in edges:
+    assert i >= 0 and j >= 0 and i != j, 'Bad edge %r' % ((i, j, weight),)
+    nvertex = max(nvertex, i + 1, j + 1)
+  max_weight = max(0, max(weight for i, j, weight in edges))
+
+  endpoint = [edges[p // 2][p % 2] for p in range(2 * nedge)]
+  # neighbend[v] lists the remote endpoints of the edges at v.
+  neighbend = [[] for v in range(nvertex)]
+  for k, (i, j, weight) in enumerate(edges):
+    neighbend[i].append(2 * k + 1)
+    neighbend[j].append(2 * k)
+
+  # mate[v] is the remote endpoint of v's matched edge, or -1.
+  mate = nvertex * [-1]
+  label = (2 * nvertex) * [0]
+  # The endpoint through which a vertex or blossom got its label.
+  labelend = (2 * nvertex) * [-1]
+  # The top level blossom containing each vertex.
+  inblossom = list(range(nvertex))
+  blossomparent = (2 * nvertex) * [-1]
+  # The sub-blossoms of each blossom, in cyclic order from its base,
+  # and the endpoints of the edges connecting them.
+  blossomchilds = (2 * nvertex) * [None]
+  blossomendps = (2 * nvertex) * [None]
+  blossombase = list(range(nvertex)) + nvertex * [-1]
+  # The least slack edge from each vertex or blossom to an S blossom.
+  bestedge = (2 * nvertex) * [-1]
+  blossombestedges = (2 * nvertex) * [None]
+  unusedblossoms = list(range(nvertex, 2 * nvertex))
+  dualvar = nvertex * [max_weight] + nvertex * [0]
+  allowedge = nedge * [False]
+  queue = []
+
+  double_weights = [2 * weight for i, j, weight in edges]
+
+  def slack(k):
+    i, j, weight = edges[k]
+    return dualvar[i] + dualvar[j] - double_weights[k]
+
+  def blossom_leaves(b):
+    if b < nvertex:
+      yield b
+    else:
+      for t in blossomchilds[b]:
+        if t < nvertex:
+          yield t
+        else:
+          for v in blossom_leaves(t):
+            yield v
+
+  def assign_label(w, t, p):
+    # Labels vertex w and its top level blossom t, reached through p.
+    b = inblossom[w]
+    label[w] = label[b] = t
+    labelend[w] = labelend[b] = p
+    bestedge[w] = bestedge[b] = -1
+    if t == 1:
+      queue.extend(blossom_leaves(b))
+    else:
+      # The base of a T blossom is matched; its mate becomes S.
+      base = blossombase[b]
+      assign_label(endpoint[mate[base]], 1, mate[base] ^ 1)
+
+  def scan_blossom(v, w):
+    # Traces back from v and w to find either a new blossom, returning
+    # its base, or an augmenting path, returning -1.
+    path = []
+    base = -1
+    while v != -1 or w != -1:
+      b = inblossom[v]
+      if label[b] & 4:
+        base = blossombase[b]
+        break
+      path.append(b)
+      label[b] = 5
+      if labelend[b] == -1:
+        # The root of this tree.
+        v = -1
+      else:
+        v = endpoint[labelend[b]]
+        b = inblossom[v]
+        v = endpoint[labelend[b]]
+      if w != -1:
+        v, w = w, v
+    for b in path:
+      label[b] = 1
+    return base
+
+  def add_blossom(base, k):
+    # Makes a new blossom with base base out of the S blossoms joined
+    # by edge k.
+    v, w, weight = edges[k]
+    bb = inblossom[base]
+    bv = inblossom[v]
+    bw = inblossom[w]
+    b = unusedblossoms.pop()
+    blossombase[b] = base
+    blossomparent[b] = -1
+    blossomparent[bb] = b
+    blossomchilds[b] = path = []
+    blossomendps[b] = endps = []
+    while bv != bb:
+      blossomparent[bv] = b
+      path.append(bv)
+      endps.append(labelend[bv])
+      v = endpoint[labelend[bv]]
+      bv = inblossom[v]
+    path.append(bb)
+    path.reverse()
+    endps.reverse()
+    endps.append(2 * k)
+    while bw != bb:
+      blossomparent[bw] = b
+      path.append(bw)
+      endps.append(labelend[bw] ^ 1)
+      w = endpoint[labelend[bw]]
+      bw = inblossom[w]
+    label[b] = 1
+    labelend[b] = labelend[bb]
+    dualvar[b] = 0
+    for v in blossom_leaves(b):
+      if label[inblossom[v]] == 2:
+        # Former T vertices become S vertices.
+        queue.append(v)
+      inblossom[v] = b
+    # Work out the least slack edges from the new blossom to each
+    # other S blossom.
+    bestedgeto = (2 * nvertex) * [-1]
+    for bv in path:
+      if blossombestedges[bv] is None:
+        nblists = [[p // 2 for p in neighbend[v]] for v in blossom_leaves(bv)]
+      else:
+        nblists = [blossombestedges[bv]]
+      for nblist in nblists:
+        for k in nblist:
+          i, j, weight = edges[k]
+          if inblossom[j] == b:
+            i, j = j, i
+          bj = inblossom[j]
+          if bj != b and label[bj] == 1 and \
+             (bestedgeto[bj] == -1 or slack(k) < slack(bestedgeto[bj])):
+            bestedgeto[bj] = k
+      blossombestedges[bv] = None
+      bestedge[bv] = -1
+    blossombestedges[b] = [k for k in bestedgeto if k != -1]
+    bestedge[b] = -1
+    for k in blossombestedges[b]:
+      if bestedge[b] == -1 or slack(k) < slack(bestedge[b]):
+        bestedge[b] = k
+
+  def expand_blossom(b, endstage):
+    # Turns the sub-blossoms of blossom b back into top level blossoms.
+    for s in blossomchilds[b]:
+      blossomparent[s] = -1
+      if s < nvertex:
+        inblossom[s] = s
+      elif endstage and dualvar[s] == 0:
+        expand_blossom(s, endstage)
+      else:
+        for v in blossom_leaves(s):
+          inblossom[v] = s
+    if not endstage and label[b] == 2:
+      # Relabel the sub-blossoms on the even length path from the
+      # entry child to the base as T, S, ..., T.
+      entrychild = inblossom[endpoint[labelend[b] ^ 1]]
+      j = blossomchilds[b].index(entrychild)
+      if j & 1:
+        j -= len(blossomchilds[b])
+        jstep = 1
+        endptrick = 0
+      else:
+        jstep = -1
+        endptrick = 1
+      p = labelend[b]
+      while j != 0:
+        label[endpoint[p ^ 1]] = 0
+        label[endpoint[blossomendps[b][j - endptrick] ^ endptrick ^ 1]] = 0
+        assign_label(endpoint[p ^ 1], 2, p)
+        allowedge[blossomendps[b][j - endptrick] // 2] = True
+        j += jstep
+        p = blossomendps[b][j - endptrick] ^ endptrick
+        allowedge[p // 2] = True
+        j += jstep
+      bv = blossomchilds[b][j]
+      label[endpoint[p ^ 1]] = label[bv] = 2
+      labelend[endpoint[p ^ 1]] = labelend[bv] = p
+      bestedge[bv] = -1
+      # The sub-blossoms on the odd length path keep no label unless
+      # one of their vertices was reached from outside.
+      j += jstep
+      while blossomchilds[b][j] != entrychild:
+        bv = blossomchilds[b][j]
+        if label[bv] == 1:
+          j += jstep
+          continue
+        for v in blossom_leaves(bv):
+          if label[v] != 0:
+            break
+        if label[v] != 0:
+          label[v] = 0
+          label[endpoint[mate[blossombase[bv]]]] = 0
+          assign_label(v, 2, labelend[v])
+        j += jstep
+    label[b] = labelend[b] = -1
+    blossomchilds[b] = blossomendps[b] = None
+    blossombase[b] = -1
+    blossombestedges[b] = None
+    bestedge[b] = -1
+    unusedblossoms.append(b)
+
+  def augment_blossom(b, v):
+    # Swaps matched and unmatched edges along the path in blossom b
+    # from vertex v to the base, making v the new base.
+    t = v
+    while blossomparent[t] != b:
+      t = blossomparent[t]
+    if t >= nvertex:
+      augment_blossom(t, v)
+    i = j = blossomchilds[b].index(t)
+    if i & 1:
+      j -= len(blossomchilds[b])
+      jstep = 1
+      endptrick = 0
+    else:
+      jstep = -1
+      endptrick = 1
+    while j != 0:
+      j += jstep
+      t = blossomchilds[b][j]
+      p = blossomendps[b][j - endptrick] ^ endptrick
+      if t >= nvertex:
+        augment_blossom(t, endpoint[p])
+      j += jstep
+      t = blossomchilds[b][j]
+      if t >= nvertex:
+        augment_blossom(t, endpoint[p ^ 1])
+      mate[endpoint[p]] = p ^ 1
+      mate[endpoint[p ^ 1]] = p
+    blossomchilds[b] = blossomchilds[b][i:] + blossomchilds[b][:i]
+    blossomendps[b] = blossomendps[b][i:] + blossomendps[b][:i]
+    blossombase[b] = blossombase[blossomchilds[b][0]]
+
+  def augment_matching(k):
+    # Swaps matched and unmatched edges along the augmenting path
+    # through edge k, from root to root.
+    v, w, weight = edges[k]
+    for s, p in ((v, 2 * k + 1), (w, 2 * k)):
+      while True:
+        bs = inblossom[s]
+        if bs >= nvertex:
+          augment_blossom(bs, s)
+        mate[s] = p
+        if labelend[bs] == -1:
+          break
+        t = endpoint[labelend[bs]]
+        bt = inblossom[t]
+        s = endpoint[labelend[bt]]
+        j = endpoint[labelend[bt] ^ 1]
+        if bt >= nvertex:
+          augment_blossom(bt, j)
+        mate[j] = labelend[bt]
+        p = labelend[bt] ^ 1
+
+  # Start from a greedy matching of the edges that are already tight,
+  # those of the greatest weight.  While every vertex's dual variable is
+  # still max_weight this keeps the dual solution consistent, and it
+  # spares a stage for each edge matched.
+  for k, (i, j, weight) in enumerate(edges):
+    if weight == max_weight and mate[i] == -1 and mate[j] == -1:
+      mate[i] = 2 * k + 1
+      mate[j] = 2 * k
+
+  # Each stage grows alternating trees from the unmatched vertices
+  # until it finds an augmenting path, adjusting the dual variables
+  # whenever it gets stuck.
+  for stage in range(nvertex):
+    label[:] = (2 * nvertex) * [0]
+    bestedge[:] = (2 * nvertex) * [-1]
+    blossombestedges[nvertex:] = nvertex * [None]
+    allowedge[:] = nedge * [False]
+    queue[:] = []
+    for v in range(nvertex):
+      if mate[v] == -1 and label[inblossom[v]] == 0:
+        assign_label(v, 1, -1)
+    augmented = False
+    while True:
+      while queue and not augmented:
+        v = queue.pop()
+        for p in neighbend[v]:
+          k = p // 2
+          w = endpoint[p]
+          if inblossom[v] == inblossom[w]:
+            continue
+          if not allowedge[k]:
+            kslack = dualvar[v] + dualvar[w] - double_weights[k]
+            if kslack <= 0:
+              allowedge[k] = True
+          if allowedge[k]:
+            if label[inblossom[w]] == 0:
+              assign_label(w, 2, p ^ 1)
+            elif label[inblossom[w]] == 1:
+              base = scan_blossom(v, w)
+              if base >= 0:
+                add_blossom(base, k)
+              else:
+                augment_matching(k)
+                augmented = True
+                break
+            elif label[w] == 0:
+              # w is inside a T blossom but hasn't been reached yet.
+              label[w] = 2
+              labelend[w] = p ^ 1
+          elif label[inblossom[w]] == 1:
+            b = inblossom[v]
+            if bestedge[b] == -1 or kslack < slack(bestedge[b]):
+              bestedge[b] = k
+          elif label[w] == 0:
+            if bestedge[w] == -1 or kslack < slack(bestedge[w]):
+              bestedge[w] = k
+      if augmented:
+        break
+
+      # Stuck.  Find the largest change to the dual variables that
+      # keeps them feasible, and what it makes possible:
+      #   1  no further improvement is possible
+      #   2  an edge from an S vertex to a free vertex becomes tight
+      #   3  an edge between S blossoms becomes tight
+      #   4  a T blossom's dual variable reaches zero
+      deltatype = -1
+      delta = deltaedge = deltablossom = None
+      if not max_cardinality:
+        deltatype = 1
+        delta = min(dualvar[:nvertex])
+      for v in range(nvertex):
+        if label[inblossom[v]] == 0 and bestedge[v] != -1:
+          d = slack(bestedge[v])
+          if deltatype == -1 or d < delta:
+            delta = d
+            deltatype = 2
+            deltaedge = bestedge[v]
+      for b in range(2 * nvertex):
+        if blossomparent[b] == -1 and label[b] == 1 and bestedge[b] != -1:
+          # With integer weights the slack between S blossoms is even.
+          d = slack(bestedge[b]) // 2
+          if deltatype == -1 or d < delta:
+            delta = d
+            deltatype = 3
+            deltaedge = bestedge[b]
+      for b in range(nvertex, 2 * nvertex):
+        if blossombase[b] >= 0 and blossomparent[b] == -1 and label[b] == 2 and \
+           (deltatype == -1 or dualvar[b] < delta):
+          delta = dualvar[b]
+          deltatype = 4
+          deltablossom = b
+      if deltatype == -1:
+        # Only possible with max_cardinality; the matching is as large
+        # as it can be.
+        deltatype = 1
+        delta = max(0, min(dualvar[:nvertex]))
+
+      for v in range(nvertex):
+        if label[inblossom[v]] == 1:
+          dualvar[v] -= delta
+        elif label[inblossom[v]] == 2:
+          dualvar[v] += delta
+      for b in range(nvertex, 2 * nvertex):
+        if blossombase[b] >= 0 and blossomparent[b] == -1:
+          if label[b] == 1:
+            dualvar[b] += delta
+          elif label[b] == 2:
+            dualvar[b] -= delta
+
+      if deltatype == 1:
+        break
+      elif deltatype == 2:
+        allowedge[deltaedge] = True
+        i, j, weight = edges[deltaedge]
+        if label[inblossom[i]] == 0:
+          i, j = j, i
+        queue.append(i)
+      elif deltatype == 3:
+        allowedge[deltaedge] = True
+        i, j, weight = edges[deltaedge]
+        queue.append(i)
+      else:
+        expand_blossom(deltablossom, False)
+
+    if not augmented:
+      break
+    # Expand the S blossoms whose dual variables have reached zero.
+    for b in range(nvertex, 2 * nvertex):
+      if blossomparent[b] == -1 and blossombase[b] >= 0 and \
+         label[b] == 1 and dualvar[b] == 0:
+        expand_blossom(b, True)
+
+  for v in range(nvertex):
+    if mate[v] >= 0:
+      mate[v] = endpoint[mate[v]]
+  return mate
+
+
+def min_cost_matching(edges):
+  '''Returns the matching, as a mate list like max_weight_matching's,
+     with the most edges and, among those, the least total cost.  edges
+     are (i, j, cost) tuples with integer costs.'''
+  if not edges:
+    return []
+  ceiling = max(cost for i, j, cost in edges) + 1
+  return max_weight_matching([(i, j, ceiling - cost) for i, j, cost in edges],
+                             max_cardinality=True)
@@ -0,0 +1,241 @@
+# McMahon pairing.
+#
+# Every player starts with a McMahon score derived from the rank they
+# are playing at, so players are paired with others of similar strength
+# from the first round, and gains a point for each win.  Each round
+# pairs players with equal, or failing that nearby, scores.
+#
+# The pairing is a minimum cost matching.  Players are sorted by score
+# and each is given a candidate opponent among the next few players in
+# that order.  An edge's cost grows with the square of the score
+# difference and of the handicap, with an unbalanced color history and
+# when both players belong to the same club.  Rematches are never
+# candidates.
+
+import collections
+from matching import min_cost_matching
+
+
+DEFAULT_KOMI = 7
+MAX_HANDICAP = 9
+
+# A bye is worth as much as a win.
+BYE_SCORE = 1
+
+# How many of the following players, in score order, each player may be
+# paired against.  It is widened when that doesn't leave everyone an
+# opponent.
+DEFAULT_WINDOW = 12
+
+SCORE_WEIGHT = 1000
+HANDICAP_WEIGHT = 10
+COLOR_WEIGHT = 50
+# Less than a point of score difference, so clubmates still meet when
+# the alternative is a mismatch.
+CLUB_WEIGHT = 500
+
+
+class UnpairableError (Exception):
+  '''Raised when the players can't all be paired without a rematch.'''
+  def __init__(self, count):
+    self.count = count
+  def __str__(self):
+    return 'Every pairing of these %d players includes a rematch.' % self.count
+
+
+class Pairing (object):
+  '''A game to be played between the players with AGA IDs white_id and
+     black_id.'''
+
+  def __init__(self, white_id, black_id, handicap=0, komi=DEFAULT_KOMI):
+    self.white_id = white_id
+    self.black_id = black_id
+    self.handicap = handicap
+    self.komi = komi
+
+  def __eq__(self, other):
+    return type(self) is type(other) and self.__dict__ == other.__dict__
+
+  def __repr__(self):
+    return 'Pairing(%r, %r, %r, %r)' % (
+        self.white_id, self.black_id, self.handicap, self.komi)
+
+  @property
+  def players(self):
+    return (self.white_id, self.black_id)
+
+
+class Game (Pairing):
+  '''A game that has been played.  winner is 'w' or 'b'.'''
+
+  def __init__(self, white_id, black_id, winner, handicap=0, komi=DEFAULT_KOMI):
+    Pairing.__init__(self, white_id, black_id, handicap, komi)
+    assert winner in ('w', 'b'), 'Got %r' % (winner,)
+    self.winner = winner
+
+  def __repr__(self):
+    return 'Game(%r, %r, %r, %r, %r)' % (
+        self.white_id, self.black_id, self.winner, self.handicap, self.komi)
+
+  @property
+  def winner_id(self):
+    return self.white_id if self.winner == 'w' else self.black_id
+
+  @property
+  def loser_id(self):
+    return self.black_id if self.winner == 'w' else self.white_id
+
+
+class History (object):
+  '''What the earlier rounds of a tournament mean for pairing the next
+     one, by AGA ID:
+
+       opponents   the set of players each player has been paired with
+       colors      the number of even games each player has taken white
+                   in less the number taken black
+       wins        the number of games won
+       byes        the number of byes taken
+
+     Pairings whose games haven't been reported yet count as having
+     been played, but not as won by anyone.'''
+
+  def __init__(self, games=(), byes=()):
+    self.opponents = collections.defaultdict(set)
+    self.colors = collections.Counter()
+    self.wins = collections.Counter()
+    self.byes = collections.Counter()
+    for game in games:
+      self.add_game(game)
+    for aga_id in byes:
+      self.add_bye(aga_id)
+
+  def add_game(self, game):
+    '''Adds a Pairing or a Game.'''
+    self.opponents[game.white_id].add(game.black_id)
+    self.opponents[game.black_id].add(game.white_id)
+    if game.handicap == 0:
+      self.colors[game.white_id] += 1
+      self.colors[game.black_id] -= 1
+    if isinstance(game, Game):
+      self.wins[game.winner_id] += 1
+
+  def add_bye(self, aga_id):
+    self.byes[aga_id] += 1
+
+  def have_played(self, aga_id, other_id):
+    return other_id in self.opponents.get(aga_id, ())
+
+
+def starting_score(player, bar=None, floor=None):
+  '''Returns player's McMahon score before the first round: the value
+     of the rank they are playing at, raised to that of floor and
+     lowered to that of bar.'''
+  score = player.playing_at.value
+  if bar and score > bar.value:
+    return bar.value
+  if floor and score < floor.value:
+    return floor.value
+  return score
+
+
+def mcmahon_scores(players, history, bar=None, floor=None):
+  '''Returns a dict of each player's McMahon score, keyed by AGA ID.'''
+  scores = {}
+  for player in players:
+    scores[player.aga_id] = (starting_score(player, bar, floor) +
+                             history.wins[player.aga_id] +
+                             BYE_SCORE * history.byes[player.aga_id])
+  return scores
+
+
+def handicap_and_komi(stronger, weaker, reduction=0):
+  '''Returns the handicap and komi for a game between players playing at
+     the Ranks stronger and weaker.  reduction lowers the handicap by
+     that many stones.'''
+  difference = stronger.value - weaker.value - reduction
+  if difference <= 0:
+    return 0, DEFAULT_KOMI
+  if difference == 1:
+    # Black plays first without komi.
+    return 0, 0
+  return min(difference, MAX_HANDICAP), 0
+
+
+def pairing_cost(a, b, scores, history, handicap_reduction=0):
+  '''Returns the cost of pairing players a and b.'''
+  score_difference = scores[a.aga_id] - scores[b.aga_id]
+  stronger, weaker = sorted((a.playing_at, b.playing_at),
+                            key=lambda rank: rank.value, reverse=True)
+  handicap, komi = handicap_and_komi(stronger, weaker, handicap_reduction)
+  cost = (SCORE_WEIGHT * score_difference * score_difference +
+          HANDICAP_WEIGHT * handicap * handicap)
+  if handicap == 0 and komi:
+    color_a = history.colors[a.aga_id]
+    color_b = history.colors[b.aga_id]
+    if color_a * color_b > 0:
+      # Both players are due the same color.
+      cost += COLOR_WEIGHT * min(abs(color_a), abs(color_b))
+  # Players that aren't AGAMembers, such as simulate's, have no club.
+  club = getattr(a, 'club', None)
+  if club and club == getattr(b, 'club', None):
+    cost += CLUB_WEIGHT
+  return cost
+
+
+def make_pairing(a, b, history, handicap_reduction=0):
+  '''Returns the Pairing of players a and b, a being ahead of b in score
+     order.  In a handicap game the stronger player takes white, in an
+     even game the player who has had white less often does.'''
+  if a.playing_at.value < b.playing_at.value:
+    a, b = b, a
+  handicap, komi = handicap_and_komi(a.playing_at, b.playing_at,
+                                     handicap_reduction)
+  if handicap == 0 and komi and history.colors[b.aga_id] < history.colors[a.aga_id]:
+    a, b = b, a
+  return Pairing(a.aga_id, b.aga_id, handicap, komi)
+
+
+def choose_bye(players, scores, history):
+  '''Returns the player who should sit out a round with an odd number of
+     players: the one with the fewest byes so far, then the lowest
+     score, then the lowest rank.'''
+  return min(players, key=lambda p: (history.byes[p.aga_id], scores[p.aga_id],
+                                     p.playing_at.value, -p.aga_id))
+
+
+def pair_round(players, history, byes=(), bar=None, floor=None,
+               handicap_reduction=0, window=DEFAULT_WINDOW):
+  '''Pairs players, a list of AGAMembers, for the next round of a
+     tournament whose earlier rounds are described by history.  The
+     players whose AGA IDs are in byes sit the round out, as does one
+     more player if that leaves an odd number.  Returns a list of
+     Pairings, ordered by the McMahon score of the stronger player, and
+     the list of the AGA IDs of the players who have a bye.  Raises
+     UnpairableError if every pairing includes a rematch.'''
+  scores = mcmahon_scores(players, history, bar, floor)
+  byes = list(byes)
+  resting = set(byes)
+  playing = [p for p in players if p.aga_id not in resting]
+  if len(playing) % 2:
+    bye = choose_bye(playing, scores, history)
+    byes.append(bye.aga_id)
+    playing.remove(bye)
+  playing.sort(key=lambda p: (-scores[p.aga_id], -p.playing_at.value, p.aga_id))
+  count = len(playing)
+  while True:
+    edges = []
+    for i, a in enumerate(playing):
+      for j in range(i + 1, min(count, i + 1 + window)):
+        b = playing[j]
+        if not history.have_played(a.aga_id, b.aga_id):
+          edges.append((i, j, pairing_cost(a, b, scores, history,
+                                           handicap_reduction)))
+    mate = min_cost_matching(edges)
+    mate.extend([-1] * (count - len(mate)))
+    if -1 not in mate or window >= count:
+      break
+    window *= 2
+  if -1 in mate:
+    raise UnpairableError(count)
+  return [make_pairing(playing[i], playing[j], history, handicap_reduction)
+          for i, j in enumerate(mate) if i < j], byes
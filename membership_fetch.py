@@ -0,0 +1,215 @@
+# Downloading the AGA membership file.
+#
+# fetch() only transfers TDListA.txt when it has changed, resumes an
+# interrupted download where it left off, and never leaves a truncated
+# file in place of the previous one.  Alongside the file it keeps a
+# small JSON sidecar recording the validators (ETag and Last-Modified)
+# of the copy we have and of any partial download.
+
+import gzip
+import http.client
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+
+VALIDATORS_SUFFIX = '.fetch'
+PARTIAL_SUFFIX = '.part'
+TEMP_SUFFIX = '.tmp'
+
+DEFAULT_TIMEOUT = 30
+DEFAULT_RETRIES = 3
+BLOCK_SIZE = 1 << 16
+
+
+class FetchError (Exception):
+  def __init__(self, uri, message):
+    self.uri = uri
+    self.message = message
+  def __str__(self):
+    return 'Fetching %s: %s' % (self.uri, self.message)
+
+
+def read_validators(file_name):
+  '''Returns the contents of file_name's validators sidecar.'''
+  try:
+    with open(file_name + VALIDATORS_SUFFIX, 'r') as f:
+      return json.load(f)
+  except (OSError, ValueError):
+    return {}
+
+
+def write_validators(file_name, validators):
+  temp = file_name + VALIDATORS_SUFFIX + TEMP_SUFFIX
+  with open(temp, 'w') as f:
+    json.dump(validators, f, indent=2)
+  os.replace(temp, file_name + VALIDATORS_SUFFIX)
+
+
+def response_validators(response):
+  return {
+      'etag': response.headers.get('ETag'),
+      'last_modified': response.headers.get('Last-Modified'),
+      'content_encoding': response.headers.get('Content-Encoding', 'identity')
+      }
+
+
+def make_request(uri, file_name, validators, offset):
+  headers = {'Accept-Encoding': 'gzip'}
+  if os.path.exists(file_name):
+    if validators.get('etag'):
+      headers['If-None-Match'] = validators['etag']
+    if validators.get('last_modified'):
+      headers['If-Modified-Since'] = validators['last_modified']
+  partial = validators.get('partial')
+  if offset and partial:
+    headers['Range'] = 'bytes=%d-' % offset
+    # If the file changed since the partial download the server
+    # should send all of it instead of the rest of it.
+    headers['If-Range'] = partial.get('etag') or partial.get('last_modified')
+  return urllib.request.Request(uri, headers=headers)
+
+
+def content_range_start(response):
+  '''Returns the offset of the first byte of a 206 response, or None if
+     its Content-Range can't be parsed.'''
+  content_range = response.headers.get('Content-Range', '')
+  unit, _, byte_range = content_range.partition(' ')
+  if unit != 'bytes':
+    return None
+  try:
+    return int(byte_range.split('-', 1)[0])
+  except ValueError:
+    return None
+
+
+def discard_partial(file_name, validators):
+  '''Forgets the partial download of file_name, so the next request
+     starts over.'''
+  validators.pop('partial', None)
+  write_validators(file_name, validators)
+  part = file_name + PARTIAL_SUFFIX
+  if os.path.exists(part):
+    os.remove(part)
+
+
+def fetch_once(uri, file_name, timeout):
+  '''Makes one attempt at fetching uri into file_name.  Returns True if
+     file_name was replaced and False if it is already up to date.'''
+  validators = read_validators(file_name)
+  part = file_name + PARTIAL_SUFFIX
+  offset = 0
+  partial = validators.get('partial')
+  if partial and (partial.get('etag') or partial.get('last_modified')):
+    try:
+      offset = os.path.getsize(part)
+    except OSError:
+      offset = 0
+  request = make_request(uri, file_name, validators, offset)
+  try:
+    response = urllib.request.urlopen(request, timeout=timeout)
+  except urllib.error.HTTPError as e:
+    if e.code == 304:
+      return False
+    if e.code == 416:
+      # Our partial download is no good.  Start over next time.
+      discard_partial(file_name, validators)
+    raise
+  with response:
+    received = response_validators(response)
+    if response.status == 206:
+      if not (request.has_header('Range') and
+              received['content_encoding'] == partial.get('content_encoding') and
+              content_range_start(response) == offset):
+        # The rest isn't the rest of what we have.  Start over without
+        # asking for a range.
+        discard_partial(file_name, validators)
+        if request.has_header('Range'):
+          response.close()
+          return fetch_once(uri, file_name, timeout)
+        raise http.client.HTTPException(
+            'Unrequested partial content from %s' % uri)
+      mode = 'ab'
+      received = partial
+    else:
+      mode = 'wb'
+    validators['partial'] = received
+    write_validators(file_name, validators)
+    expected = response.headers.get('Content-Length')
+    written = 0
+    with open(part, mode) as f:
+      while True:
+        block = response.read(BLOCK_SIZE)
+        if not block:
+          break
+        f.write(block)
+        written += len(block)
+      f.flush()
+      os.fsync(f.fileno())
+    if expected is not None and written != int(expected):
+      raise http.client.IncompleteRead(b'', int(expected) - written)
+  temp = file_name + TEMP_SUFFIX
+  if received['content_encoding'] == 'gzip':
+    with gzip.open(part, 'rb') as source, open(temp, 'wb') as destination:
+      shutil.copyfileobj(source, destination, BLOCK_SIZE)
+    os.remove(part)
+  else:
+    os.replace(part, temp)
+  os.replace(temp, file_name)
+  validators.pop('partial', None)
+  validators['etag'] = received['etag']
+  validators['last_modified'] = received['last_modified']
+  write_validators(file_name, validators)
+  return True
+
+
+def transient(error):
+  '''Returns True if error, raised by fetch_once, may not happen on
+     another attempt.'''
+  if isinstance(error, urllib.error.HTTPError):
+    # After a 416 the partial download is gone and the next attempt
+    # starts over.
+    return error.code >= 500 or error.code in (416, 429)
+  if isinstance(error, urllib.error.URLError):
+    # Couldn't connect.
+    return True
+  return isinstance(error, (http.client.HTTPException, ConnectionError, TimeoutError))
+
+
+def fetch(uri, file_name, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES,
+          backoff=1.0):
+  '''Brings file_name up to date with uri.  Returns True if file_name
+     was replaced and False if it was already up to date.  An attempt
+     that fails for a reason that may go away, such as a timeout, a lost
+     connection or a server error, is retried, resuming where it left
+     off, up to retries times with exponentially increasing delays.
+     Raises FetchError if every attempt fails, or right away for other
+     failures, such as a 404 or a file that can't be written.'''
+  attempt = 0
+  while True:
+    try:
+      return fetch_once(uri, file_name, timeout)
+    except (OSError, http.client.HTTPException) as e:
+      if attempt >= retries or not transient(e):
+        raise FetchError(uri, str(e))
+    time.sleep(backoff * (2 ** attempt))
+    attempt += 1
+
+
+def start_background_fetch(uri, file_name, **fetch_args):
+  '''Starts a daemon thread that fetches uri into file_name and reports
+     the outcome on stderr.  Returns the thread.'''
+  def run():
+    try:
+      if fetch(uri, file_name, **fetch_args):
+        sys.stderr.write('\nFetched a new %s.\n' % file_name)
+    except FetchError as e:
+      sys.stderr.write('\n%s\n' % e)
+  thread = threading.Thread(target=run, name='fetch %s' % file_name, daemon=True)
+  thread.start()
+  return thread
@@ -0,0 +1,256 @@
+# Inverted n-gram index over member names, used to speed up substring
+# searches of the AGA membership list.
+
+import array
+
+
+class TrigramIndex (object):
+  '''TrigramIndex maps each three character substring of the names
+     added to it to the set of keys whose names contain it.  A
+     substring query intersects the posting sets of the query's own
+     trigrams to get a small set of candidate keys, which the caller
+     must then verify, since a key can have every trigram without
+     having them in the right order or in the same name.'''
+
+  N = 3
+
+  def __init__(self):
+    self.postings = {}
+
+  def clear(self):
+    self.postings.clear()
+
+  def to_postings(self):
+    '''Returns the postings in a compact form suitable for pickling.
+       The keys must be integers.'''
+    return dict((gram, array.array('q', keys))
+                for gram, keys in self.postings.items())
+
+  @classmethod
+  def from_postings(cls, postings):
+    '''Makes a TrigramIndex from the result of to_postings.'''
+    index = cls()
+    index.postings = dict((gram, set(keys)) for gram, keys in postings.items())
+    return index
+
+  @classmethod
+  def grams(cls, text):
+    '''Returns the set of n-grams of the lower cased text.'''
+    text = text.lower()
+    n = cls.N
+    return set(text[i:i + n] for i in range(len(text) - n + 1))
+
+  def add(self, key, *names):
+    postings = self.postings
+    for name in names:
+      if not name:
+        continue
+      for gram in self.grams(name):
+        posting = postings.get(gram)
+        if posting is None:
+          postings[gram] = posting = set()
+        posting.add(key)
+
+  def remove(self, key, *names):
+    postings = self.postings
+    for name in names:
+      if not name:
+        continue
+      for gram in self.grams(name):
+        posting = postings.get(gram)
+        if posting is not None:
+          posting.discard(key)
+          if not posting:
+            del postings[gram]
+
+  def candidates(self, substring):
+    '''Returns the set of keys that might have a name containing
+       substring, or None if substring is too short to be looked up
+       and every key is a candidate.'''
+    grams = self.grams(substring)
+    if not grams:
+      return None
+    postings = []
+    for gram in grams:
+      posting = self.postings.get(gram)
+      if not posting:
+        return set()
+      postings.append(posting)
+    postings.sort(key=len)
+    result = postings[0]
+    for posting in postings[1:]:
+      result = result.intersection(posting)
+      if not result:
+        break
+    return set(result)
+
+
+SOUNDEX_CODES = dict(
+    [(c, '1') for c in 'bfpv'] + [(c, '2') for c in 'cgjkqsxz'] +
+    [(c, '3') for c in 'dt'] + [('l', '4')] + [(c, '5') for c in 'mn'] +
+    [('r', '6')])
+
+def soundex(name):
+  '''Returns the American Soundex code of name, or '' if name has no
+     letters.'''
+  letters = [c for c in name.lower() if c.isalpha()]
+  if not letters:
+    return ''
+  code = [letters[0].upper()]
+  previous = SOUNDEX_CODES.get(letters[0])
+  for c in letters[1:]:
+    digit = SOUNDEX_CODES.get(c)
+    if digit and digit != previous:
+      code.append(digit)
+      if len(code) == 4:
+        break
+    # h and w don't separate letters with the same code; vowels do.
+    if c not in 'hw':
+      previous = digit
+  return ''.join(code).ljust(4, '0')
+
+
+def deletes(word):
+  '''Returns the strings made by deleting one character of word.'''
+  return set(word[:i] + word[i + 1:] for i in range(len(word)))
+
+
+def edit_distance(a, b, limit):
+  '''Returns the optimal string alignment distance between a and b:
+     the number of insertions, deletions, substitutions and adjacent
+     transpositions needed to turn one into the other.  Returns limit
+     + 1 as soon as the distance is known to exceed limit.'''
+  if a == b:
+    return 0
+  n, m = len(a), len(b)
+  if abs(n - m) > limit:
+    return limit + 1
+  # Only cells within limit of the diagonal can lead to a distance
+  # within limit, so only they are computed.
+  too_far = limit + 1
+  previous2 = None
+  previous = [j if j <= limit else too_far for j in range(m + 1)]
+  for i in range(1, n + 1):
+    current = [too_far] * (m + 1)
+    if i <= limit:
+      current[0] = i
+    low = max(1, i - limit)
+    high = min(m, i + limit)
+    row_minimum = current[0]
+    ai = a[i - 1]
+    for j in range(low, high + 1):
+      bj = b[j - 1]
+      d = previous[j - 1] if ai == bj else previous[j - 1] + 1
+      if previous[j] + 1 < d:
+        d = previous[j] + 1
+      if current[j - 1] + 1 < d:
+        d = current[j - 1] + 1
+      if (previous2 is not None and j > 1 and ai == b[j - 2] and
+          a[i - 2] == bj and previous2[j - 2] + 1 < d):
+        d = previous2[j - 2] + 1
+      current[j] = d
+      if d < row_minimum:
+        row_minimum = d
+    if row_minimum > limit:
+      return too_far
+    previous2, previous = previous, current
+  return min(previous[m], too_far)
+
+
+class FuzzyNameIndex (object):
+  '''FuzzyNameIndex finds the names within a small edit distance of a
+     query, or that sound like it.
+
+     It is a SymSpell style deletion dictionary: every name is filed
+     under itself and under each string made by deleting one of its
+     letters, and a query looks itself and its own one letter deletions
+     up.  That finds every name within one edit of the query and many
+     within two, without comparing the query to every name.  A second
+     index, of Soundex codes, is consulted when that doesn't find
+     enough, to catch misspellings that sound right but are further
+     away in spelling.
+
+     Names are lower cased.  Each name maps to the set of keys that
+     have it.'''
+
+  def __init__(self):
+    self.keys = {}
+    self.variants = {}
+    self.phonetic = {}
+
+  def _file(self, table, entry, name):
+    names = table.get(entry)
+    if names is None:
+      table[entry] = names = set()
+    names.add(name)
+
+  def _unfile(self, table, entry, name):
+    names = table.get(entry)
+    if names is not None:
+      names.discard(name)
+      if not names:
+        del table[entry]
+
+  def add(self, key, *names):
+    for name in names:
+      if not name:
+        continue
+      name = name.lower()
+      keys = self.keys.get(name)
+      if keys is None:
+        self.keys[name] = keys = set()
+        self._file(self.variants, name, name)
+        for variant in deletes(name):
+          self._file(self.variants, variant, name)
+        self._file(self.phonetic, soundex(name), name)
+      keys.add(key)
+
+  def remove(self, key, *names):
+    for name in names:
+      if not name:
+        continue
+      name = name.lower()
+      keys = self.keys.get(name)
+      if keys is None:
+        continue
+      keys.discard(key)
+      if keys:
+        continue
+      del self.keys[name]
+      self._unfile(self.variants, name, name)
+      for variant in deletes(name):
+        self._unfile(self.variants, variant, name)
+      self._unfile(self.phonetic, soundex(name), name)
+
+  def matches(self, query, max_distance=2, wanted=None):
+    '''Returns a list of (distance, sounds_different, name, keys) for the
+       names within max_distance edits of query, best first.  If these
+       names have fewer than wanted keys between them, names with the
+       same Soundex code as query that are within one more edit are
+       added too.'''
+    query = query.lower()
+    code = soundex(query)
+    candidates = set()
+    variants = self.variants
+    for variant in deletes(query) | set([query]):
+      names = variants.get(variant)
+      if names:
+        candidates.update(names)
+    result = []
+    found = 0
+    for name in candidates:
+      distance = edit_distance(query, name, max_distance)
+      if distance <= max_distance:
+        keys = self.keys[name]
+        result.append((distance, soundex(name) != code, name, keys))
+        found += len(keys)
+    if wanted is None or found < wanted:
+      limit = max_distance + 1
+      for name in self.phonetic.get(code, ()):
+        if name in candidates:
+          continue
+        distance = edit_distance(query, name, limit)
+        if distance <= limit:
+          result.append((distance, False, name, self.keys[name]))
+    result.sort(key=lambda match: match[:3])
+    return result
@@ -0,0 +1,121 @@
+# Pair the next round of a McMahon tournament.
+#
+# Reads the players registered by registration.py, the games reported
+# so far and the pairings of the earlier rounds, and writes
+# round<N>_pairings.tsv for the next round N.
+
+import argparse
+import glob
+import os.path
+import re
+import sys
+import mcmahon
+from aga_report_format import AGAReport, PASS_RECORD, PAIRING_RECORD, \
+    handicap_pattern, komi_pattern, whitespace_pattern
+from aga_roster import AGAMember
+from rank import Rank
+
+REGISTRATION_FILE = 'players.txt'
+PAIRINGS_FILE_FORMAT = 'round%d_pairings.tsv'
+PAIRINGS_FILE_RE = re.compile('round(?P<ROUND>[0-9]+)_pairings[.]tsv$')
+
+PAIRING_LINE_RE = re.compile(
+    PAIRING_RECORD.pattern +
+    whitespace_pattern() +
+    handicap_pattern() +
+    whitespace_pattern() +
+    komi_pattern())
+
+parser = argparse.ArgumentParser()
+
+parser.usage = '''
+
+pairings.py pairs the next round of the tournament whose files are in
+the current directory.  It writes round<N>_pairings.tsv, with one line
+per game giving the AGA IDs of white and black, the handicap and the
+komi, and a PASSED: line for each player with a bye.
+
+To re-pair a round, delete its pairings file and run pairings.py again.
+'''
+
+parser.add_argument('--bye', type=int, nargs='+', default=[], metavar='AGA_ID',
+                    help='Players who are sitting out this round.')
+parser.add_argument('--bar', type=lambda name: Rank[name.upper()],
+                    help='The McMahon bar, e.g. 3D.  Players above it start level with it.')
+parser.add_argument('--floor', type=lambda name: Rank[name.upper()],
+                    help='The McMahon floor, e.g. 20K.')
+parser.add_argument('--handicap-reduction', type=int, default=0,
+                    help='How many stones to reduce handicaps by.')
+
+
+def pairings_files():
+  '''Returns the round numbers and names of the existing pairings
+     files, in round order.'''
+  rounds = []
+  for file_name in glob.glob('round*_pairings.tsv'):
+    m = PAIRINGS_FILE_RE.match(os.path.basename(file_name))
+    if m:
+      rounds.append((int(m.group('ROUND')), file_name))
+  return sorted(rounds)
+
+
+def read_pairings(file_name):
+  '''Returns the Pairings and byes in the pairings file file_name.'''
+  pairings = []
+  byes = []
+  with open(file_name, 'r') as input:
+    for line in input:
+      if not line.strip():
+        continue
+      m = PASS_RECORD.match(line)
+      if m:
+        byes.append(int(m.group('AGA_ID')))
+        continue
+      m = PAIRING_LINE_RE.match(line)
+      if not m:
+        raise Exception('%s: malformed pairing: %s' % (file_name, line.strip()))
+      pairings.append(mcmahon.Pairing(int(m.group('WHITE_ID')), int(m.group('BLACK_ID')),
+                                      int(m.group('HANDICAP')), int(m.group('KOMI'))))
+  return pairings, byes
+
+
+def write_pairings(output, pairings, byes):
+  for p in pairings:
+    output.write('%d\t%d\t%d\t%d\n' % (p.white_id, p.black_id, p.handicap, p.komi))
+  for aga_id in byes:
+    output.write('PASSED:\t%d\n' % aga_id)
+
+
+def tournament_history(games, rounds):
+  '''Returns the History of a tournament given the games reported so
+     far and the (pairings, byes) of each earlier round.'''
+  history = mcmahon.History(games)
+  reported = set(frozenset(game.players) for game in games)
+  for pairings, byes in rounds:
+    for pairing in pairings:
+      if frozenset(pairing.players) not in reported:
+        history.add_game(pairing)
+    for aga_id in byes:
+      history.add_bye(aga_id)
+  return history
+
+
+def main():
+  args = parser.parse_args()
+  AGAMember.ensure_loaded()
+  aga_report = AGAReport(REGISTRATION_FILE)
+  aga_report.load()
+  rounds = pairings_files()
+  round_number = rounds[-1][0] + 1 if rounds else 1
+  history = tournament_history(aga_report.games,
+                               [read_pairings(file_name) for n, file_name in rounds])
+  pairings, byes = mcmahon.pair_round(aga_report.players, history, args.bye,
+                                      args.bar, args.floor, args.handicap_reduction)
+  file_name = PAIRINGS_FILE_FORMAT % round_number
+  with open(file_name, 'w') as output:
+    write_pairings(output, pairings, byes)
+  sys.stdout.write('Wrote %s: %d games, %d byes.\n' % (file_name, len(pairings), len(byes)))
+
+
+if __name__ == '__main__':
+  main()
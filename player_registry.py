@@ -0,0 +1,160 @@
+# The players registered for a tournament.
+#
+# PlayerRegistry is an ordered set of players keyed by AGA ID.  It can
+# be used where a list of players was, but finding, adding and removing
+# a player don't search the list.  It also keeps the players sorted in
+# the orders they are listed in, so that listing them, or writing the
+# report, doesn't sort them again.
+
+import bisect
+import datetime
+
+
+def name_key(player):
+  return ((player.last_name or '').lower(), (player.first_name or '').lower(),
+          player.aga_id)
+
+
+def id_key(player):
+  return player.aga_id
+
+
+def rank_key(player):
+  '''Strongest first, then by name.'''
+  return (-player.playing_at.value,) + name_key(player)
+
+
+# The ordinal expiration_key gives players without an expiration date,
+# such as placeholders, so that they come after every real date.
+UNDATED = datetime.date.max.toordinal() + 1
+
+
+def expiration_key(player):
+  '''The ordinal of the expiration date, soonest first, then AGA ID.'''
+  date = player.expiration_date
+  return (date.toordinal() if date else UNDATED, player.aga_id)
+
+
+# The orders players can be listed in.  'entered' is the order they
+# were registered in.
+SORT_KEYS = {'name': name_key, 'id': id_key, 'rank': rank_key,
+             'expiration': expiration_key}
+ORDERS = ('entered',) + tuple(sorted(SORT_KEYS))
+
+
+class SortedView (object):
+  '''SortedView keeps players sorted by key(player).  Each player is
+     filed under the key it had when it was added, so a player whose key
+     changes must be refiled.'''
+
+  def __init__(self, key, players=()):
+    players = list(players)
+    self.key = key
+    self.filed = dict((p.aga_id, key(p)) for p in players)
+    self.players = sorted(players, key=key)
+    self.keys = [self.filed[p.aga_id] for p in self.players]
+
+  def add(self, player):
+    key = self.key(player)
+    i = bisect.bisect_left(self.keys, key)
+    self.keys.insert(i, key)
+    self.players.insert(i, player)
+    self.filed[player.aga_id] = key
+
+  def remove(self, player):
+    i = bisect.bisect_left(self.keys, self.filed.pop(player.aga_id))
+    del self.keys[i]
+    del self.players[i]
+
+  def refile(self, player):
+    if self.filed[player.aga_id] != self.key(player):
+      self.remove(player)
+      self.add(player)
+
+  def between(self, low, high):
+    '''Returns the players whose keys are at least low and less than
+       high, in order.'''
+    keys = self.keys
+    return self.players[bisect.bisect_left(keys, low):bisect.bisect_left(keys, high)]
+
+
+class PlayerRegistry (object):
+  '''PlayerRegistry holds the players registered for a tournament, in
+     the order they were registered, keyed by AGA ID.  Iterating over it
+     gives the players in that order.
+
+     A player's rank should be changed with play_at, so the listing by
+     rank stays sorted.  Anything else that changes players' names or
+     ranks must call refile or invalidate afterwards.'''
+
+  def __init__(self, players=()):
+    self.by_id = {}
+    self._views = {}
+    self.extend(players)
+
+  def __len__(self):
+    return len(self.by_id)
+
+  def __iter__(self):
+    return iter(self.by_id.values())
+
+  def __contains__(self, player):
+    return self.by_id.get(player.aga_id) is player
+
+  def __repr__(self):
+    return 'PlayerRegistry(%r)' % list(self)
+
+  def lookup(self, aga_id):
+    return self.by_id.get(aga_id)
+
+  def append(self, player):
+    '''Registers player, who mustn't be registered already.'''
+    if player.aga_id in self.by_id:
+      raise ValueError('AGA member %d is already registered.' % player.aga_id)
+    self.by_id[player.aga_id] = player
+    for view in self._views.values():
+      view.add(player)
+
+  def extend(self, players):
+    for player in players:
+      self.append(player)
+
+  def remove(self, player):
+    if player not in self:
+      raise ValueError('AGA member %d is not registered.' % player.aga_id)
+    del self.by_id[player.aga_id]
+    for view in self._views.values():
+      view.remove(player)
+
+  def play_at(self, player, rank):
+    '''Changes the rank player plays at.'''
+    player.play_at(rank)
+    if player in self:
+      self.refile(player)
+
+  def refile(self, player):
+    '''Moves player to its place in each listing after a change to its
+       name or rank.'''
+    for view in self._views.values():
+      view.refile(player)
+
+  def invalidate(self):
+    '''Forgets the listings, after many players have changed.'''
+    self._views.clear()
+
+  def view(self, order='entered'):
+    '''Returns the list of players in order, one of ORDERS.  Except in
+       the entered order, which is copied, the list is kept up to date
+       as players are registered and unregistered and mustn't be
+       changed.'''
+    if order == 'entered':
+      return list(self.by_id.values())
+    return self.sorted_view(order).players
+
+  def sorted_view(self, order):
+    '''Returns the SortedView of the players in order, one of SORT_KEYS,
+       for range queries on its keys.'''
+    view = self._views.get(order)
+    if view is None:
+      view = self._views[order] = SortedView(SORT_KEYS[order], self.by_id.values())
+    return view
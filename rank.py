@@ -2,6 +2,11 @@
 import math
 from enum import Enum
 
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
 
 def define_ranks():
   ranks = []
@@ -16,18 +21,38 @@ define_ranks()
 del define_ranks
 
 
+# RANKS_BY_TRUNCATED_RATING[math.trunc(rating) + 30] is the Rank of a
+# rating between -30 and 9.  Ratings between -1 and 1 have no rank.
+RANKS_BY_TRUNCATED_RATING = (
+    [Rank(Rank['30K'].value + r + 30) for r in range(-30, 0)] +
+    [None] +
+    [Rank(Rank['1D'].value + r - 1) for r in range(1, 10)])
+
+
 def rank_from_rating(rating):
   # I've seen ratings in the AGA member file that are outside of the
   # valid range of -30 to 9.
   r = max(rating, -30)
   r = min(r, 9)
-  r = math.trunc(r)
-  if r >= 1:
-    # Dan rating
-    return Rank(Rank['1D'].value + r - 1)
-  if r <= -1:
-    return Rank(Rank['30K'].value + r + 30)
-  raise Exception('Invalid rating %f' % (rating,))
+  rank = RANKS_BY_TRUNCATED_RATING[math.trunc(r) + 30]
+  if rank is None:
+    raise Exception('Invalid rating %f' % (rating,))
+  return rank
+
+
+def ranks_from_ratings(ratings):
+  '''Returns a list of the Ranks of a whole sequence of ratings in one
+     pass, using NumPy if it's available.  Unlike rank_from_rating,
+     which raises an exception, gives None for a rating without a
+     rank.'''
+  if numpy is not None:
+    ratings = numpy.asarray(ratings, dtype=float)
+    indices = numpy.trunc(numpy.clip(ratings, -30, 9)).astype(int) + 30
+    return numpy.array(RANKS_BY_TRUNCATED_RATING, dtype=object)[indices].tolist()
+  table = RANKS_BY_TRUNCATED_RATING
+  trunc = math.trunc
+  return [table[trunc(-30 if r < -30 else 9 if r > 9 else r) + 30]
+          for r in ratings]
 
 
 # for rank in Rank:
@@ -38,4 +63,6 @@ assert rank_from_rating(1.1) == Rank['1D']
 assert rank_from_rating(9.9) == Rank['9D']
 assert rank_from_rating(-30) == Rank['30K']
 assert rank_from_rating(-1.2) == Rank['1K']
+assert ranks_from_ratings([1.1, 9.9, -30, -1.2, 0.5, 12, -45]) == [
+    Rank['1D'], Rank['9D'], Rank['30K'], Rank['1K'], None, Rank['9D'], Rank['30K']]
 
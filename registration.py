@@ -1,12 +1,30 @@
 
 import argparse
+import datetime
 import sys
-from aga_roster import AGAMember
-from aga_report_format import AGAReport
+import aga_roster
+import bulk_import
+import membership_fetch
+import player_registry
+import report_journal
+import roster_delta
+import roster_snapshot
+from aga_roster import AGAMember, prefetch_aga_membership_file
+from aga_report_format import AGAReport, FileFormatError
+from columnar_roster import ColumnarRegistry
+from lazy_roster import LazyRegistry
+from rank import Rank
 import command_loop
 
 REGISTRATION_FILE = 'players.txt'
 
+# e.g. 6/30/2024
+DATE_FORMAT = '%m/%d/%Y'
+
+# Memberships expiring within this many days of the tournament are
+# flagged too, so the players can be reminded to renew.
+EXPIRING_DAYS = 30
+
 parser = argparse.ArgumentParser()
 
 parser.usage = '''
@@ -26,16 +44,38 @@ Once started, registration.py enters a command loop.  Type 'help' for
 help.
 '''
 
+parser.add_argument('--timing', action='store_true',
+                    help='Report how long loading the AGA membership file takes.')
+parser.add_argument('--columnar', action='store_true',
+                    help='Keep the AGA membership list in a compact columnar form.')
+parser.add_argument('--lazy', action='store_true',
+                    help="Only decode AGA members' records when they are used.")
+parser.add_argument('--refresh', action='store_true',
+                    help='Check for a newer AGA membership file in the background.')
+parser.add_argument('--order', choices=player_registry.ORDERS, default='entered',
+                    help='The order players are listed in and saved in.')
+parser.add_argument('--stats', metavar='FILE',
+                    help='Time each command and, on exit, write the timings to FILE '
+                    'as tab separated values.')
+
 
 class ApplicationState(object):
   LISTING_NONE = 0
   LISTING_FOUND = 1
   LISTING_REGISTERED = 2
 
-  def __init__(self, aga_report):
+  def __init__(self, aga_report, journal=None):
+    '''journal is the ReportJournal of aga_report, if it is shared with
+       other ApplicationStates.'''
     self.aga_report = aga_report
+    self.journal = journal or report_journal.ReportJournal(aga_report)
     self.found = []
+    # The players as "who" last listed them, so that the numbers it
+    # showed still pick the same players after others are unregistered.
+    self.listed = []
     self.last_listing = ApplicationState.LISTING_NONE
+    # The date "who" flags players' memberships as expired on, if any.
+    self.eligibility_date = None
 
   @property
   def registered(self):
@@ -49,29 +89,73 @@ class ApplicationState(object):
       i += 1
     self.last_listing = ApplicationState.LISTING_FOUND
 
-  def list_players(self):
+  def list_players(self, order=None):
+    self.listed = list(self.registered.view(order or self.aga_report.player_order))
     sys.stdout.write('\nThere are %d players registered for the tournament:\n' %
-                     len(self.registered))
+                     len(self.listed))
+    flags = self.eligibility_flags()
     i = 1
-    for m in self.registered:
-      sys.stdout.write('  %3d.  %s\n' % (i, pretty_member(m, True)))
+    for m in self.listed:
+      sys.stdout.write('  %3d.  %s%s\n' % (i, pretty_member(m, True),
+                                            flags.get(m.aga_id, '')))
       i += 1
     self.last_listing = ApplicationState.LISTING_REGISTERED
 
+  def eligibility_flags(self):
+    '''Returns a dict from the AGA IDs of the registered players who
+       aren't eligible on eligibility_date, or won't be for long, to a
+       note saying why.'''
+    date = self.eligibility_date
+    if date is None:
+      return {}
+    index = self.registered.sorted_view('expiration')
+    flags = {}
+    for m in aga_roster.expired_members(index, date):
+      flags[m.aga_id] = '  EXPIRED %s' % m.expiration_date.strftime(DATE_FORMAT)
+    for m in aga_roster.expiring_members(index, date, EXPIRING_DAYS):
+      flags[m.aga_id] = '  expires %s' % m.expiration_date.strftime(DATE_FORMAT)
+    for m in aga_roster.undated_members(index):
+      flags[m.aga_id] = '  NOT A MEMBER' if m.is_placeholder else '  no expiration date'
+    return flags
+
   def register(self, member):
-    if member in self.registered:
+    if self.registered.lookup(member.aga_id):
       sys.stderr.write('%s already registered.\n' % pretty_member(member))
     else:
       self.registered.append(member)
+      self.journal.register(member)
       sys.stdout.write('%s registered.\n' % pretty_member(member))
 
+  def register_many(self, members):
+    '''Registers all of members, none of whom may be registered yet.'''
+    self.registered.extend(members)
+    self.journal.register_many(members)
+
   def unregister(self, member):
+    member = self.registered.lookup(member.aga_id) or member
     if member not in self.registered:
       sys.stderr.write("%s isn't registered.\n" % pretty_member(member))
     else:
       self.registered.remove(member)
+      self.journal.unregister(member)
       sys.stdout.write('%s is no longer registered.\n' % pretty_member(member))
 
+  def play_at(self, member, rank):
+    self.registered.play_at(member, rank)
+    if member in self.registered:
+      self.journal.play_at(member, rank)
+
+  def listed_player(self, index):
+    '''Returns the indexth player "who" listed, counting from 1, or None
+       after reporting why not.'''
+    if self.last_listing != ApplicationState.LISTING_REGISTERED:
+      sys.stderr.write('First use the "who" command to list the players who are registered.\n')
+      return None
+    if index < 1 or index > len(self.listed):
+      sys.stderr.write('Selection %d is out of range.\n' % index)
+      return None
+    return self.listed[index - 1]
+
 
 def pretty_member(member, listformat=False):
   if listformat:
@@ -83,6 +167,23 @@ Commands = command_loop.CommandTable()
 
 Commands.add_command(command_loop.EXIT_COMMAND)
 Commands.add_command(command_loop.HELP_COMMAND)
+Commands.add_command(command_loop.STATS_COMMAND)
+
+
+def complete_member_name(text, limit=100):
+  '''Returns up to limit last names in the AGA membership list that
+     begin with text, for tab completion.  Too many names begin with
+     one or two letters to be useful.'''
+  if len(text) < 3:
+    return []
+  needle = text.lower()
+  names = set()
+  for member in AGAMember.search(text):
+    if member.last_name.lower().startswith(needle):
+      names.add(text + member.last_name[len(text):])
+      if len(names) >= limit:
+        break
+  return sorted(names)
 
 
 @Commands('lookup', '[?](?P<AGA_ID>[0-9]+)')
@@ -97,10 +198,13 @@ def id_lookup_action(match, state, **ignore):
     sys.stderr.write('No member with AGA id %d found.\n' % id)
   
 
-@Commands('lookup', '[?](?P<SUBSTRING>[A-Za-z -]+)')
+@Commands('lookup', '[?](?P<SUBSTRING>[A-Za-z -]+)', complete_member_name)
 def name_search_action(match, state, **ignore):
   '''Find AGA members whose first or last name contains the specified substring.'''
   substring = match.group('SUBSTRING')
+  if AGAMember.loading():
+    sys.stderr.write('The AGA membership list is still loading; '
+                     'only %d members were searched.\n' % len(AGAMember.Registry))
   members = AGAMember.search(substring)
   if members:
     state.found = members
@@ -109,6 +213,18 @@ def name_search_action(match, state, **ignore):
     sys.stderr.write('No members have names matching %s.\n' % substring)
 
 
+@Commands('fuzzy', '[~](?P<NAME>[A-Za-z -]+)', complete_member_name)
+def fuzzy_search_action(match, state, **ignore):
+  '''Find AGA members whose first or last name is spelled or sounds like the specified name.'''
+  name = match.group('NAME').strip()
+  matches = AGAMember.fuzzy_search(name)
+  if matches:
+    state.found = [member for distance, member in matches]
+    state.list_found()
+  else:
+    sys.stderr.write('No members have names like %s.\n' % name)
+
+
 @Commands('found', 'found')
 def list_found(state, **ignore):
   '''Show the most recent search results.'''
@@ -132,45 +248,143 @@ def register(match, state, **ignore):
   state.register(state.found[index - 1])
 
 
+@Commands('import', 'import +(?P<FILE_NAME>.+)')
+def import_registrations(match, state, **ignore):
+  '''Register the players listed in a tab or comma separated pre-registration export.'''
+  file_name = match.group('FILE_NAME').strip()
+  try:
+    report = bulk_import.import_preregistrations(file_name, state.registered)
+  except (OSError, UnicodeDecodeError) as e:
+    sys.stderr.write('%s\n' % e)
+    return
+  report.write(sys.stdout)
+  members = report.members
+  state.register_many(members)
+  sys.stdout.write('Registered %d players.\n' % len(members))
+
+
 @Commands('unregister', 'unr(?P<INDEX>[0-9]*)')
 def unregister(match, state, **ignore):
-  if state.last_listing != ApplicationState.LISTING_REGISTERED:
-    sys.stderr.write('First use the "who" command to list the players who are registered.')
+  '''Unregister a player, numbered as the "who" command listed them.'''
+  member = state.listed_player(int(match.group('INDEX') or 0))
+  if member:
+    state.unregister(member)
+
+
+@Commands('rank', 'rank(?P<INDEX>[0-9]+) +(?P<RANK>[0-9]+[KkDd])')
+def change_rank(match, state, **ignore):
+  '''Change the rank a registered player plays at, e.g. rank3 5k.'''
+  member = state.listed_player(int(match.group('INDEX')))
+  if not member:
     return
-  count = len(state.registered)
-  index = int(match.group('INDEX'))
-  if index < 1 or index > count:
-    sys.stderr.write('Selection %d is out of range.\n' % index)
+  rank = Rank.__members__.get(match.group('RANK').upper())
+  if rank is None:
+    sys.stderr.write('Unknown rank %s.\n' % match.group('RANK').upper())
     return
-  state.unregister(state.registered[index - 1])
+  state.play_at(member, rank)
+  sys.stdout.write('%s\n' % pretty_member(member))
 
 
-@Commands('who', 'who')
-def who_is_playing(state, **ignore):
-  '''Lists those who are registered for the tournament.'''
-  state.list_players()
+@Commands('who', 'who( +(?P<ORDER>%s))?' % '|'.join(player_registry.ORDERS))
+def who_is_playing(match, state, **ignore):
+  '''Lists those who are registered for the tournament, optionally by name, id or rank.'''
+  state.list_players(match.group('ORDER'))
+
+
+@Commands('eligible', 'eligible( +(?P<DATE>[0-9]+/[0-9]+/[0-9]+|off))?')
+def check_eligibility(match, state, **ignore):
+  '''Flag players whose memberships have expired, or soon will, in "who" listings, as of a date such as 6/30/2024, by default today, or "off".'''
+  date = match.group('DATE')
+  if date == 'off':
+    state.eligibility_date = None
+    return
+  try:
+    date = datetime.datetime.strptime(date, DATE_FORMAT).date() if date else \
+        datetime.date.today()
+  except ValueError as e:
+    sys.stderr.write('%s\n' % e)
+    return
+  state.eligibility_date = date
+  flags = state.eligibility_flags()
+  sys.stdout.write('%d of %d players are flagged as of %s.\n' % (
+      len(flags), len(state.registered), date.strftime(DATE_FORMAT)))
+  for aga_id, note in flags.items():
+    sys.stdout.write('  %s%s\n' % (pretty_member(state.registered.lookup(aga_id), True),
+                                   note))
 
 
 @Commands('save', 'save')
 def save_registration(state, **ignore):
   '''Save the state of registration to a file.'''
-  state.aga_report.save()
+  state.journal.compact()
   sys.stdout.write('Wrote %s.\n' % state.aga_report.file_name)
 
 
+@Commands('update', 'update')
+def update_roster(state, **ignore):
+  '''Fetch a newer AGA membership file, if there is one, and apply its changes.'''
+  try:
+    aga_roster.fetch_aga_membership_file()
+  except membership_fetch.FetchError as e:
+    sys.stderr.write('%s\n' % e)
+  # The delta is taken against, and applied to, the whole list.
+  AGAMember.wait_loaded()
+  file_name = aga_roster.AGA_MEMBER_FILE_NAME
+  key = roster_snapshot.file_key(file_name)
+  if key == AGAMember.LoadedFileKey:
+    sys.stdout.write('The AGA membership list is up to date.\n')
+    return
+  delta = roster_delta.diff_member_file(AGAMember.Registry, file_name)
+  reranked = roster_delta.apply_delta(AGAMember.Registry, delta, state.registered)
+  # Registered players' names and ranks may have changed.
+  state.registered.invalidate()
+  for member, old_rank, new_rank in reranked:
+    state.journal.play_at(member, new_rank)
+  AGAMember.LoadedFileKey = key
+  sys.stdout.write('Updated the AGA membership list: %s.\n' % delta)
+  for member, old_rank, new_rank in reranked:
+    sys.stdout.write('%s now plays at %s instead of %s.\n' % (
+        pretty_member(member), new_rank.name, old_rank.name))
+
+
 @Commands('reload', 'reload')
 def reload_saved_file(state, **ignore):
-  state.aga_report.load()
+  '''Reread the saved registration, and any changes made since it was saved.'''
+  try:
+    state.aga_report.load()
+  except FileFormatError as e:
+    sys.stderr.write('%s\n' % e.describe())
+    return
+  state.journal.replay()
+  state.last_listing = ApplicationState.LISTING_NONE
 
 
 def main():
   args = parser.parse_args()
-  AGAMember.ensure_loaded()
-  aga_report = AGAReport(REGISTRATION_FILE)
-  aga_report.load()
+  if args.columnar:
+    AGAMember.use_registry(ColumnarRegistry())
+  elif args.lazy:
+    AGAMember.use_registry(LazyRegistry())
+  AGAMember.ensure_loaded(args.timing, background=True)
+  aga_report = AGAReport(REGISTRATION_FILE, args.order)
+  try:
+    aga_report.load()
+  except FileFormatError as e:
+    sys.stderr.write('%s\n' % e.describe())
+    sys.exit(1)
   state = ApplicationState(aga_report)
+  replayed = state.journal.replay()
+  if replayed:
+    sys.stdout.write('Recovered %d unsaved changes to %s.\n' % (replayed, REGISTRATION_FILE))
+  if args.refresh:
+    prefetch_aga_membership_file()
+  if args.stats:
+    Commands.enable_metrics()
   Commands.command_loop(state)
-  aga_report.save()
+  state.journal.compact()
+  if args.stats and Commands.metrics is not None:
+    with open(args.stats, 'w') as output:
+      Commands.metrics.write_tsv(output)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,160 @@
+# Serve registration to several registration desks at once.
+#
+# Each desk connects to the server, for example with
+#
+#   nc localhost 8462
+#
+# and gets the same commands as registration.py.  The server holds the
+# only copy of the AGA membership list and of the tournament's
+# players.txt, so every desk sees every other desk's registrations.
+# Each desk has its own search results and listings.
+#
+# Commands run one at a time, so changes never interleave.  They run in
+# a worker thread, so that a command waiting for the AGA membership list
+# to load doesn't keep the event loop from serving the other desks.
+# Each change is journaled as it is made, as in registration.py, and the
+# journal is compacted into players.txt every --save-interval seconds,
+# rather than on every change, and when the server stops.
+
+import argparse
+import asyncio
+import contextlib
+import io
+import sys
+import command_loop
+import player_registry
+import registration
+from aga_roster import AGAMember
+from aga_report_format import AGAReport
+from report_journal import ReportJournal
+
+DEFAULT_PORT = 8462
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--host', default='localhost',
+                    help='The address to listen on.')
+parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                    help='The TCP port to listen on.')
+parser.add_argument('--unix', metavar='PATH',
+                    help='Listen on a Unix socket at PATH instead of a TCP port.')
+parser.add_argument('--save-interval', type=float, default=30, metavar='SECONDS',
+                    help='How often to save players.txt if it has changed.')
+parser.add_argument('--order', choices=player_registry.ORDERS,
+                    default='entered',
+                    help='The order players are listed in and saved in.')
+
+
+class RegistrationServer (object):
+  '''RegistrationServer runs the commands in commands, a CommandTable,
+     for each connected desk against one shared AGAReport.'''
+
+  def __init__(self, aga_report, commands=registration.Commands, save_interval=30):
+    self.aga_report = aga_report
+    self.journal = ReportJournal(aga_report)
+    self.commands = commands
+    self.save_interval = save_interval
+    self.desks = 0
+    # Held while a command runs or the report is saved.  Made in start,
+    # on the event loop.
+    self.lock = None
+
+  def execute(self, state, line):
+    '''Runs the command line for the desk whose ApplicationState is
+       state.  Returns what the command wrote and whether the desk is
+       done.'''
+    output = io.StringIO()
+    done = False
+    with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+      c, m = self.commands.find(line)
+      if c is None:
+        sys.stderr.write('Command not found.\n')
+      else:
+        try:
+          c.doit(self.commands, m, state)
+        except command_loop.Exit:
+          done = True
+    return output.getvalue(), done
+
+  async def run(self, state, line):
+    '''Runs execute in a worker thread, once no other command is
+       running.'''
+    async with self.lock:
+      return await asyncio.get_running_loop().run_in_executor(
+          None, self.execute, state, line)
+
+  async def serve_desk(self, reader, writer):
+    state = registration.ApplicationState(self.aga_report, self.journal)
+    prompt = self.commands.prompt.encode()
+    self.desks += 1
+    try:
+      writer.write(prompt)
+      while True:
+        line = await reader.readline()
+        if not line:
+          break
+        line = line.decode('utf-8', 'replace').strip()
+        if line:
+          text, done = await self.run(state, line)
+          writer.write(text.encode())
+          if done:
+            break
+        writer.write(prompt)
+        await writer.drain()
+    except ConnectionError:
+      pass
+    finally:
+      self.desks -= 1
+      writer.close()
+
+  def save(self):
+    '''Saves the report if it has changed since it was last saved.'''
+    if len(self.journal):
+      self.journal.compact()
+
+  async def save_periodically(self):
+    while True:
+      await asyncio.sleep(self.save_interval)
+      async with self.lock:
+        self.save()
+
+  async def start(self, host='localhost', port=DEFAULT_PORT, unix=None):
+    '''Starts listening.  Returns the asyncio server.'''
+    self.lock = asyncio.Lock()
+    if unix:
+      return await asyncio.start_unix_server(self.serve_desk, unix)
+    return await asyncio.start_server(self.serve_desk, host, port)
+
+  async def serve(self, host='localhost', port=DEFAULT_PORT, unix=None):
+    '''Serves desks until cancelled, then saves the report.'''
+    server = await self.start(host, port, unix)
+    saver = asyncio.ensure_future(self.save_periodically())
+    try:
+      async with server:
+        await server.serve_forever()
+    finally:
+      saver.cancel()
+      async with self.lock:
+        self.save()
+
+
+def main():
+  args = parser.parse_args()
+  AGAMember.ensure_loaded(background=True)
+  aga_report = AGAReport(registration.REGISTRATION_FILE, args.order)
+  aga_report.load()
+  server = RegistrationServer(aga_report, save_interval=args.save_interval)
+  replayed = server.journal.replay()
+  if replayed:
+    sys.stdout.write('Recovered %d unsaved changes to %s.\n' % (
+        replayed, registration.REGISTRATION_FILE))
+  sys.stdout.write('Serving registration on %s.\n' % (
+      args.unix or '%s port %d' % (args.host, args.port)))
+  sys.stdout.flush()
+  try:
+    asyncio.run(server.serve(args.host, args.port, args.unix))
+  except KeyboardInterrupt:
+    pass
+
+
+if __name__ == '__main__':
+  main()
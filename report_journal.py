@@ -0,0 +1,140 @@
+# A journal of the changes made to an AGAReport's list of players since
+# it was last saved.
+#
+# Saving the whole report after every change is slow for a big
+# tournament and, if the program is killed part way through, loses the
+# report.  Instead each change is appended to a sidecar journal and
+# forced to disk.  On startup the journal is replayed on top of the
+# saved report.  Compacting saves the report, through a temporary file
+# that atomically replaces it, and empties the journal, leaving the
+# report as the only record of the players.
+#
+# Each journal line is a tab separated record:
+#
+#   register    AGA ID, last name, first name, rank
+#   unregister  AGA ID
+#   rank        AGA ID, rank
+
+import os
+import sys
+from aga_roster import AGAMember
+from rank import Rank
+
+JOURNAL_SUFFIX = '.journal'
+
+
+def journal_file_name(report_file_name):
+  return report_file_name + JOURNAL_SUFFIX
+
+
+class ReportJournal (object):
+  '''ReportJournal records changes to report.players as they are made.'''
+
+  def __init__(self, report):
+    self.report = report
+    self.file_name = journal_file_name(report.file_name)
+    self.file = None
+
+  def __len__(self):
+    '''Returns the number of records in the journal.'''
+    try:
+      with open(self.file_name, 'r') as f:
+        return sum(1 for line in f if line.endswith('\n'))
+    except FileNotFoundError:
+      return 0
+
+  def append(self, *records):
+    '''Appends records, each a tuple of fields, and forces them to disk.'''
+    if self.file is None:
+      self.file = open(self.file_name, 'a')
+    self.file.write(''.join('\t'.join(str(field) for field in fields) + '\n'
+                            for fields in records))
+    self.file.flush()
+    os.fsync(self.file.fileno())
+
+  @staticmethod
+  def register_record(member):
+    return ('register', member.aga_id, member.last_name, member.first_name or '',
+            member.playing_at.name)
+
+  def register(self, member):
+    self.append(self.register_record(member))
+
+  def register_many(self, members):
+    '''Records the registration of all of members with one write.'''
+    self.append(*[self.register_record(member) for member in members])
+
+  def unregister(self, member):
+    self.append(('unregister', member.aga_id))
+
+  def play_at(self, member, rank):
+    self.append(('rank', member.aga_id, rank.name))
+
+  def replay(self):
+    '''Applies the journal to the report's players, a PlayerRegistry.
+       Returns the number of records applied.'''
+    try:
+      f = open(self.file_name, 'rb')
+    except FileNotFoundError:
+      return 0
+    players = self.report.players
+    by_id = dict((p.aga_id, p) for p in players)
+    count = 0
+    # The length of the complete records read so far.
+    complete = 0
+    with f:
+      for line_number, line in enumerate(f, 1):
+        if not line.endswith(b'\n'):
+          # The last record was never completely written.  Cut it off,
+          # so the next record appended isn't joined onto it.
+          sys.stderr.write('%s %d: discarding an incomplete record.\n' %
+                           (self.file_name, line_number))
+          f.close()
+          os.truncate(self.file_name, complete)
+          break
+        complete += len(line)
+        try:
+          self.apply(players, by_id, line.decode().rstrip('\n').split('\t'))
+        except (IndexError, KeyError, ValueError):
+          sys.stderr.write('%s %d: ignoring malformed record.\n' %
+                           (self.file_name, line_number))
+          continue
+        count += 1
+    return count
+
+  def apply(self, players, by_id, fields):
+    action = fields[0]
+    aga_id = int(fields[1])
+    player = by_id.get(aga_id)
+    if action == 'register':
+      rank = Rank[fields[4]]
+      if player is None:
+        player = AGAMember.placeholder(fields[2], fields[3] or None, aga_id)
+        player.play_at(rank)
+        players.append(player)
+        by_id[aga_id] = player
+      else:
+        players.play_at(player, rank)
+    elif action == 'unregister':
+      if player is not None:
+        players.remove(player)
+        del by_id[aga_id]
+    elif action == 'rank':
+      if player is not None:
+        players.play_at(player, Rank[fields[2]])
+    else:
+      raise ValueError(action)
+
+  def compact(self):
+    '''Saves the report and empties the journal.'''
+    self.report.save()
+    if self.file is not None:
+      self.file.close()
+      self.file = None
+    if os.path.exists(self.file_name):
+      os.remove(self.file_name)
+
+  def close(self):
+    if self.file is not None:
+      self.file.close()
+      self.file = None
@@ -0,0 +1,98 @@
+# Show the standings of the tournament whose files are in the current
+# directory.
+#
+# With --watch the standings are shown again whenever more results are
+# saved, so they can be put up on the wall during the tournament.
+
+import argparse
+import os
+import sys
+import time
+from aga_report_format import AGAReport
+from aga_roster import AGAMember
+from rank import Rank
+from standings import Standings
+
+REGISTRATION_FILE = 'players.txt'
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--bar', type=lambda name: Rank[name.upper()],
+                    help='The McMahon bar, e.g. 3D.')
+parser.add_argument('--floor', type=lambda name: Rank[name.upper()],
+                    help='The McMahon floor, e.g. 20K.')
+parser.add_argument('--watch', type=float, metavar='SECONDS',
+                    help='Check for new results every SECONDS seconds.')
+parser.add_argument('--top', type=int,
+                    help='Only show the first TOP players.')
+
+
+def write_standings(output, standings, top=None):
+  output.write('%5s  %-32s %4s %4s %5s %6s %7s\n' % (
+      'Place', 'Player', 'Rank', 'Wins', 'Score', 'SOS', 'SOSOS'))
+  place = 0
+  for aga_id in standings.ordered()[:top]:
+    place += 1
+    p = standings.players[aga_id]
+    output.write('%5d  %-32s %4s %4d %5d %6d %7d\n' % (
+        place, '%s, %s (%d)' % (p.last_name, p.first_name, aga_id),
+        p.playing_at.name, standings.wins[aga_id], standings.score[aga_id],
+        standings.sos[aga_id], standings.sosos[aga_id]))
+
+
+def entrants(report):
+  return [(p.aga_id, p.playing_at) for p in report.players]
+
+
+class LiveStandings (object):
+  '''LiveStandings follows a report file as results are added to it,
+     updating its Standings with only the new games and byes.'''
+
+  def __init__(self, file_name, bar=None, floor=None):
+    self.file_name = file_name
+    self.bar = bar
+    self.floor = floor
+    self.mtime = None
+    self.report = None
+    self.standings = None
+
+  def refresh(self):
+    '''Rereads the report if it has changed.  Returns True if it had.'''
+    mtime = os.stat(self.file_name).st_mtime_ns
+    if mtime == self.mtime:
+      return False
+    self.mtime = mtime
+    report = AGAReport(self.file_name)
+    report.load()
+    old = self.report
+    if old is None or entrants(report) != entrants(old) or \
+       report.games[:len(old.games)] != old.games or \
+       report.byes[:len(old.byes)] != old.byes:
+      # Not just new results.  Start over.
+      self.standings = Standings(report.players, self.bar, self.floor)
+      new_games, new_byes = report.games, report.byes
+    else:
+      new_games, new_byes = report.games[len(old.games):], report.byes[len(old.byes):]
+    for game in new_games:
+      self.standings.add_game(game)
+    for aga_id in new_byes:
+      self.standings.add_bye(aga_id)
+    self.report = report
+    return True
+
+
+def main():
+  args = parser.parse_args()
+  AGAMember.ensure_loaded()
+  live = LiveStandings(REGISTRATION_FILE, args.bar, args.floor)
+  live.refresh()
+  write_standings(sys.stdout, live.standings, args.top)
+  while args.watch:
+    time.sleep(args.watch)
+    if live.refresh():
+      sys.stdout.write('\n%s\n' % time.strftime('%H:%M:%S'))
+      write_standings(sys.stdout, live.standings, args.top)
+      sys.stdout.flush()
+
+
+if __name__ == '__main__':
+  main()
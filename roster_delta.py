@@ -0,0 +1,120 @@
+# Bringing the loaded AGA membership list up to date with a newer
+# TDListA.txt without reloading it.
+#
+# The new file is streamed one record at a time and compared, by AGA
+# ID, with the members already in memory, which were loaded from the
+# previous file.  Only the differences are kept and then applied to
+# the registry, so the two versions of the roster are never both in
+# memory.
+
+from aga_roster import AGAMember, _supersedes, read_member_records
+
+
+class RosterDelta (object):
+  '''RosterDelta describes how a newer membership file differs from
+     the loaded roster.
+
+       added     records of members who weren't loaded, or were only
+                 placeholders
+       changed   (member, record, fields) triples, fields naming what
+                 changed: name, membership_type, rating, expiration,
+                 club, state or last_rated
+       removed   the AGA IDs of members who are no longer listed
+
+     A record is a tuple of the arguments to AGAMember's constructor.'''
+
+  def __init__(self):
+    self.added = []
+    self.changed = []
+    self.removed = []
+
+  def __len__(self):
+    return len(self.added) + len(self.changed) + len(self.removed)
+
+  def __str__(self):
+    return '%d added, %d changed, %d removed' % (
+        len(self.added), len(self.changed), len(self.removed))
+
+
+def changed_fields(member, record):
+  '''Returns the names of the fields in which member differs from record.'''
+  (last_name, first_name, aga_id, membership_type, rating, expiration_date,
+   club, state, last_rated) = record
+  fields = []
+  if member.last_name != last_name or member.first_name != first_name:
+    fields.append('name')
+  if member.membership_type != membership_type:
+    fields.append('membership_type')
+  if member.rating != rating:
+    fields.append('rating')
+  if member.expiration_date != expiration_date:
+    fields.append('expiration')
+  if member.club != club:
+    fields.append('club')
+  if member.state != state:
+    fields.append('state')
+  if member.last_rated != last_rated:
+    fields.append('last_rated')
+  return fields
+
+
+def diff_member_file(registry, file_name):
+  '''Compares the membership file file_name with the members in
+     registry and returns a RosterDelta.  Duplicate AGA IDs within
+     file_name are resolved with the registry's usual policy.'''
+  seen = set()
+  # AGA ID to the record that will replace or add the member.
+  pending = {}
+  for record in read_member_records(file_name):
+    aga_id = record[2]
+    if aga_id in seen:
+      previous = pending.get(aga_id)
+      if previous is None:
+        previous = registry.lookup(aga_id)
+      else:
+        previous = AGAMember(*previous)
+      if not _supersedes(AGAMember(*record), previous):
+        continue
+      pending.pop(aga_id, None)
+    seen.add(aga_id)
+    member = registry.lookup(aga_id)
+    if member is None or member.is_placeholder or changed_fields(member, record):
+      pending[aga_id] = record
+  delta = RosterDelta()
+  for aga_id, record in pending.items():
+    member = registry.lookup(aga_id)
+    if member is None or member.is_placeholder:
+      delta.added.append(record)
+    else:
+      delta.changed.append((member, record, changed_fields(member, record)))
+  for aga_id in registry.member_ids():
+    if aga_id not in seen and not registry.lookup(aga_id).is_placeholder:
+      delta.removed.append(aga_id)
+  return delta
+
+
+def apply_delta(registry, delta, players=()):
+  '''Applies delta to registry.  Members are updated in place, so
+     players, the members registered for a tournament, see the changes.
+     A player who was playing at the rank their old rating implied is
+     moved to the rank implied by their new rating.  Returns a list of
+     (member, old rank, new rank) for the players whose rank changed.'''
+  registered = set(player.aga_id for player in players)
+  reranked = []
+  for record in delta.added:
+    if registry.lookup(record[2]) is None:
+      registry.add_record(*record)
+    else:
+      registry.update_record(*record)
+  for member, record, fields in delta.changed:
+    if 'rating' in fields and member.aga_id in registered:
+      old_playing_at = member.playing_at
+      rating_rank = member.rank
+      registry.update_record(*record)
+      if old_playing_at == rating_rank and member.rank != rating_rank:
+        member.play_at(member.rank)
+        reranked.append((member, old_playing_at, member.rank))
+    else:
+      registry.update_record(*record)
+  registry.remove_many(delta.removed)
+  return reranked
@@ -0,0 +1,95 @@
+# A binary snapshot of the parsed AGA membership file, kept next to it
+# so that later runs can skip parsing TDListA.txt.
+
+import array
+import datetime
+import hashlib
+import math
+import os
+import pickle
+from name_index import TrigramIndex
+
+
+SNAPSHOT_SUFFIX = '.snapshot'
+SNAPSHOT_VERSION = 2
+
+
+def snapshot_file_name(file_name):
+  return file_name + SNAPSHOT_SUFFIX
+
+
+def file_key(file_name):
+  '''Returns the size, modification time and content hash of file_name.
+     A snapshot is only valid for the file whose key it records.'''
+  stat = os.stat(file_name)
+  digest = hashlib.sha256()
+  with open(file_name, 'rb') as f:
+    for block in iter(lambda: f.read(1 << 20), b''):
+      digest.update(block)
+  return (stat.st_size, stat.st_mtime_ns, digest.hexdigest())
+
+
+def write_snapshot(file_name, records, name_index, key=None):
+  '''Writes a snapshot of records, the (last_name, first_name, aga_id,
+     membership_type, rating, expiration_date, club, state, last_rated)
+     tuples parsed from
+     file_name, and of the TrigramIndex of the members loaded from
+     them.  The snapshot is written to a temporary file which is
+     then renamed so that a reader never sees a partial snapshot.'''
+  if key is None:
+    key = file_key(file_name)
+  columns = {
+      'last_names': [r[0] for r in records],
+      'first_names': [r[1] for r in records],
+      'aga_ids': array.array('q', [r[2] for r in records]),
+      'membership_types': [r[3] for r in records],
+      # NaN marks a missing rating, 0 a missing expiration date.
+      'ratings': array.array('d', [math.nan if r[4] is None else r[4]
+                                   for r in records]),
+      'expirations': array.array('l', [r[5].toordinal() if r[5] else 0
+                                       for r in records]),
+      'clubs': [r[6] for r in records],
+      'states': [r[7] for r in records],
+      'last_rated': array.array('l', [r[8].toordinal() if r[8] else 0
+                                      for r in records]),
+      'name_postings': name_index.to_postings()
+      }
+  snapshot = snapshot_file_name(file_name)
+  temp = snapshot + '.tmp'
+  with open(temp, 'wb') as f:
+    pickle.dump((SNAPSHOT_VERSION, key), f, pickle.HIGHEST_PROTOCOL)
+    pickle.dump(columns, f, pickle.HIGHEST_PROTOCOL)
+  os.replace(temp, snapshot)
+
+
+def read_snapshot(file_name, key=None):
+  '''Returns the records and TrigramIndex saved in the snapshot of
+     file_name, or None if there is no snapshot or it doesn't match
+     file_name's current contents.'''
+  try:
+    with open(snapshot_file_name(file_name), 'rb') as f:
+      version, snapshot_key = pickle.load(f)
+      if version != SNAPSHOT_VERSION:
+        return None
+      if key is None:
+        key = file_key(file_name)
+      if tuple(snapshot_key) != key:
+        return None
+      columns = pickle.load(f)
+  except (OSError, EOFError, KeyError, ValueError, TypeError,
+          pickle.UnpicklingError):
+    return None
+  fromordinal = datetime.date.fromordinal
+  isnan = math.isnan
+  records = list(zip(
+      columns['last_names'],
+      columns['first_names'],
+      columns['aga_ids'],
+      columns['membership_types'],
+      [None if isnan(rating) else rating for rating in columns['ratings']],
+      [fromordinal(e) if e else None for e in columns['expirations']],
+      # Pickling keeps the interned strings shared.
+      columns['clubs'],
+      columns['states'],
+      [fromordinal(d) if d else None for d in columns['last_rated']]))
+  return records, TrigramIndex.from_postings(columns['name_postings'])
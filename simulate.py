@@ -0,0 +1,255 @@
+# Simulate the tournament whose players are registered in the current
+# directory many times over, to see how McMahon placement and the
+# handicap rules will play out before the tournament is held.
+#
+# Each simulated tournament pairs every round with mcmahon.pair_round
+# and decides each game at random, the odds depending on how much
+# stronger one player is than the other after the handicap.  A player's
+# strength is their rating, or failing that the rank they play at, plus
+# a random amount for their form on the day.
+#
+# The tournaments are simulated in batches in a pool of processes and
+# the batches' summaries are merged as they finish.
+
+import argparse
+import collections
+import concurrent.futures
+import math
+import os
+import random
+import sys
+import time
+import mcmahon
+from aga_report_format import AGAReport
+from aga_roster import AGAMember
+from rank import Rank
+from standings import Standings
+
+REGISTRATION_FILE = 'players.txt'
+
+# How many tournaments each process simulates at a time.  The batches
+# don't depend on the number of processes, so neither do the results.
+BATCH_SIZE = 50
+
+# The standard deviation, in stones, of a player's form on the day.
+FORM_DEVIATION = 0.5
+
+# The odds of the stronger player winning are e to the power of
+# WIN_SCALE times their advantage in stones, so with WIN_SCALE 1 a
+# player one stone stronger wins about 73% of the time.
+WIN_SCALE = 1.0
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--tournaments', type=int, default=1000,
+                    help='How many tournaments to simulate.')
+parser.add_argument('--rounds', type=int, default=5,
+                    help='How many rounds each tournament has.')
+parser.add_argument('--prizes', type=int, default=3,
+                    help='How many places win prizes.')
+parser.add_argument('--processes', type=int, default=os.cpu_count(),
+                    help='How many processes to simulate in.')
+parser.add_argument('--seed', type=int, default=0)
+parser.add_argument('--bar', type=lambda name: Rank[name.upper()],
+                    help='The McMahon bar, e.g. 3D.')
+parser.add_argument('--floor', type=lambda name: Rank[name.upper()],
+                    help='The McMahon floor, e.g. 20K.')
+parser.add_argument('--handicap-reduction', type=int, default=0,
+                    help='How many stones to reduce handicaps by.')
+
+
+# What the simulation needs to know about a player.  strength is in
+# the units of Rank values: stones.
+SimulatedPlayer = collections.namedtuple('SimulatedPlayer', 'aga_id playing_at strength')
+
+
+def rating_strength(rating):
+  '''Returns a rating in the units of Rank values, so that 1.5 lies half
+     way between 1D and 2D and -1.5 half way between 1K and 2K.'''
+  if rating >= 1:
+    return Rank['1D'].value + rating - 1
+  return Rank['1K'].value + rating + 1
+
+
+def simulated_player(member):
+  rating = member.rating
+  if rating and (rating >= 1 or rating <= -1):
+    strength = rating_strength(max(min(rating, 9.99), -30.99))
+  else:
+    strength = member.playing_at.value
+  return SimulatedPlayer(member.aga_id, member.playing_at, strength)
+
+
+def compensation(handicap, komi):
+  '''Returns how many stones the handicap and komi are worth to black.'''
+  if handicap:
+    return handicap
+  return 1 - komi / mcmahon.DEFAULT_KOMI
+
+
+def white_wins(white_strength, black_strength, pairing, rng):
+  advantage = white_strength - black_strength - compensation(pairing.handicap,
+                                                              pairing.komi)
+  return rng.random() < 1 / (1 + math.exp(-WIN_SCALE * advantage))
+
+
+class SimulationSummary (object):
+  '''SimulationSummary accumulates the outcomes of simulated
+     tournaments:
+
+       tournaments  the number simulated
+       rounds       the number of rounds paired
+       unpairable   the number of rounds that couldn't be paired
+                    without a rematch, which ends the tournament
+       handicaps    a Counter of the (handicap, komi) of every game
+       places       a Counter of (AGA ID, place) for the prize winners'''
+
+  def __init__(self):
+    self.tournaments = 0
+    self.rounds = 0
+    self.unpairable = 0
+    self.handicaps = collections.Counter()
+    self.places = collections.Counter()
+
+  def merge(self, other):
+    self.tournaments += other.tournaments
+    self.rounds += other.rounds
+    self.unpairable += other.unpairable
+    self.handicaps.update(other.handicaps)
+    self.places.update(other.places)
+
+  @property
+  def games(self):
+    return sum(self.handicaps.values())
+
+  def prize_counts(self):
+    '''Returns a Counter of the number of prizes each AGA ID won.'''
+    counts = collections.Counter()
+    for (aga_id, place), count in self.places.items():
+      counts[aga_id] += count
+    return counts
+
+
+def simulate_tournament(players, rng, rounds, prizes, summary, bar=None,
+                        floor=None, handicap_reduction=0):
+  '''Simulates one tournament between players, a list of
+     SimulatedPlayers, adding the outcome to summary.'''
+  strength = dict((p.aga_id, p.strength + rng.gauss(0, FORM_DEVIATION))
+                  for p in players)
+  history = mcmahon.History()
+  standings = Standings(players, bar, floor)
+  summary.tournaments += 1
+  for round in range(rounds):
+    try:
+      pairings, byes = mcmahon.pair_round(players, history, (), bar, floor,
+                                          handicap_reduction)
+    except mcmahon.UnpairableError:
+      summary.unpairable += 1
+      break
+    summary.rounds += 1
+    for p in pairings:
+      winner = 'w' if white_wins(strength[p.white_id], strength[p.black_id], p, rng) else 'b'
+      game = mcmahon.Game(p.white_id, p.black_id, winner, p.handicap, p.komi)
+      history.add_game(game)
+      standings.add_game(game)
+      summary.handicaps[p.handicap, p.komi] += 1
+    for aga_id in byes:
+      history.add_bye(aga_id)
+      standings.add_bye(aga_id)
+  for place, aga_id in enumerate(standings.ordered()[:prizes], 1):
+    summary.places[aga_id, place] += 1
+
+
+def simulate_batch(players, seed, count, rounds, prizes, bar=None, floor=None,
+                   handicap_reduction=0):
+  '''Simulates count tournaments from seed.  Returns their
+     SimulationSummary.'''
+  rng = random.Random(seed)
+  summary = SimulationSummary()
+  for i in range(count):
+    simulate_tournament(players, rng, rounds, prizes, summary, bar, floor,
+                        handicap_reduction)
+  return summary
+
+
+def simulate(players, tournaments, rounds=5, prizes=3, processes=None, seed=0,
+             bar=None, floor=None, handicap_reduction=0):
+  '''Simulates tournaments tournaments between players, a list of
+     SimulatedPlayers, in processes processes.  Yields the running
+     SimulationSummary as each batch finishes.  With processes 1 the
+     batches are simulated in this process.'''
+  batches = [(seed * 1000003 + i, min(BATCH_SIZE, tournaments - start))
+             for i, start in enumerate(range(0, tournaments, BATCH_SIZE))]
+  summary = SimulationSummary()
+  options = (rounds, prizes, bar, floor, handicap_reduction)
+  if processes == 1:
+    for batch_seed, count in batches:
+      summary.merge(simulate_batch(players, batch_seed, count, *options))
+      yield summary
+    return
+  with concurrent.futures.ProcessPoolExecutor(processes) as pool:
+    futures = [pool.submit(simulate_batch, players, batch_seed, count, *options)
+               for batch_seed, count in batches]
+    for future in concurrent.futures.as_completed(futures):
+      summary.merge(future.result())
+      yield summary
+
+
+def handicap_name(handicap, komi):
+  if handicap:
+    return '%d stones' % handicap
+  if komi:
+    return 'even, %d komi' % komi
+  return 'no komi'
+
+
+def write_summary(output, summary, players, prizes):
+  output.write('%d rounds paired' % summary.rounds)
+  if summary.unpairable:
+    output.write(', %d (%.1f%%) could only have been paired with a rematch' % (
+        summary.unpairable, summary.unpairable * 100 / (summary.rounds + summary.unpairable)))
+  output.write('.\n\nHandicaps, of %d games:\n' % summary.games)
+  for (handicap, komi), count in sorted(summary.handicaps.items()):
+    output.write('  %-14s %6.1f%%\n' % (handicap_name(handicap, komi),
+                                       count * 100 / summary.games))
+  output.write('\nPrize winners, of %d tournaments:\n' % summary.tournaments)
+  output.write('  %-32s %4s %7s %7s\n' % ('Player', 'Rank', 'First', 'Prize'))
+  for aga_id, count in summary.prize_counts().most_common():
+    p = players[aga_id]
+    output.write('  %-32s %4s %6.1f%% %6.1f%%\n' % (
+        '%s, %s (%d)' % (p.last_name, p.first_name, aga_id), p.playing_at.name,
+        summary.places[aga_id, 1] * 100 / summary.tournaments,
+        count * 100 / summary.tournaments))
+  by_rank = collections.Counter()
+  for aga_id, count in summary.prize_counts().items():
+    by_rank[players[aga_id].playing_at] += count
+  output.write('\nPrizes by rank:\n')
+  for rank in sorted(by_rank, key=lambda rank: -rank.value):
+    output.write('  %-4s %6.1f%%\n' % (rank.name, by_rank[rank] * 100 /
+                                        (summary.tournaments * prizes)))
+
+
+def main():
+  args = parser.parse_args()
+  AGAMember.ensure_loaded()
+  aga_report = AGAReport(REGISTRATION_FILE)
+  aga_report.load()
+  players = [simulated_player(p) for p in aga_report.players]
+  start = time.perf_counter()
+  summary = SimulationSummary()
+  for summary in simulate(players, args.tournaments, args.rounds, args.prizes,
+                          args.processes, args.seed, args.bar, args.floor,
+                          args.handicap_reduction):
+    sys.stderr.write('\r%d of %d tournaments simulated' % (summary.tournaments,
+                                                          args.tournaments))
+  elapsed = time.perf_counter() - start
+  sys.stderr.write('\n')
+  sys.stdout.write('Simulated %d tournaments of %d players in %.1f seconds: '
+                   '%.1f tournaments a second in %d processes.\n' % (
+                       summary.tournaments, len(players), elapsed,
+                       summary.tournaments / elapsed, args.processes))
+  write_summary(sys.stdout, summary, dict((p.aga_id, p) for p in aga_report.players),
+                args.prizes)
+
+
+if __name__ == '__main__':
+  main()
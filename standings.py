@@ -0,0 +1,132 @@
+# Tournament standings.
+#
+# Players are ordered by McMahon score, then by SOS, the sum of their
+# opponents' McMahon scores, then by SOSOS, the sum of their opponents'
+# SOS.  Standings keeps all three up to date as results are reported,
+# so the standings can be shown after every game.  Reporting a result
+# touches only the two players, their opponents and their opponents'
+# opponents.
+#
+# Games and byes of players who aren't registered, for example ones
+# unregistered after playing, are left out with a warning.
+
+import collections
+import sys
+from mcmahon import BYE_SCORE, starting_score
+
+
+class Standings (object):
+  '''Standings holds the score and tiebreakers of each player, keyed by
+     AGA ID:
+
+       wins        the number of games won
+       score       the McMahon score
+       sos         the sum of the opponents' McMahon scores
+       sosos       the sum of the opponents' SOS
+       opponents   the list of players played, one entry per game'''
+
+  def __init__(self, players, bar=None, floor=None):
+    self.players = dict((p.aga_id, p) for p in players)
+    self.wins = collections.Counter()
+    self.byes = collections.Counter()
+    self.score = dict((p.aga_id, starting_score(p, bar, floor)) for p in players)
+    self.sos = dict.fromkeys(self.players, 0)
+    self.sosos = dict.fromkeys(self.players, 0)
+    self.opponents = dict((aga_id, []) for aga_id in self.players)
+
+  def _registered(self, what, *aga_ids):
+    '''Returns True if every one of aga_ids is a player.  If not, warns
+       that what is being left out and returns False.'''
+    unknown = [aga_id for aga_id in aga_ids if aga_id not in self.players]
+    if not unknown:
+      return True
+    sys.stderr.write('Leaving out %s: %s not registered.\n' % (
+        what, ' and '.join(str(aga_id) for aga_id in unknown)))
+    return False
+
+  def _game_counts(self, game):
+    return self._registered('the game between %d and %d' % (game.white_id, game.black_id),
+                           game.white_id, game.black_id)
+
+  def add_game(self, game):
+    if not self._game_counts(game):
+      return
+    self._link(game.white_id, game.black_id)
+    self.wins[game.winner_id] += 1
+    self._change_score(game.winner_id, 1)
+
+  def remove_game(self, game):
+    '''Undoes add_game(game), to correct a misreported result.'''
+    if not self._game_counts(game):
+      return
+    self.wins[game.winner_id] -= 1
+    self._change_score(game.winner_id, -1)
+    self._unlink(game.white_id, game.black_id)
+
+  def add_bye(self, aga_id):
+    if not self._registered('the bye of %d' % aga_id, aga_id):
+      return
+    self.byes[aga_id] += 1
+    self._change_score(aga_id, BYE_SCORE)
+
+  def _change_score(self, aga_id, delta):
+    self.score[aga_id] += delta
+    for opponent in self.opponents[aga_id]:
+      self._change_sos(opponent, delta)
+
+  def _change_sos(self, aga_id, delta):
+    self.sos[aga_id] += delta
+    sosos = self.sosos
+    for opponent in self.opponents[aga_id]:
+      sosos[opponent] += delta
+
+  def _link(self, a, b):
+    # Records a game between a and b, adding their scores and SOS to
+    # each other's tiebreakers.
+    self.opponents[a].append(b)
+    self.opponents[b].append(a)
+    self.sosos[a] += self.sos[b]
+    self.sosos[b] += self.sos[a]
+    self._change_sos(a, self.score[b])
+    self._change_sos(b, self.score[a])
+
+  def _unlink(self, a, b):
+    # Undoes _link(a, b), in the opposite order.
+    self._change_sos(b, -self.score[a])
+    self._change_sos(a, -self.score[b])
+    self.sosos[b] -= self.sos[a]
+    self.sosos[a] -= self.sos[b]
+    self.opponents[b].remove(a)
+    self.opponents[a].remove(b)
+
+  def sort_key(self, aga_id):
+    return (-self.score[aga_id], -self.sos[aga_id], -self.sosos[aga_id], aga_id)
+
+  def ordered(self):
+    '''Returns the list of AGA IDs from first place to last.'''
+    return sorted(self.players, key=self.sort_key)
+
+
+def recompute_standings(players, games, byes=(), bar=None, floor=None):
+  '''Returns the Standings after games and byes, computing them from
+     scratch rather than incrementally.'''
+  standings = Standings(players, bar, floor)
+  score = standings.score
+  for game in games:
+    if not standings._game_counts(game):
+      continue
+    standings.opponents[game.white_id].append(game.black_id)
+    standings.opponents[game.black_id].append(game.white_id)
+    standings.wins[game.winner_id] += 1
+    score[game.winner_id] += 1
+  for aga_id in byes:
+    if not standings._registered('the bye of %d' % aga_id, aga_id):
+      continue
+    standings.byes[aga_id] += 1
+    score[aga_id] += BYE_SCORE
+  for aga_id, opponents in standings.opponents.items():
+    standings.sos[aga_id] = sum(score[opponent] for opponent in opponents)
+  sos = standings.sos
+  for aga_id, opponents in standings.opponents.items():
+    standings.sosos[aga_id] = sum(sos[opponent] for opponent in opponents)
+  return standings
@@ -0,0 +1,144 @@
+# Deterministic synthetic data for benchmarking without a real
+# TDListA.txt.
+
+import random
+
+
+ONSETS = ['', 'b', 'c', 'd', 'f', 'g', 'h', 'j', 'k', 'l', 'm', 'n', 'p',
+          'r', 's', 't', 'v', 'w', 'y', 'z', 'ch', 'sh', 'th', 'st']
+NUCLEI = ['a', 'e', 'i', 'o', 'u', 'ai', 'ou', 'ee']
+CODAS = ['', 'n', 'r', 's', 'l', 'k', 'ng', 'm', 'tt']
+
+LAST_NAME_SYLLABLES = [onset + nucleus + coda
+                       for onset in ONSETS
+                       for nucleus in NUCLEI
+                       for coda in CODAS]
+
+FIRST_NAMES = [
+    'Mark', 'Wanda', 'Eva', 'John', 'Mei', 'Hiroshi', 'Ana', 'Paul',
+    'Li', 'Sung', 'Maria', 'David', 'Yuki', 'Olga', 'Chris', 'Ravi',
+    'Sarah', 'Tomas', 'Jin', 'Kate', 'Lucas', 'Nadia', 'Ben', 'Ming']
+
+MEMBERSHIP_TYPES = ['Full', 'Youth', 'Limited', 'Life', 'Sustainer']
+
+# States, most members first.
+STATES = ['CA', 'NY', 'MA', 'WA', 'TX', 'NJ', 'IL', 'PA', 'MD', 'VA', 'NC',
+          'CO', 'OR', 'FL', 'MI', 'OH', 'GA', 'MN', 'AZ', 'UT']
+
+
+def synthetic_last_name(rng):
+  syllables = [rng.choice(LAST_NAME_SYLLABLES)
+               for i in range(rng.randint(2, 3))]
+  return ''.join(syllables).capitalize()
+
+
+# Common surnames, most common first.  Real membership lists are
+# dominated by a few very common names with a long tail of rare ones.
+COMMON_LAST_NAMES = [
+    'Kim', 'Lee', 'Smith', 'Wang', 'Chen', 'Park', 'Nguyen', 'Johnson',
+    'Zhang', 'Brown', 'Liu', 'Williams', 'Choi', 'Jones', 'Li', 'Miller',
+    'Tanaka', 'Davis', 'Yang', 'Garcia', 'Huang', 'Wilson', 'Suzuki',
+    'Anderson', 'Wu', 'Taylor', 'Jung', 'Thomas', 'Zhao', 'Moore']
+
+
+def zipf_weights(count):
+  '''Returns cumulative weights for choosing among count items with
+     the k-th most common item chosen in proportion to 1 / k.'''
+  total = 0.0
+  weights = []
+  for k in range(1, count + 1):
+    total += 1.0 / k
+    weights.append(total)
+  return weights
+
+
+def synthetic_member_rows(count, seed=0):
+  '''Generates count TDListA.txt style records, each a list of field
+     strings as csv.reader would return them.  AGA IDs run from 1 to
+     count.'''
+  rng = random.Random(seed)
+  for aga_id in range(1, count + 1):
+    rating = rng.uniform(-30, 9)
+    if -1 < rating < 1:
+      rating += 2
+    yield ['%s, %s' % (synthetic_last_name(rng), rng.choice(FIRST_NAMES)),
+           str(aga_id),
+           rng.choice(MEMBERSHIP_TYPES),
+           '%.5f' % rating,
+           '%d/%d/%d' % (rng.randint(1, 12), rng.randint(1, 28),
+                         rng.randint(2010, 2030))]
+
+
+def synthetic_report_lines(members, game_count, seed=0):
+  '''Generates the lines of an AGA results report in which members, a
+     list of AGAMembers, play game_count games with random results and
+     the odd bye.'''
+  rng = random.Random(seed)
+  yield 'TOURNEY Synthetic tournament\n'
+  yield '\tstart=1/1/2020\n'
+  yield '\tfinish=1/3/2020\n'
+  yield 'rules=AGA\n'
+  yield '\n'
+  yield 'PLAYERS\n'
+  for m in members:
+    yield '%6d %s, %s %s\n' % (m.aga_id, m.last_name, m.first_name, m.rank.name)
+  yield '\n'
+  yield 'GAMES\n'
+  for i in range(game_count):
+    white, black = rng.sample(members, 2)
+    if rng.random() < 0.01:
+      yield 'PASSED: %d\n' % white.aga_id
+    else:
+      yield '%d %d %s%d %d\n' % (white.aga_id, black.aga_id, rng.choice('wb'),
+                                 rng.randint(0, 9), rng.choice([0, 7]))
+  yield '\n'
+
+
+def realistic_member_rows(count, seed=0, bad_rating_rate=0.02,
+                          missing_expiration_rate=0.05):
+  '''Generates count TDListA.txt style records like
+     synthetic_member_rows, but with last names following a Zipf
+     distribution over a pool of common and made up names, and with
+     the flaws seen in the real file: missing, zero and out of range
+     ratings, and missing expiration dates.  They also have the club,
+     state and last rated game columns, often empty.'''
+  rng = random.Random(seed)
+  # The extra columns come from their own generator, so the others are
+  # the same as they were before there were extra columns.
+  extra = random.Random(seed + 1)
+  clubs = ['%s Go Club' % synthetic_last_name(extra)
+           for i in range(max(20, count // 50))]
+  club_weights = zipf_weights(len(clubs))
+  state_weights = zipf_weights(len(STATES))
+  pool = COMMON_LAST_NAMES + sorted(set(
+      synthetic_last_name(rng) for i in range(max(1000, count // 20))))
+  weights = zipf_weights(len(pool))
+  first_weights = zipf_weights(len(FIRST_NAMES))
+  for aga_id in range(1, count + 1):
+    last_name = rng.choices(pool, cum_weights=weights)[0]
+    first_name = rng.choices(FIRST_NAMES, cum_weights=first_weights)[0]
+    if rng.random() < bad_rating_rate:
+      rating = rng.choice(['', '0.00000', '%.5f' % rng.uniform(9, 12),
+                           '%.5f' % rng.uniform(-45, -30)])
+    else:
+      # Most members are kyu players.
+      r = min(max(rng.gauss(-8, 9), -30), 9)
+      if -1 < r < 1:
+        r = -1.5 if r < 0 else 1.5
+      rating = '%.5f' % r
+    expiration = ''
+    if rng.random() >= missing_expiration_rate:
+      expiration = '%d/%d/%d' % (rng.randint(1, 12), rng.randint(1, 28),
+                                 rng.randint(2010, 2030))
+    club = ''
+    if extra.random() < 0.6:
+      club = extra.choices(clubs, cum_weights=club_weights)[0]
+    state = ''
+    if extra.random() < 0.9:
+      state = extra.choices(STATES, cum_weights=state_weights)[0]
+    last_rated = ''
+    if extra.random() < 0.7:
+      last_rated = '%d-%02d-%02d' % (extra.randint(2000, 2024), extra.randint(1, 12),
+                                     extra.randint(1, 28))
+    yield ['%s, %s' % (last_name, first_name), str(aga_id),
+           rng.choice(MEMBERSHIP_TYPES), rating, expiration, club, state, last_rated]
@@ -8,8 +8,10 @@
 
 import difflib
 import filecmp
+import io
 import os.path
 import sys
+import tempfile
 import unittest
 from aga_report_format import *
 from aga_roster import AGAMember
@@ -52,4 +54,52 @@ class TestRegularExpressions (unittest.TestCase):
         self.assertFalse(d)
 
 
+class TestParseReport (unittest.TestCase):
+  def parse(self, text):
+    input = io.StringIO(text)
+    input.name = 'report.txt'
+    return list(parse_report(input))
 
+  def test_all_sections(self):
+    records = self.parse(
+        'TOURNEY Test\n\tstart=1/1/2020\n\n'
+        'PLAYERS\n  7068 Nahabedian, Mark 12K\n  2151 Metcalf Wanda 5K\n\n'
+        'GAMES\n7068 2151 b7 0\n2151 7068\nPASSED: 1144\n')
+    self.assertEqual(records, [
+        TournamentDescription('Test\n\tstart=1/1/2020'),
+        PlayerEntry(7068, 'Nahabedian', 'Mark', Rank['12K'], 5),
+        PlayerEntry(2151, 'Metcalf', 'Wanda', Rank['5K'], 6),
+        Game(7068, 2151, 'b', 7, 0),
+        Pairing(2151, 7068),
+        Pass(1144)])
+
+  def test_merged_sections(self):
+    records = self.parse('GAMES\n1 2 w0 7\n\n# day two\nGAMES\n3 4 b0 7\n')
+    self.assertEqual(records, [Game(1, 2, 'w', 0, 7), Game(3, 4, 'b', 0, 7)])
+
+  def test_malformed(self):
+    with self.assertRaises(FileFormatError) as raised:
+      self.parse('PLAYERS\n  7068 Nahabedian\n')
+    self.assertEqual(raised.exception.line_number, 2)
+    self.assertEqual(raised.exception.message, 'malformed player line.')
+    for text, message in (('GAMES\nPASSED: x\n', 'malformed game line.'),
+                          ('GAMES\n1 x\n', 'malformed game line.'),
+                          ('TOURNEY Test\n\nRESULTS\n', 'Expected PLAYERS line.'),
+                          ('7068 Nahabedian, Mark 12K\n', 'Expected PLAYERS line.')):
+      with self.assertRaises(FileFormatError) as raised:
+        self.parse(text)
+      self.assertEqual(raised.exception.message, message)
+
+  def test_error_context(self):
+    with tempfile.TemporaryDirectory() as directory:
+      file_name = os.path.join(directory, 'report.txt')
+      with open(file_name, 'w') as f:
+        f.write('PLAYERS\n  7068 Nahabedian, Mark 12K\n  2151 Metcalf\n\nGAMES\n')
+      with open(file_name, 'r') as input:
+        with self.assertRaises(FileFormatError) as raised:
+          list(parse_report(input))
+      error = raised.exception
+      self.assertEqual(error.context(1, 1), [(2, '  7068 Nahabedian, Mark 12K\n'),
+                                             (3, '  2151 Metcalf\n'),
+                                             (4, '\n')])
+      self.assertEqual(error.describe().splitlines()[3], '>     3    2151 Metcalf')
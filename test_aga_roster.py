@@ -5,11 +5,15 @@
 #
 #   python -m unittest test_aga_roster.py
 
+import datetime
 import os
 import os.path
 import sys
+import threading
 import unittest
-from aga_roster import AGAMember, AGAMembersAlreadyLoaded
+from aga_roster import AGAMember, AGAMemberRegistry, AGAMembersAlreadyLoaded, RosterLoader, \
+    expired_members, expiring_members, parse_member_record, undated_members
+from rank import Rank
 
 
 FIRST_NAME = "Mark"
@@ -55,5 +59,205 @@ class TestAGARoster(unittest.TestCase):
     self.assertLess(max, 10)
     self.assertGreaterEqual(min, -30)
 
+
+class TestAGAMemberRegistry(unittest.TestCase):
+  # These tests work against their own registry rather than the one
+  # shared by AGAMember, so they don't need TDListA.txt.
+  def member(self, aga_id, last_name, membership_type='Full', expiration=None,
+             first_name='A'):
+    m = AGAMember.__new__(AGAMember)
+    m.last_name = last_name
+    m.first_name = first_name
+    m.aga_id = aga_id
+    m.membership_type = membership_type
+    m.rating = None
+    m.expiration_date = expiration
+    m._playing_at = None
+    return m
+
+  def test_lookup_many(self):
+    r = AGAMemberRegistry()
+    a = r.add(self.member(1, 'Able'))
+    b = r.add(self.member(2, 'Baker'))
+    self.assertEqual(r.lookup_many([2, 3, 1]), [b, None, a])
+    self.assertEqual(r.lookup(1), a)
+
+  def test_duplicate_keeps_later_expiration(self):
+    r = AGAMemberRegistry()
+    newer = self.member(5, 'Newer', expiration=datetime.date(2020, 1, 1))
+    older = self.member(5, 'Older', expiration=datetime.date(2019, 1, 1))
+    r.add(newer)
+    self.assertIs(r.add(older), newer)
+    self.assertIs(r.lookup(5), newer)
+    self.assertEqual(r.members, [newer])
+    self.assertEqual(r.duplicate_ids, set([5]))
+
+  def test_placeholder_is_displaced(self):
+    r = AGAMemberRegistry()
+    r.add(self.member(9, 'Doe', membership_type=None))
+    real = self.member(9, 'Doe')
+    self.assertIs(r.add(real), real)
+    self.assertIs(r.add(self.member(9, 'Doe', membership_type=None)), real)
+    self.assertEqual(r.members, [real])
+    self.assertEqual(r.duplicate_ids, set())
+
+  def test_search(self):
+    r = AGAMemberRegistry()
+    other = r.add(self.member(1, 'Markham', first_name='Zed'))
+    first = r.add(self.member(2, 'Smith', first_name='Mark'))
+    exact = r.add(self.member(3, 'Mark', first_name='Bob'))
+    inner = r.add(self.member(4, 'Lamarkson', first_name='Al'))
+    r.add(self.member(5, 'Jones', first_name='Amy'))
+    self.assertEqual(r.search('MARK'), [exact, other, inner, first])
+    self.assertEqual(r.search('mark'), r.search('Mark'))
+    self.assertEqual(r.search('k'), [inner, exact, other, first])
+    self.assertEqual(r.search('xyz'), [])
+
+  def test_fuzzy_search(self):
+    r = AGAMemberRegistry()
+    mark = r.add(self.member(7068, 'Nahabedian', first_name='Mark'))
+    sue = r.add(self.member(7069, 'Nahabedian', first_name='Sue'))
+    marc = r.add(self.member(1, 'Smith', first_name='Marc'))
+    r.add(self.member(2, 'Jones', first_name='Amy'))
+    self.assertEqual(r.fuzzy_search('Nahabedien'), [(1, mark), (1, sue)])
+    self.assertEqual(r.fuzzy_search('Nahabidyan'), [(2, mark), (2, sue)])
+    self.assertEqual(r.fuzzy_search('mrak', limit=1), [(1, mark)])
+    self.assertEqual(r.fuzzy_search('Smyth'), [(1, marc)])
+    r.update_record('Nahabedian', 'Marc', 7068, 'Full', None, None)
+    self.assertEqual(r.fuzzy_search('marc'), [(0, mark), (0, marc)])
+    self.assertEqual(r.fuzzy_search('Xqzw'), [])
+
+  def test_rank_follows_rating(self):
+    r = AGAMemberRegistry()
+    m = r.add(self.member(3, 'Kim'))
+    bad = r.add(self.member(4, 'Lee'))
+    m.rating = 2.5
+    bad.rating = 0.5
+    r.derive_ranks()
+    self.assertEqual(m.rank, Rank['2D'])
+    self.assertRaises(Exception, lambda: bad.rank)
+    r.update_record('Kim', 'A', 3, 'Full', -4.2, None)
+    self.assertEqual(m.rank, Rank['4K'])
+
+  def test_no_instance_dict(self):
+    self.assertFalse(hasattr(self.member(3, 'Kim'), '__dict__'))
+
+  def test_search_after_replacement(self):
+    r = AGAMemberRegistry()
+    r.add(self.member(7, 'Oldname', expiration=datetime.date(2019, 1, 1)))
+    new = r.add(self.member(7, 'Newname', expiration=datetime.date(2020, 1, 1)))
+    self.assertEqual(r.search('oldn'), [])
+    self.assertEqual(r.search('newn'), [new])
+
+  def test_expiration_queries(self):
+    r = AGAMemberRegistry()
+    day = datetime.date(2024, 6, 30)
+    expired = r.add(self.member(1, 'Gone', expiration=day - datetime.timedelta(1)))
+    today = r.add(self.member(2, 'Today', expiration=day))
+    later = r.add(self.member(3, 'Later', expiration=day + datetime.timedelta(40)))
+    index = r.expiration_index
+    self.assertEqual(expired_members(index, day), [expired])
+    self.assertEqual(expiring_members(index, day, 30), [today])
+    self.assertEqual(expiring_members(index, day, 41), [today, later])
+    placeholder = r.add(self.member(4, 'Doe', membership_type=None))
+    self.assertEqual(undated_members(index), [placeholder])
+    # The index follows changes to the roster.
+    r.update_record('Later', 'A', 3, 'Full', None, day - datetime.timedelta(400))
+    self.assertEqual(expired_members(index, day), [later, expired])
+    renewed = r.add(self.member(1, 'Gone', expiration=day + datetime.timedelta(1)))
+    self.assertEqual(expiring_members(index, day, 30), [today, renewed])
+    r.remove_many([3])
+    self.assertEqual(expired_members(index, day), [])
+    self.assertIs(r.expiration_index, index)
+
+  def test_parse_full_record(self):
+    record = parse_member_record(['Nahabedian, Mark', '7068', 'Full', '-12.5',
+                                  '3/1/2019', 'Boston Go Club', 'MA', '2018-11-04'])
+    self.assertEqual(record, ('Nahabedian', 'Mark', 7068, 'Full', -12.5,
+                              datetime.date(2019, 3, 1), 'Boston Go Club', 'MA',
+                              datetime.date(2018, 11, 4)))
+    short = parse_member_record(['Casey', '1144', '', '', '', '', ''])
+    self.assertEqual(short[6:], (None, None, None))
+    other = parse_member_record(['Kim, A', '1', 'Full', '1.5', '', 'Boston Go Club'])
+    self.assertIs(other[6], record[6])
+
+  def test_select(self):
+    r = AGAMemberRegistry()
+    day = datetime.date(2024, 6, 1)
+    recent = day - datetime.timedelta(30)
+    long_ago = day - datetime.timedelta(800)
+    a = r.add_record('Able', 'A', 1, 'Full', -4.5, None, 'BGC', 'MA', recent)
+    b = r.add_record('Baker', 'B', 2, 'Full', 1.5, None, 'BGC', 'MA', long_ago)
+    c = r.add_record('Cole', 'C', 3, 'Full', -2.5, None, 'NYC', 'NY', recent)
+    d = r.add_record('Dunn', 'D', 4, 'Full', -8.5, None, 'BGC', 'MA', recent)
+    r.add_record('Doe', 'E', 5, None, None, None)
+    band = (Rank['5K'], Rank['1D'])
+    self.assertEqual(r.select(ranks=band), [a, b, c])
+    self.assertEqual(r.select(ranks=band[::-1]), [a, b, c])
+    self.assertEqual(r.select(ranks=band, state='MA'), [a, b])
+    self.assertEqual(r.select(ranks=band, state='MA', club='BGC',
+                              rated_since=day - datetime.timedelta(365)), [a])
+    self.assertEqual(r.select(club='BGC'), [a, b, d])
+    self.assertEqual(r.select(club='Nowhere', state='MA'), [])
+    # The indexes follow changes to the roster.
+    r.update_record('Cole', 'C', 3, 'Full', -2.5, None, 'BGC', 'MA', recent)
+    self.assertEqual(r.select(ranks=band, club='BGC'), [a, b, c])
+    r.remove_many([1])
+    self.assertEqual(r.select(ranks=band, club='BGC'), [b, c])
+    r.add_record('Ezra', 'E', 6, 'Full', -3.5, None, 'BGC', 'MA', recent)
+    self.assertEqual([m.aga_id for m in r.select(rated_since=recent)], [3, 4, 6])
+
+
+class TestRosterLoader(unittest.TestCase):
+  def test_lookup_while_loading(self):
+    registry = AGAMemberRegistry()
+    held = threading.Event()
+    release = threading.Event()
+    def records():
+      for aga_id in range(1, 2001):
+        if aga_id == 1500:
+          # Hold the rest of the load until the test says so.
+          held.set()
+          release.wait()
+        yield ('Member%d' % aga_id, 'A', aga_id, 'Full', 1.5, None)
+    loader = RosterLoader(registry, records())
+    loader.CHUNK_SIZE = 100
+    loader.start()
+    self.assertEqual(loader.lookup(1000).aga_id, 1000)
+    held.wait()
+    self.assertFalse(loader.done)
+    self.assertEqual(len(loader.search('member')), 1400)
+    release.set()
+    self.assertEqual(loader.lookup(2000).aga_id, 2000)
+    self.assertIsNone(loader.lookup(5000))
+    self.assertTrue(loader.done)
+    loader.wait()
+    self.assertEqual(len(registry), 2000)
+
+  def test_wait_loaded(self):
+    registry = AGAMemberRegistry()
+    release = threading.Event()
+    def records():
+      for aga_id in range(1, 2001):
+        if aga_id == 1500:
+          release.wait()
+        yield ('Member%d' % aga_id, 'A', aga_id, 'Full', 1.5, None)
+    loader = RosterLoader(registry, records())
+    loader.CHUNK_SIZE = 100
+    saved = AGAMember.Registry, AGAMember.Loader
+    try:
+      AGAMember.use_registry(registry)
+      AGAMember.Loader = loader
+      loader.start()
+      self.assertEqual(AGAMember.lookupID(1000).aga_id, 1000)
+      threading.Timer(0.05, release.set).start()
+      AGAMember.wait_loaded()
+      self.assertFalse(AGAMember.loading())
+      self.assertEqual(len(registry), 2000)
+    finally:
+      AGAMember.use_registry(saved[0])
+      AGAMember.Loader = saved[1]
+
+
 if __name__ == '__main__':
     unittest.main()
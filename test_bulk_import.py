@@ -0,0 +1,59 @@
+# Test code for bulk_import.py.
+#
+# To run:
+#
+#   python -m unittest test_bulk_import.py
+
+import datetime
+import io
+import unittest
+from aga_roster import AGAMember, AGAMemberRegistry
+from bulk_import import read_preregistrations, resolve_preregistrations
+from rank import Rank
+
+
+class TestBulkImport (unittest.TestCase):
+  def setUp(self):
+    self.registry = AGAMember.Registry
+    AGAMember.use_registry(AGAMemberRegistry())
+    add = AGAMember.Registry.add_record
+    self.mark = add('Nahabedian', 'Mark', 7068, 'Full', -12.5, datetime.date(2030, 1, 1))
+    self.wanda = add('Metcalf', 'Wanda', 2151, 'Full', -5.5, datetime.date(2019, 1, 1))
+    self.eva = add('Casey', 'Eva', 1144, 'Full', -5.5, datetime.date(2030, 1, 1))
+
+  def tearDown(self):
+    AGAMember.use_registry(self.registry)
+
+  def test_read(self):
+    preregs, problems = read_preregistrations(io.StringIO(
+        'Rank,AGA ID,Last Name,First Name\n'
+        '12k,7068,Nahabedian,Mark\n'
+        ',2151,Metcalf,\n'
+        '3x,1144,Casey,Eva\n'
+        ',,Nobody,\n'))
+    self.assertEqual([(p.aga_id, p.last_name, p.first_name, p.rank) for p in preregs],
+                     [(7068, 'Nahabedian', 'Mark', Rank['12K']),
+                      (2151, 'Metcalf', None, None)])
+    self.assertEqual(problems, [(4, 'unknown rank 3x'), (5, 'no AGA ID')])
+    preregs, problems = read_preregistrations(io.StringIO(
+        '7068\tMark Nahabedian\t10K\n1144\tCasey, Eva\n'))
+    self.assertEqual([(p.last_name, p.first_name, p.rank) for p in preregs],
+                     [('Nahabedian', 'Mark', Rank['10K']), ('Casey', 'Eva', None)])
+
+  def test_resolve(self):
+    preregs, problems = read_preregistrations(io.StringIO(
+        '7068\tNahabedian\n2151\tMetcalf\n1144\tCasy\n9999\tNobody\n7068\n'))
+    report = resolve_preregistrations(preregs, [], datetime.date(2020, 6, 1))
+    self.assertEqual([m for p, m in report.matched], [self.mark, self.wanda])
+    self.assertEqual([m for p, m in report.name_mismatches], [self.eva])
+    self.assertEqual([m for p, m in report.expired], [self.wanda])
+    self.assertEqual([p.aga_id for p in report.unknown], [9999])
+    self.assertEqual([p.line_number for p in report.duplicates], [5])
+    # Eva's name doesn't match, so she isn't registered.
+    self.assertEqual(report.members, [self.mark, self.wanda])
+    report = resolve_preregistrations(preregs, [self.mark], datetime.date(2020, 6, 1))
+    self.assertEqual(report.members, [self.wanda])
+
+
+if __name__ == '__main__':
+    unittest.main()
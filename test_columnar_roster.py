@@ -0,0 +1,97 @@
+# Test code for columnar_roster.py.
+#
+# To run:
+#
+#   python -m unittest test_columnar_roster.py
+
+import datetime
+import unittest
+from aga_roster import expired_members, expiring_members, undated_members
+from columnar_roster import ColumnarRegistry, MemberView
+from rank import Rank
+
+
+class TestColumnarRegistry(unittest.TestCase):
+  def setUp(self):
+    self.registry = ColumnarRegistry()
+    self.registry.add_record('Nahabedian', 'Mark', 7068, 'Full', -12.5,
+                             datetime.date(2019, 3, 1))
+    self.registry.add_record('Casey', None, 1144, '', None, None)
+
+  def test_views(self):
+    m = self.registry.lookup(7068)
+    self.assertIsInstance(m, MemberView)
+    self.assertFalse(hasattr(m, '__dict__'))
+    self.assertEqual((m.last_name, m.first_name, m.aga_id, m.membership_type,
+                      m.rating, m.expiration_date),
+                     ('Nahabedian', 'Mark', 7068, 'Full', -12.5,
+                      datetime.date(2019, 3, 1)))
+    self.assertEqual(m.rank, Rank['12K'])
+    c = self.registry.lookup(1144)
+    self.assertEqual((c.first_name, c.rating, c.expiration_date), (None, None, None))
+    self.assertEqual(self.registry.lookup_many([1144, 1, 7068]), [c, None, m])
+    self.assertEqual(list(self.registry.members), [m, c])
+
+  def test_play_at(self):
+    self.registry.lookup(7068).play_at(Rank['10K'])
+    self.assertEqual(self.registry.lookup(7068).playing_at, Rank['10K'])
+    self.assertEqual(self.registry.lookup(1144).playing_at, Rank['30K'])
+
+  def test_derived_ranks(self):
+    self.registry.derive_ranks()
+    self.assertEqual(list(self.registry.ranks),
+                     [Rank['12K'].value, Rank['30K'].value])
+    self.registry.update_record('Nahabedian', 'Mark', 7068, 'Full', 3.1, None)
+    self.assertEqual(self.registry.lookup(7068).rank, Rank['3D'])
+
+  def test_duplicates_and_search(self):
+    m = self.registry.lookup(7068)
+    self.assertEqual(self.registry.search('ahab'), [m])
+    self.registry.add_record('Older', 'Mark', 7068, 'Full', -1.5,
+                             datetime.date(2018, 3, 1))
+    self.assertEqual(m.last_name, 'Nahabedian')
+    newer = self.registry.add_record('Newer', 'Mark', 7068, 'Full', -1.5,
+                                     datetime.date(2020, 3, 1))
+    # Like an AGAMember, the superseded view keeps its data.
+    self.assertEqual(m.last_name, 'Nahabedian')
+    self.assertNotEqual(newer, m)
+    self.assertEqual(self.registry.lookup(7068), newer)
+    self.assertEqual(newer.last_name, 'Newer')
+    self.assertEqual(list(self.registry.members), [newer, self.registry.lookup(1144)])
+    self.assertEqual(len(self.registry.members), 2)
+    self.assertEqual(self.registry.search('ahab'), [])
+    self.assertEqual(self.registry.search('ewer'), [newer])
+    self.assertEqual(self.registry.duplicate_ids, set([7068]))
+
+  def test_club_state_and_last_rated(self):
+    self.registry.add_record('Kim', 'A', 5, 'Full', 2.5, None, 'Boston Go Club', 'MA',
+                             datetime.date(2023, 5, 6))
+    m = self.registry.lookup(5)
+    self.assertEqual((m.club, m.state, m.last_rated),
+                     ('Boston Go Club', 'MA', datetime.date(2023, 5, 6)))
+    c = self.registry.lookup(1144)
+    self.assertEqual((c.club, c.state, c.last_rated), (None, None, None))
+    self.assertEqual(self.registry.select(ranks=(Rank['1D'], Rank['3D']), state='MA'),
+                     [m])
+    self.registry.update_record('Kim', 'A', 5, 'Full', 2.5, None, 'Cambridge', 'MA',
+                                None)
+    self.assertEqual(self.registry.select(club='Boston Go Club'), [])
+    self.assertEqual(self.registry.select(club='Cambridge'), [m])
+
+  def test_expiration_index(self):
+    index = self.registry.expiration_index
+    day = datetime.date(2020, 1, 1)
+    m = self.registry.lookup(7068)
+    self.assertEqual(expired_members(index, day), [m])
+    self.registry.update_record('Nahabedian', 'Mark', 7068, 'Full', -12.5,
+                                datetime.date(2020, 1, 15))
+    self.assertEqual(expired_members(index, day), [])
+    self.assertEqual(expiring_members(index, day, 30), [m])
+    self.registry.remove_many([7068])
+    self.assertEqual(expiring_members(index, day, 30), [])
+    self.assertEqual(undated_members(index), [self.registry.lookup(1144)])
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+# Test code for command_loop.py.
+#
+# To run:
+#
+#   python -m unittest test_command_loop.py
+
+import gc
+import io
+import re
+import sys
+import unittest
+from command_loop import *
+
+
+class TestLatencyHistogram (unittest.TestCase):
+  def test_percentiles(self):
+    histogram = LatencyHistogram()
+    self.assertIsNone(histogram.percentile(50))
+    for i in range(1, 101):
+      histogram.add(i / 1000)
+    self.assertEqual(histogram.count, 100)
+    for p in (50, 95, 99):
+      estimate = histogram.percentile(p)
+      self.assertGreaterEqual(estimate, p / 1000 * 0.999)
+      self.assertLessEqual(estimate, p / 1000 * LatencyHistogram.BUCKET_RATIO)
+
+  def test_tiny_durations(self):
+    histogram = LatencyHistogram()
+    histogram.add(0)
+    self.assertEqual(histogram.percentile(99), LatencyHistogram.SMALLEST)
+
+
+class TestMetrics (unittest.TestCase):
+  def run_commands(self, table, lines):
+    stdin, stdout = sys.stdin, sys.stdout
+    sys.stdin = io.StringIO(''.join(line + '\n' for line in lines + ['exit']))
+    sys.stdout = io.StringIO()
+    try:
+      table.command_loop()
+      return sys.stdout.getvalue()
+    finally:
+      sys.stdin, sys.stdout = stdin, stdout
+
+  def table(self):
+    table = CommandTable()
+    table.add_command(EXIT_COMMAND)
+    table.add_command(STATS_COMMAND)
+    @table('echo', 'echo (?P<TEXT>.*)')
+    def echo(match, **ignore):
+      sys.stdout.write(match.group('TEXT'))
+    return table
+
+  def test_disabled(self):
+    table = self.table()
+    output = self.run_commands(table, ['echo a', 'stats'])
+    self.assertIsNone(table.metrics)
+    self.assertIn('not being timed', output)
+
+  def test_enabled(self):
+    table = self.table()
+    self.run_commands(table, ['stats on', 'echo a', 'echo b'])
+    metrics = table.metrics
+    self.assertEqual(metrics.match_times['echo'].count, 2)
+    self.assertEqual(metrics.action_times['echo'].count, 2)
+    # exit is timed too, even though its action raises Exit.
+    self.assertEqual(metrics.action_times['exit'].count, 1)
+    output = io.StringIO()
+    metrics.write_tsv(output)
+    lines = output.getvalue().splitlines()
+    self.assertEqual(lines[0].split('\t'), metrics.columns())
+    self.assertEqual([line.split('\t')[:2] for line in lines[1:]],
+                     [['echo', '2'], ['exit', '1']])
+
+  def test_stats_off(self):
+    table = self.table()
+    output = self.run_commands(table, ['stats on', 'echo a', 'stats off', 'echo b',
+                                       'stats'])
+    # The timings collected are kept, but no more are recorded.
+    self.assertEqual(table.metrics.action_times['echo'].count, 1)
+    self.assertNotIn('exit', table.metrics.action_times)
+    self.assertIn('Timing is off', output)
+
+
+class TestDispatch (unittest.TestCase):
+  def test_literal_prefix(self):
+    for pattern, prefix in [('exit', 'exit'), ('[?](?P<ID>[0-9]+)', '?'),
+                            ('r(?P<INDEX>[0-9]*)', 'r'), ('ab?c', 'a'),
+                            ('stats( +(on|off))?', 'stats'), ('a|b', ''), ('[|]x', '|x'),
+                            ('a[|]b', 'a|b'), ('.*', '')]:
+      self.assertEqual(literal_prefix(re.compile(pattern)), prefix)
+
+  def table(self):
+    table = CommandTable()
+    for name, pattern in [('register', 'r(?P<INDEX>[0-9]*)'), ('rank', 'rank[0-9]+'),
+                          ('reload', 'reload'), ('any', '.*load'),
+                          ('exit', re.compile('exit', re.IGNORECASE))]:
+      table.add_command(Command(name, pattern, None, None))
+    return table
+
+  def test_first_match_wins(self):
+    table = self.table()
+    for input, name in [('r12', 'register'), ('rank3', 'rank'), ('reload', 'reload'),
+                        ('unload', 'any'), ('EXIT', 'exit')]:
+      command, match = table.find(input)
+      self.assertEqual(command.name, name)
+    self.assertEqual(table.find('who'), (None, None))
+
+  def test_index_rebuilt(self):
+    table = self.table()
+    self.assertIsNone(table.find('who')[0])
+    table.add_command(Command('who', 'who', None, None))
+    self.assertEqual(table.find('who')[0].name, 'who')
+
+  def test_completions(self):
+    table = self.table()
+    table.add_command(Command('lookup', '[?](?P<NAME>.+)', None, None,
+                              lambda text: ['Smith', 'Smythe'] if text == 'Sm' else []))
+    self.assertEqual(table.index.completions('r'), ['r', 'rank', 'reload'])
+    self.assertEqual(table.index.completions('rel'), ['reload'])
+    self.assertEqual(table.index.completions('?Sm'), ['?Smith', '?Smythe'])
+    self.assertEqual(table.index.completions('x'), [])
+
+  def test_commands_not_accumulated(self):
+    count = len(Command.AllCommands)
+    for i in range(10):
+      Command('temporary', 'temporary', None, None)
+    gc.collect()
+    self.assertEqual(len(Command.AllCommands), count)
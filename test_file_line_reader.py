@@ -0,0 +1,83 @@
+# Test code for file_line_reader.py.
+#
+# To run:
+#
+#   python -m unittest test_file_line_reader.py
+
+import os
+import tempfile
+import unittest
+from file_line_reader import FileLineReader
+
+TEXT = 'first\nsecond line\n\n%s\nlast, without a newline' % ('long ' * 20)
+
+
+class TestFileLineReader (unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.filename = os.path.join(self.directory.name, 'lines.txt')
+    with open(self.filename, 'w') as f:
+      f.write(TEXT)
+
+  def tearDown(self):
+    self.directory.cleanup()
+
+  def readers(self):
+    yield FileLineReader(self.filename)
+
+  def test_lines(self):
+    expected = TEXT.splitlines(True)
+    for reader in self.readers():
+      with reader:
+        self.assertEqual(list(reader), expected)
+        self.assertEqual(reader.line_number, len(expected))
+        self.assertEqual(reader.readline(), '')
+
+  def test_pushback(self):
+    for reader in self.readers():
+      with reader:
+        first = reader.readline()
+        second = reader.readline()
+        reader.unreadline(second)
+        reader.unreadline(first)
+        self.assertEqual(reader.line_number, 0)
+        self.assertEqual([reader.readline(), reader.readline()], [first, second])
+        self.assertEqual(reader.where(), '%s 2' % self.filename)
+
+  def test_pushback_while_iterating(self):
+    lines = TEXT.splitlines(True)
+    for reader in self.readers():
+      with reader:
+        read = []
+        for line in reader:
+          read.append(line)
+          if len(read) == 2:
+            reader.unreadline(line)
+        self.assertEqual(read, lines[:2] + lines[1:])
+
+  def test_random_access(self):
+    lines = TEXT.splitlines(True)
+    for reader in self.readers():
+      with reader:
+        reader.readline()
+        self.assertEqual(reader.getline(4), lines[3])
+        self.assertEqual(reader.getline(6), '')
+        self.assertEqual(reader.context(2, 1, 1), [(1, lines[0]), (2, lines[1]),
+                                                   (3, lines[2])])
+        reader.seek_line(5)
+        self.assertEqual(reader.readline(), lines[4])
+        self.assertEqual(reader.line_number, 5)
+        reader.seek_line(2)
+        self.assertEqual(list(reader), lines[1:])
+        self.assertRaises(IndexError, reader.seek_line, 6)
+
+  def test_empty(self):
+    open(self.filename, 'w').close()
+    for reader in self.readers():
+      with reader:
+        self.assertEqual(reader.readline(), '')
+        self.assertEqual(reader.getline(1), '')
+
+
+if __name__ == '__main__':
+    unittest.main()
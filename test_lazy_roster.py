@@ -0,0 +1,96 @@
+# Test code for lazy_roster.py.
+#
+# To run:
+#
+#   python -m unittest test_lazy_roster.py
+
+import datetime
+import os
+import tempfile
+import unittest
+from aga_roster import AGAMember, AGAMemberRegistry, read_member_records
+from lazy_roster import LazyMember, LazyRegistry
+from rank import Rank
+
+ROWS = [
+    'Nahabedian, Mark\t7068\tFull\t-12.5\t3/1/2019\tBoston Go Club\tMA\t2018-11-04\n',
+    'Casey\t1144\t\t\t\n',
+    'Older, Mark\t7068\tFull\t-1.5\t3/1/2018\n',
+    '"Quoted, Ann"\t12\tYouth\t2.5\t1/2/2030\n',
+    'too short\t5\n']
+
+
+class TestLazyRegistry(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.file_name = os.path.join(self.directory.name, 'TDListA.txt')
+    with open(self.file_name, 'w') as f:
+      f.writelines(ROWS)
+    self.registry = LazyRegistry()
+    self.registry.add_records(self.registry.read_records(self.file_name))
+
+  def tearDown(self):
+    self.directory.cleanup()
+
+  def test_decoded_on_use(self):
+    m = self.registry.lookup(7068)
+    self.assertIsInstance(m, LazyMember)
+    self.assertNotIn('_rating', vars(m))
+    self.assertEqual(m.rank, Rank['12K'])
+    self.assertIn('_rating', vars(m))
+    self.assertNotIn('last_name', vars(m))
+    self.assertEqual(m.last_name, 'Nahabedian')
+    self.assertIn('last_name', vars(m))
+
+  def test_same_as_eager(self):
+    eager = AGAMemberRegistry()
+    eager.add_records(read_member_records(self.file_name))
+    def fields(m):
+      return (m.last_name, m.first_name, m.aga_id, m.membership_type, m.rating,
+              m.expiration_date, m.club, m.state, m.last_rated, m.rank,
+              m.is_placeholder)
+    self.assertEqual([fields(m) for m in self.registry.members],
+                     [fields(m) for m in eager.members])
+    self.assertEqual(self.registry.duplicate_ids, set([7068]))
+    self.assertEqual(self.registry.lookup(12).expiration_date,
+                     datetime.date(2030, 1, 2))
+
+  def test_search_and_update(self):
+    self.assertEqual([m.aga_id for m in self.registry.search('ahab')], [7068])
+    m = self.registry.lookup(1144)
+    self.assertNotIn('last_name', vars(m))
+    self.registry.update_record('Kasey', 'Pat', 1144, 'Full', 3.1, None)
+    self.assertEqual(self.registry.search('asey'), [m])
+    self.assertEqual((m.first_name, m.rank), ('Pat', Rank['3D']))
+    self.assertEqual(self.registry.fuzzy_search('Kasy')[0], (1, m))
+
+  def test_placeholder(self):
+    self.registry.add_record('Nobody', 'Known', 99, None, None, None)
+    self.assertTrue(self.registry.lookup(99).is_placeholder)
+    self.assertFalse(self.registry.lookup(1144).is_placeholder)
+
+
+class TestLazyLoading(unittest.TestCase):
+  def setUp(self):
+    self.cwd = os.getcwd()
+    self.directory = tempfile.TemporaryDirectory()
+    os.chdir(self.directory.name)
+    with open('TDListA.txt', 'w') as f:
+      f.writelines(ROWS)
+    self.registry = AGAMember.Registry
+    AGAMember.use_registry(LazyRegistry())
+
+  def tearDown(self):
+    AGAMember.use_registry(self.registry)
+    os.chdir(self.cwd)
+    self.directory.cleanup()
+
+  def test_read_member_file(self):
+    AGAMember.read_member_file()
+    self.assertEqual(len(AGAMember.AllMembers), 3)
+    self.assertEqual(AGAMember.lookupID(12).first_name, 'Ann')
+    self.assertFalse(os.path.exists('TDListA.txt.snapshot'))
+
+
+if __name__ == '__main__':
+    unittest.main()
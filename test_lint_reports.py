@@ -0,0 +1,88 @@
+# Test code for lint_reports.py.
+#
+# To run:
+#
+#   python -m unittest test_lint_reports.py
+
+import datetime
+import io
+import os
+import tempfile
+import unittest
+from aga_roster import AGAMember, AGAMemberRegistry
+from lint_reports import lint_report, lint_reports, report_file_names, write_problems
+
+REPORT = '''TOURNEY Test
+\tstart=6/1/2024
+
+PLAYERS
+  7068 Nahabedian, Mark 12K
+  2151 Metcalf, Wanda 5K
+  1144 Casey, Eva 2D
+  9999 Nobody, Known 5K
+  2151 Metcalf, Wanda 5K
+  7070 Jones, Jo 40K
+
+GAMES
+7068 2151 w0 7
+7068 1234 b0 7
+garbage
+PASSED: 4321
+'''
+
+
+class TestLintReports (unittest.TestCase):
+  def setUp(self):
+    self.registry = AGAMember.Registry
+    AGAMember.use_registry(AGAMemberRegistry())
+    AGAMember.Registry.add_record('Nahabedian', 'Mark', 7068, 'Full', -12.5,
+                                  datetime.date(2025, 1, 1))
+    AGAMember.Registry.add_record('Metcalf', 'Wanda', 2151, 'Full', -5.5,
+                                  datetime.date(2024, 5, 1))
+    AGAMember.Registry.add_record('Kasey', 'Eva', 1144, 'Full', -15.5, None)
+    self.directory = tempfile.TemporaryDirectory()
+    self.file_names = []
+    for i in range(3):
+      file_name = os.path.join(self.directory.name, 'report%d.txt' % i)
+      with open(file_name, 'w') as f:
+        f.write(REPORT)
+      self.file_names.append(file_name)
+
+  def tearDown(self):
+    AGAMember.use_registry(self.registry)
+    self.directory.cleanup()
+
+  def test_every_problem_found(self):
+    problems = lint_report(self.file_names[0])
+    self.assertEqual([(p.line_number, p.aga_id, p.kind) for p in problems], [
+        (0, 1234, 'unlisted'),
+        (0, 4321, 'unlisted'),
+        (6, 2151, 'expired'),
+        (7, 1144, 'name'),
+        (7, 1144, 'rank'),
+        (8, 9999, 'unknown'),
+        (9, 2151, 'format'),
+        (10, None, 'format'),
+        (15, None, 'format')])
+
+  def test_processes_agree(self):
+    serial = list(lint_reports(self.file_names, processes=1))
+    parallel = list(lint_reports(self.file_names, processes=2))
+    self.assertEqual(serial, parallel)
+    self.assertEqual(len(serial), 27)
+    output = io.StringIO()
+    self.assertEqual(write_problems(output, serial), 27)
+    self.assertEqual(len(output.getvalue().splitlines()), 28)
+
+  def test_roster_and_output_not_linted(self):
+    directory = self.directory.name
+    for name in ('TDListA.txt', 'problems.txt'):
+      with open(os.path.join(directory, name), 'w') as f:
+        f.write('Nahabedian, Mark\t7068\tFull\t-12.5\t1/1/2025\n')
+    self.assertEqual(report_file_names(directory, '*.txt',
+                                       os.path.join(directory, 'problems.txt')),
+                     self.file_names)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+# Test code for matching.py.
+#
+# To run:
+#
+#   python -m unittest test_matching.py
+
+import itertools
+import random
+import unittest
+from matching import max_weight_matching, min_cost_matching
+
+
+def matched_edges(mate):
+  return sorted((i, j) for i, j in enumerate(mate) if i < j)
+
+
+def best_by_brute_force(edges, max_cardinality):
+  '''Returns the (size, weight) or (weight,) of the best matching.'''
+  best = None
+  for count in range(len(edges) + 1):
+    for chosen in itertools.combinations(edges, count):
+      vertices = [v for i, j, weight in chosen for v in (i, j)]
+      if len(set(vertices)) < len(vertices):
+        continue
+      weight = sum(weight for i, j, weight in chosen)
+      key = (count, weight) if max_cardinality else (weight,)
+      if best is None or key > best:
+        best = key
+  return best
+
+
+class TestMatching (unittest.TestCase):
+  def test_small(self):
+    self.assertEqual(max_weight_matching([]), [])
+    self.assertEqual(max_weight_matching([(0, 1, 1)]), [1, 0])
+    edges = [(0, 1, 5), (1, 2, 11), (2, 3, 5)]
+    self.assertEqual(max_weight_matching(edges), [-1, 2, 1, -1])
+    self.assertEqual(max_weight_matching(edges, max_cardinality=True), [1, 0, 3, 2])
+
+  def test_blossom(self):
+    # The odd cycle 0, 1, 2 has to be shrunk to find the matching.
+    edges = [(0, 1, 8), (0, 2, 9), (1, 2, 10), (2, 3, 7), (0, 5, 5), (3, 4, 6)]
+    self.assertEqual(matched_edges(max_weight_matching(edges)), [(0, 5), (1, 2), (3, 4)])
+
+  def test_random_graphs(self):
+    rng = random.Random(0)
+    for trial in range(200):
+      n = rng.randint(2, 6)
+      edges = [(i, j, rng.choice([rng.randint(-3, 12), 3]))
+               for i in range(n) for j in range(i + 1, n) if rng.random() < 0.6]
+      if not edges:
+        continue
+      for max_cardinality in (False, True):
+        mate = max_weight_matching(edges, max_cardinality)
+        weights = dict(((i, j), weight) for i, j, weight in edges)
+        chosen = matched_edges(mate)
+        for i, j in chosen:
+          self.assertEqual(mate[j], i)
+        weight = sum(weights[edge] for edge in chosen)
+        key = (len(chosen), weight) if max_cardinality else (weight,)
+        self.assertEqual(key, best_by_brute_force(edges, max_cardinality))
+
+  def test_min_cost(self):
+    # A perfect matching is preferred to a cheaper smaller one.
+    edges = [(0, 1, 0), (1, 2, 100), (0, 3, 100), (2, 3, 1)]
+    self.assertEqual(matched_edges(min_cost_matching(edges)), [(0, 1), (2, 3)])
+    edges = [(0, 1, 1), (0, 2, 9), (1, 3, 9), (2, 3, 1), (0, 3, 5), (1, 2, 5)]
+    self.assertEqual(matched_edges(min_cost_matching(edges)), [(0, 1), (2, 3)])
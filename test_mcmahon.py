@@ -0,0 +1,74 @@
+# Test code for mcmahon.py.
+#
+# To run:
+#
+#   python -m unittest test_mcmahon.py
+
+import unittest
+from aga_roster import AGAMember
+from mcmahon import *
+from rank import Rank
+
+
+def player(aga_id, rank):
+  p = AGAMember('Player%d' % aga_id, 'A', aga_id, 'Full', None, None)
+  p.play_at(Rank[rank])
+  return p
+
+
+class TestMcMahon (unittest.TestCase):
+  def test_handicap_and_komi(self):
+    self.assertEqual(handicap_and_komi(Rank['2D'], Rank['2D']), (0, DEFAULT_KOMI))
+    self.assertEqual(handicap_and_komi(Rank['1D'], Rank['1K']), (0, 0))
+    self.assertEqual(handicap_and_komi(Rank['3D'], Rank['1K']), (3, 0))
+    self.assertEqual(handicap_and_komi(Rank['3D'], Rank['1K'], reduction=2), (0, 0))
+    self.assertEqual(handicap_and_komi(Rank['9D'], Rank['30K']), (MAX_HANDICAP, 0))
+
+  def test_scores(self):
+    players = [player(1, '5D'), player(2, '1K'), player(3, '25K')]
+    history = History([Game(1, 2, 'b')], byes=[3])
+    scores = mcmahon_scores(players, history, bar=Rank['2D'], floor=Rank['20K'])
+    self.assertEqual(scores, {1: Rank['2D'].value, 2: Rank['1K'].value + 1,
+                              3: Rank['20K'].value + BYE_SCORE})
+
+  def test_first_round(self):
+    players = [player(1, '3D'), player(2, '5K'), player(3, '3D'),
+               player(4, '5K'), player(5, '10K')]
+    pairings, byes = pair_round(players, History())
+    self.assertEqual(byes, [5])
+    self.assertEqual(pairings, [Pairing(1, 3), Pairing(2, 4)])
+
+  def test_no_rematch_and_colors(self):
+    players = [player(i, '1D') for i in range(1, 5)]
+    history = History([Game(1, 2, 'w'), Game(3, 4, 'w')])
+    pairings, byes = pair_round(players, history)
+    self.assertEqual(byes, [])
+    for p in pairings:
+      self.assertFalse(history.have_played(p.white_id, p.black_id))
+    # The winners meet.
+    self.assertIn(set([1, 3]), [set(p.players) for p in pairings])
+    # The player who had black takes white.
+    history = History([Pairing(1, 3), Pairing(4, 2)])
+    pairings, byes = pair_round(players[:2], history)
+    self.assertEqual(pairings, [Pairing(2, 1)])
+
+  def test_clubmates_avoided(self):
+    players = [player(i, '1D') for i in range(1, 5)]
+    players[0].club = players[1].club = 'Seattle'
+    pairings, byes = pair_round(players, History())
+    self.assertNotIn(set([1, 2]), [set(p.players) for p in pairings])
+    # But not at the cost of a mismatch.
+    players[2].play_at(Rank['5K'])
+    players[3].play_at(Rank['5K'])
+    pairings, byes = pair_round(players, History())
+    self.assertIn(set([1, 2]), [set(p.players) for p in pairings])
+
+  def test_handicap_pairing(self):
+    pairings, byes = pair_round([player(1, '10K'), player(2, '6K')], History())
+    self.assertEqual(pairings, [Pairing(2, 1, 4, 0)])
+
+  def test_requested_bye_and_rematch(self):
+    players = [player(1, '1D'), player(2, '1D'), player(3, '1D')]
+    pairings, byes = pair_round(players, History(), byes=[2])
+    self.assertEqual((len(pairings), byes), (1, [2]))
+    self.assertRaises(UnpairableError, pair_round, players[:2], History([Pairing(1, 2)]))
@@ -0,0 +1,163 @@
+# Test code for membership_fetch.py.  Fetches from a stand in for the
+# AGA's web server running on localhost.
+#
+# To run:
+#
+#   python -m unittest test_membership_fetch.py
+
+import gzip
+import http.server
+import os.path
+import tempfile
+import threading
+import unittest
+from membership_fetch import fetch, FetchError, PARTIAL_SUFFIX
+
+
+CONTENT = b''.join(b'Member%d, Some\t%d\tFull\t-5.5\t1/2/2030\n' % (i, i)
+                   for i in range(2000))
+ETAG = '"v1"'
+
+
+class MembershipFileHandler (http.server.BaseHTTPRequestHandler):
+  def log_message(self, *args):
+    pass
+
+  def do_GET(self):
+    server = self.server
+    server.requests.append(dict(self.headers))
+    if server.errors:
+      self.send_error(server.errors.pop(0))
+      return
+    if self.headers.get('If-None-Match') == server.etag:
+      self.send_response(304)
+      self.end_headers()
+      return
+    body = server.content
+    encoding = None
+    if server.gzip and 'gzip' in self.headers.get('Accept-Encoding', ''):
+      body = server.gzipped
+      encoding = 'gzip'
+    start = 0
+    range_header = self.headers.get('Range')
+    if range_header and self.headers.get('If-Range') == server.etag:
+      start = int(range_header[len('bytes='):-1])
+      if server.misplaced_range:
+        # Send some other range than the one asked for.
+        start = 0
+      self.send_response(206)
+      self.send_header('Content-Range', 'bytes %d-%d/%d' % (
+          start, len(body) - 1, len(body)))
+    else:
+      self.send_response(200)
+    self.send_header('ETag', server.etag)
+    if encoding:
+      self.send_header('Content-Encoding', encoding)
+    self.send_header('Content-Length', str(len(body) - start))
+    self.end_headers()
+    if server.interruptions > 0:
+      # Send part of the body and then hang up.
+      server.interruptions -= 1
+      self.wfile.write(body[start:start + (len(body) - start) // 2])
+      self.close_connection = True
+      return
+    self.wfile.write(body[start:])
+
+
+class TestMembershipFetch(unittest.TestCase):
+  def setUp(self):
+    self.server = http.server.HTTPServer(('127.0.0.1', 0), MembershipFileHandler)
+    self.server.content = CONTENT
+    self.server.gzipped = gzip.compress(CONTENT)
+    self.server.etag = ETAG
+    self.server.gzip = False
+    self.server.interruptions = 0
+    self.server.misplaced_range = False
+    # Statuses to fail the next requests with.
+    self.server.errors = []
+    self.server.requests = []
+    threading.Thread(target=self.server.serve_forever, daemon=True).start()
+    self.uri = 'http://127.0.0.1:%d/TDListA.txt' % self.server.server_port
+    self.directory = tempfile.TemporaryDirectory()
+    self.file_name = os.path.join(self.directory.name, 'TDListA.txt')
+
+  def tearDown(self):
+    self.server.shutdown()
+    self.server.server_close()
+    self.directory.cleanup()
+
+  def contents(self):
+    with open(self.file_name, 'rb') as f:
+      return f.read()
+
+  def test_conditional(self):
+    self.assertTrue(fetch(self.uri, self.file_name))
+    self.assertEqual(self.contents(), CONTENT)
+    self.assertFalse(fetch(self.uri, self.file_name))
+    self.assertEqual(self.server.requests[-1]['If-None-Match'], ETAG)
+    self.server.etag = '"v2"'
+    self.server.content = CONTENT + b'New, Member\t9999\tFull\t1.5\t1/2/2030\n'
+    self.assertTrue(fetch(self.uri, self.file_name))
+    self.assertEqual(self.contents(), self.server.content)
+
+  def test_gzip(self):
+    self.server.gzip = True
+    self.assertTrue(fetch(self.uri, self.file_name))
+    self.assertEqual(self.contents(), CONTENT)
+
+  def test_resume(self):
+    for use_gzip in (False, True):
+      self.server.gzip = use_gzip
+      self.server.interruptions = 1
+      if os.path.exists(self.file_name):
+        os.remove(self.file_name)
+      self.assertTrue(fetch(self.uri, self.file_name, backoff=0))
+      self.assertEqual(self.contents(), CONTENT)
+      self.assertIn('Range', self.server.requests[-1])
+      self.assertFalse(os.path.exists(self.file_name + PARTIAL_SUFFIX))
+
+  def test_misplaced_range_starts_over(self):
+    self.server.interruptions = 1
+    self.server.misplaced_range = True
+    self.assertTrue(fetch(self.uri, self.file_name, backoff=0))
+    self.assertEqual(self.contents(), CONTENT)
+    self.assertIn('Range', self.server.requests[-2])
+    self.assertNotIn('Range', self.server.requests[-1])
+
+  def test_changed_encoding_starts_over(self):
+    self.server.gzip = True
+    self.server.interruptions = 1
+    with self.assertRaises(FetchError):
+      fetch(self.uri, self.file_name, retries=0)
+    self.assertTrue(os.path.exists(self.file_name + PARTIAL_SUFFIX))
+    self.server.gzip = False
+    self.assertTrue(fetch(self.uri, self.file_name, backoff=0))
+    self.assertEqual(self.contents(), CONTENT)
+    self.assertEqual(len(self.server.requests), 3)
+    self.assertIn('Range', self.server.requests[-2])
+    self.assertNotIn('Range', self.server.requests[-1])
+
+  def test_server_error_retried(self):
+    self.server.errors = [503, 429]
+    self.assertTrue(fetch(self.uri, self.file_name, backoff=0))
+    self.assertEqual(self.contents(), CONTENT)
+    self.assertEqual(len(self.server.requests), 3)
+
+  def test_not_found_not_retried(self):
+    self.server.errors = [404, 404]
+    with self.assertRaises(FetchError):
+      fetch(self.uri, self.file_name, backoff=10)
+    self.assertEqual(len(self.server.requests), 1)
+
+  def test_interrupted_fetch_keeps_old_file(self):
+    self.assertTrue(fetch(self.uri, self.file_name))
+    self.server.etag = '"v2"'
+    self.server.content = b'truncated?'
+    self.server.interruptions = 10
+    with self.assertRaises(FetchError):
+      fetch(self.uri, self.file_name, retries=1, backoff=0)
+    self.assertEqual(self.contents(), CONTENT)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+# Test code for player_registry.py.
+#
+# To run:
+#
+#   python -m unittest test_player_registry.py
+
+import random
+import unittest
+from aga_roster import AGAMember
+from player_registry import ORDERS, SORT_KEYS, PlayerRegistry
+from rank import Rank
+
+
+def player(aga_id, last_name, rank):
+  p = AGAMember(last_name, 'A', aga_id, 'Full', None, None)
+  p.play_at(Rank[rank])
+  return p
+
+
+class TestPlayerRegistry (unittest.TestCase):
+  def setUp(self):
+    self.players = [player(3, 'Casey', '5K'), player(1, 'metcalf', '2D'),
+                    player(2, 'Adams', '5K')]
+    self.registry = PlayerRegistry(self.players)
+
+  def ids(self, order):
+    return [p.aga_id for p in self.registry.view(order)]
+
+  def test_orders(self):
+    self.assertEqual(self.ids('entered'), [3, 1, 2])
+    self.assertEqual(self.ids('name'), [2, 3, 1])
+    self.assertEqual(self.ids('id'), [1, 2, 3])
+    self.assertEqual(self.ids('rank'), [1, 2, 3])
+    self.assertEqual([p.aga_id for p in self.registry], [3, 1, 2])
+
+  def test_set(self):
+    self.assertIn(self.players[0], self.registry)
+    self.assertNotIn(player(4, 'Doe', '1K'), self.registry)
+    self.assertIs(self.registry.lookup(1), self.players[1])
+    self.assertRaises(ValueError, self.registry.append, player(3, 'Casey', '5K'))
+    self.assertRaises(ValueError, self.registry.remove, player(4, 'Doe', '1K'))
+
+  def test_between(self):
+    view = self.registry.sorted_view('id')
+    self.assertEqual([p.aga_id for p in view.between(2, 10)], [2, 3])
+    self.assertEqual(view.between(4, 10), [])
+
+  def test_views_maintained(self):
+    for order in ORDERS:
+      self.registry.view(order)
+    rng = random.Random(0)
+    ranks = [rank.name for rank in Rank]
+    players = list(self.players)
+    for aga_id in range(4, 200):
+      action = rng.random()
+      if action < 0.5 or not players:
+        p = player(aga_id, rng.choice(['Adams', 'Baker', 'Casey']), rng.choice(ranks))
+        self.registry.append(p)
+        players.append(p)
+      elif action < 0.75:
+        p = players.pop(rng.randrange(len(players)))
+        self.registry.remove(p)
+      else:
+        self.registry.play_at(rng.choice(players), Rank[rng.choice(ranks)])
+      for order, key in SORT_KEYS.items():
+        self.assertEqual(self.registry.view(order), sorted(players, key=key))
+      self.assertEqual(self.registry.view('entered'), players)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+# Test code for registration_server.py.
+#
+# To run:
+#
+#   python -m unittest test_registration_server.py
+
+import asyncio
+import os
+import tempfile
+import threading
+import unittest
+from aga_roster import AGAMember, AGAMemberRegistry, RosterLoader
+from aga_report_format import AGAReport
+from registration_server import RegistrationServer
+
+
+class Desk (object):
+  '''A client of the server, as a registration desk would be.'''
+
+  def __init__(self, reader, writer):
+    self.reader = reader
+    self.writer = writer
+
+  @classmethod
+  async def connect(cls, path):
+    desk = cls(*await asyncio.open_unix_connection(path))
+    await desk.reader.readuntil(b'> ')
+    return desk
+
+  async def command(self, line):
+    '''Sends line and returns the response.'''
+    self.writer.write(line.encode() + b'\n')
+    response = await self.reader.readuntil(b'> ')
+    return response[:-2].decode()
+
+  async def close(self):
+    self.writer.close()
+    await self.writer.wait_closed()
+
+
+class TestRegistrationServer (unittest.TestCase):
+  def setUp(self):
+    self.registry = AGAMember.Registry
+    AGAMember.use_registry(AGAMemberRegistry())
+    AGAMember.Registry.add_record('Nahabedian', 'Mark', 7068, 'Full', -12.5, None)
+    AGAMember.Registry.add_record('Metcalf', 'Wanda', 2151, 'Full', -5.5, None)
+    self.directory = tempfile.TemporaryDirectory()
+    self.file_name = os.path.join(self.directory.name, 'players.txt')
+    self.socket = os.path.join(self.directory.name, 'desks')
+
+  def tearDown(self):
+    AGAMember.use_registry(self.registry)
+    self.directory.cleanup()
+
+  async def session(self):
+    report = AGAReport(self.file_name)
+    report.tournament_header = 'Test'
+    server = RegistrationServer(report)
+    listener = await server.start(unix=self.socket)
+    a = await Desk.connect(self.socket)
+    b = await Desk.connect(self.socket)
+    self.assertIn('Nahabedian', await a.command('?7068'))
+    self.assertIn('Metcalf', await b.command('?2151'))
+    # Each desk registers whoever it found.
+    self.assertIn('Nahabedian, Mark (12K) registered', await a.command('r'))
+    self.assertIn('Metcalf, Wanda (5K) registered', await b.command('r'))
+    self.assertIn('already registered', await a.command('r'))
+    self.assertIn('There are 2 players', await b.command('who'))
+    # A rank that doesn't exist is refused without dropping the desk.
+    self.assertIn('Unknown rank 40K.', await b.command('rank1 40k'))
+    self.assertIn('Nahabedian, Mark (10K)', await b.command('rank1 10k'))
+    self.assertIn('Command not found', await a.command('bogus'))
+    self.assertEqual(server.desks, 2)
+    a.writer.write(b'exit\n')
+    self.assertEqual(await a.reader.read(), b'')
+    await b.close()
+    while server.desks:
+      await asyncio.sleep(0.01)
+    server.save()
+    listener.close()
+    await listener.wait_closed()
+
+  async def session_while_loading(self, release):
+    server = RegistrationServer(AGAReport(self.file_name))
+    listener = await server.start(unix=self.socket)
+    a = await Desk.connect(self.socket)
+    lookup = asyncio.ensure_future(a.command('?3000'))
+    await asyncio.sleep(0.05)
+    # a's lookup waits for the load, but the server still takes desks.
+    self.assertFalse(lookup.done())
+    b = await asyncio.wait_for(Desk.connect(self.socket), 5)
+    release.set()
+    self.assertIn('Member3000', await lookup)
+    await a.close()
+    await b.close()
+    listener.close()
+    await listener.wait_closed()
+
+  def test_desks_served_while_loading(self):
+    release = threading.Event()
+    def records():
+      release.wait()
+      for aga_id in range(3000, 3010):
+        yield ('Member%d' % aga_id, 'A', aga_id, 'Full', 1.5, None)
+    loader = RosterLoader(AGAMember.Registry, records())
+    AGAMember.Loader = loader
+    try:
+      loader.start()
+      asyncio.run(self.session_while_loading(release))
+    finally:
+      release.set()
+      loader.wait()
+      AGAMember.Loader = None
+
+  def test_desks_share_registration(self):
+    asyncio.run(self.session())
+    saved = AGAReport(self.file_name)
+    saved.load()
+    self.assertEqual([p.aga_id for p in saved.players], [7068, 2151])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+# Test code for report_journal.py.
+#
+# To run:
+#
+#   python -m unittest test_report_journal.py
+
+import os
+import tempfile
+import unittest
+from aga_roster import AGAMember, AGAMemberRegistry
+from player_registry import PlayerRegistry
+from rank import Rank
+from report_journal import ReportJournal
+
+
+class Report (object):
+  '''Just enough of an AGAReport for the journal: players and a save
+     that records its player's AGA IDs and ranks.'''
+
+  def __init__(self, file_name):
+    self.file_name = file_name
+    self.players = PlayerRegistry()
+    self.saved = []
+
+  def save(self):
+    self.saved = [(p.aga_id, p.playing_at) for p in self.players]
+
+
+class TestReportJournal (unittest.TestCase):
+  def setUp(self):
+    self.registry = AGAMember.Registry
+    AGAMember.use_registry(AGAMemberRegistry())
+    AGAMember.Registry.add_record('Nahabedian', 'Mark', 7068, 'Full', -12.5, None)
+    self.directory = tempfile.TemporaryDirectory()
+    self.file_name = os.path.join(self.directory.name, 'players.txt')
+
+  def tearDown(self):
+    AGAMember.use_registry(self.registry)
+    self.directory.cleanup()
+
+  def test_replay(self):
+    report = Report(self.file_name)
+    journal = ReportJournal(report)
+    mark = AGAMember.lookupID(7068)
+    journal.register(mark)
+    casey = AGAMember.placeholder('Casey', 'Eva', 1144)
+    casey.play_at(Rank['5K'])
+    journal.register(casey)
+    journal.play_at(mark, Rank['10K'])
+    journal.unregister(casey)
+    journal.close()
+    # A record cut short by a crash is ignored.
+    with open(journal.file_name, 'a') as f:
+      f.write('register\t2151\tMetcalf')
+    mark.play_at(Rank['12K'])
+    recovered = Report(self.file_name)
+    self.assertEqual(ReportJournal(recovered).replay(), 4)
+    self.assertEqual(list(recovered.players), [mark])
+    self.assertEqual(mark.playing_at, Rank['10K'])
+
+  def test_append_after_torn_record(self):
+    report = Report(self.file_name)
+    journal = ReportJournal(report)
+    journal.register(AGAMember.lookupID(7068))
+    journal.close()
+    with open(journal.file_name, 'a') as f:
+      f.write('register\t2151\tMetcalf')
+    journal = ReportJournal(report)
+    self.assertEqual(journal.replay(), 1)
+    casey = AGAMember.placeholder('Casey', 'Eva', 1144)
+    casey.play_at(Rank['5K'])
+    journal.register(casey)
+    journal.close()
+    recovered = Report(self.file_name)
+    self.assertEqual(ReportJournal(recovered).replay(), 2)
+    self.assertEqual([p.aga_id for p in recovered.players], [7068, 1144])
+
+  def test_compact(self):
+    report = Report(self.file_name)
+    journal = ReportJournal(report)
+    mark = AGAMember.lookupID(7068)
+    report.players.append(mark)
+    journal.register(mark)
+    self.assertEqual(len(journal), 1)
+    journal.compact()
+    self.assertEqual(report.saved, [(7068, Rank['12K'])])
+    self.assertEqual(len(journal), 0)
+    self.assertEqual(ReportJournal(Report(self.file_name)).replay(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+# Test code for roster_delta.py.
+#
+# To run:
+#
+#   python -m unittest test_roster_delta.py
+
+import datetime
+import os.path
+import tempfile
+import unittest
+from aga_roster import AGAMemberRegistry
+from columnar_roster import ColumnarRegistry
+from rank import Rank
+from roster_delta import apply_delta, diff_member_file
+
+
+OLD_RECORDS = [
+    ('Nahabedian', 'Mark', 7068, 'Full', -12.5, datetime.date(2019, 3, 1)),
+    ('Metcalf', 'Wanda', 2151, 'Full', -5.5, datetime.date(2019, 3, 1)),
+    ('Gone', 'Pat', 3, 'Full', 2.5, datetime.date(2019, 3, 1))]
+
+NEW_FILE = '''Nahabedian, Mark\t7068\tFull\t-10.5\t3/1/2020
+Metcalf, Wanda\t2151\tFull\t-5.5\t3/1/2019
+Casey, Eva W.\t1144\tYouth\t-20.5\t1/1/2020
+New, Member\t12\tFull\t\t
+'''
+
+
+class TestRosterDelta(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.file_name = os.path.join(self.directory.name, 'TDListA.txt')
+    with open(self.file_name, 'w') as f:
+      f.write(NEW_FILE)
+
+  def tearDown(self):
+    self.directory.cleanup()
+
+  def check(self, registry):
+    for record in OLD_RECORDS:
+      registry.add_record(*record)
+    casey = registry.add_record('Casey', 'Eva W.', 1144, None, None, None)
+    casey.play_at(Rank['5K'])
+    mark = registry.lookup(7068)
+    wanda = registry.lookup(2151)
+    wanda.play_at(Rank['1D'])
+    players = [mark, wanda, casey]
+    delta = diff_member_file(registry, self.file_name)
+    self.assertEqual(sorted(r[2] for r in delta.added), [12, 1144])
+    self.assertEqual([(m.aga_id, fields) for m, r, fields in delta.changed],
+                     [(7068, ['rating', 'expiration'])])
+    self.assertEqual(delta.removed, [3])
+    reranked = apply_delta(registry, delta, players)
+    self.assertEqual(reranked, [(mark, Rank['12K'], Rank['10K'])])
+    self.assertEqual(registry.lookup(7068).rating, -10.5)
+    self.assertEqual(mark.playing_at, Rank['10K'])
+    self.assertEqual(wanda.playing_at, Rank['1D'])
+    self.assertEqual(casey.membership_type, 'Youth')
+    self.assertEqual(casey.playing_at, Rank['5K'])
+    self.assertIsNone(registry.lookup(3))
+    self.assertEqual(registry.search('gone'), [])
+    self.assertEqual(registry.search('new'), [registry.lookup(12)])
+    self.assertEqual(len(registry), 4)
+    self.assertEqual(len(diff_member_file(registry, self.file_name)), 0)
+
+  def test_objects(self):
+    self.check(AGAMemberRegistry())
+
+  def test_columnar(self):
+    self.check(ColumnarRegistry())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+# Test code for roster_snapshot.py.
+#
+# To run:
+#
+#   python -m unittest test_roster_snapshot.py
+
+import datetime
+import os.path
+import tempfile
+import unittest
+from name_index import TrigramIndex
+from roster_snapshot import read_snapshot, write_snapshot
+
+
+RECORDS = [
+    ('Nahabedian', 'Mark', 7068, 'Full', -12.5, datetime.date(2019, 3, 1),
+     'Boston Go Club', 'MA', datetime.date(2018, 11, 4)),
+    ('Casey', None, 1144, '', None, None, None, None, None)]
+
+
+class TestRosterSnapshot(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.file_name = os.path.join(self.directory.name, 'TDListA.txt')
+    with open(self.file_name, 'w') as f:
+      f.write('stand in for the membership file\n')
+    self.index = TrigramIndex()
+    for record in RECORDS:
+      self.index.add(record[2], record[0], record[1])
+
+  def tearDown(self):
+    self.directory.cleanup()
+
+  def test_round_trip(self):
+    self.assertIsNone(read_snapshot(self.file_name))
+    write_snapshot(self.file_name, RECORDS, self.index)
+    records, index = read_snapshot(self.file_name)
+    self.assertEqual(records, RECORDS)
+    self.assertEqual(index.postings, self.index.postings)
+
+  def test_stale(self):
+    write_snapshot(self.file_name, RECORDS, self.index)
+    with open(self.file_name, 'a') as f:
+      f.write('another line\n')
+    self.assertIsNone(read_snapshot(self.file_name))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+# Test code for simulate.py.
+#
+# To run:
+#
+#   python -m unittest test_simulate.py
+
+import random
+import unittest
+from rank import Rank
+from simulate import *
+
+
+class TestSimulate (unittest.TestCase):
+  def players(self):
+    rng = random.Random(0)
+    players = []
+    for aga_id in range(1, 12):
+      rank = Rank(rng.randint(Rank['10K'].value, Rank['3D'].value))
+      players.append(SimulatedPlayer(aga_id, rank, rank.value))
+    # Playing at 3D but as strong as a 6D.
+    players.append(SimulatedPlayer(12, Rank['3D'], Rank['6D'].value))
+    return players
+
+  def test_rating_strength(self):
+    self.assertEqual(rating_strength(1.5), Rank['1D'].value + 0.5)
+    self.assertEqual(rating_strength(-1.5), Rank['1K'].value - 0.5)
+
+  def test_compensation(self):
+    self.assertEqual(compensation(0, mcmahon.DEFAULT_KOMI), 0)
+    self.assertEqual(compensation(0, 0), 1)
+    self.assertEqual(compensation(4, 0), 4)
+
+  def test_summary(self):
+    players = self.players()
+    for summary in simulate(players, 60, rounds=3, processes=1):
+      pass
+    self.assertEqual(summary.tournaments, 60)
+    self.assertEqual(summary.rounds + summary.unpairable, 180)
+    self.assertEqual(summary.games, summary.rounds * len(players) // 2)
+    self.assertEqual(sum(summary.prize_counts().values()), 180)
+    # The underrated player wins most often.
+    self.assertEqual(summary.prize_counts().most_common(1)[0][0], 12)
+
+  def test_processes_agree(self):
+    players = self.players()
+    for serial in simulate(players, 60, rounds=2, processes=1, seed=3):
+      pass
+    for parallel in simulate(players, 60, rounds=2, processes=2, seed=3):
+      pass
+    self.assertEqual(serial.__dict__, parallel.__dict__)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+# Test code for standings.py.
+#
+# To run:
+#
+#   python -m unittest test_standings.py
+
+import contextlib
+import io
+import random
+import unittest
+from aga_roster import AGAMember
+from mcmahon import Game
+from rank import Rank
+from standings import Standings, recompute_standings
+
+
+def player(aga_id, rank):
+  p = AGAMember('Player%d' % aga_id, 'A', aga_id, 'Full', None, None)
+  p.play_at(Rank[rank])
+  return p
+
+
+class TestStandings (unittest.TestCase):
+  def assertSameStandings(self, a, b):
+    for field in ('score', 'sos', 'sosos'):
+      self.assertEqual(getattr(a, field), getattr(b, field), field)
+    self.assertEqual(+a.wins, +b.wins)
+
+  def test_small(self):
+    players = [player(1, '2D'), player(2, '2D'), player(3, '1D'), player(4, '1D')]
+    standings = Standings(players)
+    standings.add_game(Game(1, 2, 'w'))
+    standings.add_game(Game(3, 4, 'b'))
+    standings.add_bye(3)
+    two_dan = Rank['2D'].value
+    one_dan = Rank['1D'].value
+    self.assertEqual(standings.score, {1: two_dan + 1, 2: two_dan,
+                                       3: one_dan + 1, 4: one_dan + 1})
+    self.assertEqual(standings.sos[2], two_dan + 1)
+    self.assertEqual(standings.sosos[1], two_dan + 1)
+    self.assertEqual(standings.ordered(), [1, 2, 3, 4])
+
+  def test_unregistered_players_left_out(self):
+    players = [player(1, '2D'), player(2, '2D')]
+    standings = Standings(players)
+    warnings = io.StringIO()
+    with contextlib.redirect_stderr(warnings):
+      standings.add_game(Game(1, 9999, 'w'))
+      standings.add_bye(9999)
+      standings.add_game(Game(1, 2, 'b'))
+      recomputed = recompute_standings(players, [Game(1, 9999, 'w'), Game(1, 2, 'b')],
+                                       [9999])
+    self.assertSameStandings(standings, recomputed)
+    self.assertEqual(standings.opponents, {1: [2], 2: [1]})
+    self.assertIn('the game between 1 and 9999: 9999 not registered',
+                  warnings.getvalue())
+
+  def test_incremental_matches_recomputation(self):
+    rng = random.Random(0)
+    players = [player(i, rng.choice(['5K', '1K', '1D', '3D'])) for i in range(1, 22)]
+    standings = Standings(players)
+    games = []
+    byes = []
+    for round_number in range(4):
+      ids = [p.aga_id for p in players]
+      rng.shuffle(ids)
+      byes.append(ids.pop())
+      standings.add_bye(byes[-1])
+      for i in range(0, len(ids), 2):
+        game = Game(ids[i], ids[i + 1], rng.choice('wb'))
+        games.append(game)
+        standings.add_game(game)
+        self.assertSameStandings(standings, recompute_standings(players, games, byes))
+    corrected = games.pop(5)
+    standings.remove_game(corrected)
+    self.assertSameStandings(standings, recompute_standings(players, games, byes))